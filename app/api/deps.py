@@ -0,0 +1,19 @@
+"""
+多个 router 共用的依赖。
+"""
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.config import settings
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    管理接口需要请求头 X-Admin-Token 与 ADMIN_TOKEN 一致，ADMIN_TOKEN 为空时管理接口关闭。
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
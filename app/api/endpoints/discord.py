@@ -1,60 +1,219 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import RedirectResponse
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from pydantic import BaseModel, Field
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.avatar_proxy import ALLOWED_SIZES, AvatarDiskCache, avatar_variant
+from app.services.avatars import (
+    AVATAR_CACHE_TTL,
+    AVATAR_SOFT_TTL,
+    CACHE_KEY_AVATAR,
+    avatar_urls_from_members,
+    build_avatar_url,
+)
+from app.services.guilds import configured_guilds
+from app.services.member_store import MemberStore
 from app.utils.cache import CacheClient
-from app.utils.http_client import HttpClient
+from app.utils.discord_client import DiscordClient
+from app.utils.etag import matched_etag
+from app.utils.singleflight import SingleFlight
 
 router = APIRouter()
 
+HOT_AVATAR_TRACK_LIMIT = 10000
 
-@router.get("/avatar/{user_id}", summary="Get Discord user avatar and redirect")
-async def redirect_discord_avatar(user_id: str):
+# 本 worker 最近被请求的头像计数，定时任务据此预热
+_hot_avatars: Counter = Counter()
+
+
+async def _fetch_avatar_url(user_id: str) -> str:
+    cache_key = CACHE_KEY_AVATAR.format(user_id=user_id)
+    response = await DiscordClient.get(f"/users/{user_id}")
+
+    if response.status_code == 404:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if response.status_code != 200:
+        logger.error(f"Discord API Error: {response.text}")
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch user data")
+
+    data = response.json()
+    final_url = build_avatar_url(user_id, data.get("avatar"), data.get("discriminator", "0"))
+
+    await CacheClient.set(cache_key, final_url, ttl=AVATAR_CACHE_TTL, soft_ttl=AVATAR_SOFT_TTL)
+    return final_url
+
+
+def _track_hot_avatar(user_id: str):
+    _hot_avatars[user_id] += 1
+    if len(_hot_avatars) > HOT_AVATAR_TRACK_LIMIT:
+        keep = _hot_avatars.most_common(HOT_AVATAR_TRACK_LIMIT // 2)
+        _hot_avatars.clear()
+        _hot_avatars.update(dict(keep))
+
+
+async def _resolve_avatar_url(user_id: str) -> str:
     """
-    根据 User ID 获取头像并 302 跳转。
-    缓存策略：10分钟。
+    缓存策略：10分钟后后台刷新，期间继续返回旧地址；
+    缓存失效时同一用户的并发请求只回源一次。
     """
-    cache_key = f"discord:avatar:{user_id}"
-    cached_url = await CacheClient.get(cache_key)
+    cache_key = CACHE_KEY_AVATAR.format(user_id=user_id)
+    cached_url, stale = await CacheClient.get_with_stale(cache_key)
     if cached_url:
-        return RedirectResponse(url=cached_url, status_code=302)
+        if settings.DISCORD_BOT_TOKEN and stale:
+            SingleFlight.refresh(cache_key, lambda: _fetch_avatar_url(user_id))
+        return cached_url
 
     if not settings.DISCORD_BOT_TOKEN:
         raise HTTPException(status_code=500, detail="Bot Token missing")
 
-    url = f"https://discord.com/api/v10/users/{user_id}"
-    headers = {"Authorization": f"Bot {settings.DISCORD_BOT_TOKEN}"}
-
     try:
-        response = await HttpClient.get(url, headers=headers)
+        return await SingleFlight.do(
+            cache_key,
+            lambda: _fetch_avatar_url(user_id),
+            recheck=lambda: CacheClient.get(cache_key)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Avatar error: {e}")
+        raise HTTPException(status_code=500, detail="Server Error")
 
-        if response.status_code == 404:
-            raise HTTPException(status_code=404, detail="User not found")
 
-        if response.status_code != 200:
-            logger.error(f"Discord API Error: {response.text}")
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch user data")
+def _with_size(url: str, size: Optional[int]) -> str:
+    if not size or "/embed/avatars/" in url:
+        return url
+    return f"{url.split('?', 1)[0]}?size={size}"
+
+
+@router.get("/avatar/{user_id}", summary="Get Discord user avatar and redirect")
+async def redirect_discord_avatar(
+        user_id: str,
+        size: Optional[int] = Query(None, description="Image size, a power of 2 between 16 and 4096"),
+        if_none_match: Optional[str] = Header(None)
+):
+    """
+    根据 User ID 获取头像并 302 跳转。
+    开启 AVATAR_PROXY_ENABLED 时改为直接返回图片，图片缓存在本地磁盘，
+    CDN 下载失败时仍退回跳转。
+    """
+    if not user_id.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid user id")
+    if size is not None and size not in ALLOWED_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(map(str, ALLOWED_SIZES))}")
 
-        data = response.json()
-        avatar = data.get("avatar")
-        discriminator = data.get("discriminator", "0")
+    _track_hot_avatar(user_id)
+    url = await _resolve_avatar_url(user_id)
 
-        if avatar:
-            ext = "gif" if avatar.startswith("a_") else "png"
-            final_url = f"https://cdn.discordapp.com/avatars/{user_id}/{avatar}.{ext}?size=1024"
+    if settings.AVATAR_PROXY_ENABLED:
+        variant = avatar_variant(url, size)
+        if variant:
+            # 头像换了 hash 就会变，ETag 直接取文件名；地址本身会变，只允许短时间缓存
+            headers = {
+                "ETag": variant.etag,
+                "Cache-Control": f"public, max-age={settings.AVATAR_PROXY_MAX_AGE}",
+            }
+            if matched_etag(if_none_match, variant.etag):
+                return Response(status_code=304, headers=headers)
+            cached = await AvatarDiskCache.get(variant)
+            if cached:
+                path, stat = cached
+                # 服务器支持 http.response.pathsend 时由服务器直接 sendfile
+                return FileResponse(path, media_type=variant.media_type, headers=headers, stat_result=stat)
+
+    return RedirectResponse(url=_with_size(url, size), status_code=302)
+
+
+class AvatarBatchRequest(BaseModel):
+    user_ids: List[str] = Field(
+        ...,
+        max_length=settings.AVATAR_BATCH_MAX_IDS,
+        description="Discord user IDs to resolve"
+    )
+
+
+async def _resolve_from_api(user_ids: List[str]) -> Dict[str, Optional[str]]:
+    semaphore = asyncio.Semaphore(settings.AVATAR_BATCH_CONCURRENCY)
+
+    async def resolve(user_id: str) -> Optional[str]:
+        cache_key = CACHE_KEY_AVATAR.format(user_id=user_id)
+        async with semaphore:
+            try:
+                return await SingleFlight.do(
+                    cache_key,
+                    lambda: _fetch_avatar_url(user_id),
+                    recheck=lambda: CacheClient.get(cache_key)
+                )
+            except HTTPException:
+                return None
+            except Exception as e:
+                logger.warning(f"Failed to resolve avatar {user_id}: {e}")
+                return None
+
+    urls = await asyncio.gather(*(resolve(user_id) for user_id in user_ids))
+    return dict(zip(user_ids, urls))
+
+
+@router.post("/avatars", response_model=Dict[str, Optional[str]], summary="Resolve avatar URLs for multiple users")
+async def resolve_discord_avatars(body: AvatarBatchRequest):
+    """
+    批量解析头像地址，返回 user id -> URL，无法解析的为 null，不是数字的 id 不出现在结果中。
+    依次尝试：缓存 (一次 MGET) -> 各公会已缓存的成员快照 -> Discord API。
+    """
+    user_ids = list(dict.fromkeys(user_id for user_id in body.user_ids if user_id.isdigit()))
+
+    result: Dict[str, Optional[str]] = {user_id: None for user_id in user_ids}
+    cached = await CacheClient.mget([CACHE_KEY_AVATAR.format(user_id=user_id) for user_id in user_ids])
+    missing = []
+    for user_id, url in zip(user_ids, cached):
+        if url:
+            result[user_id] = url
         else:
-            if discriminator == "0":
-                idx = (int(user_id) >> 22) % 6
-            else:
-                idx = int(discriminator) % 5
-            final_url = f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
+            missing.append(user_id)
 
-        await CacheClient.set(cache_key, final_url, ttl=600)
-        return RedirectResponse(url=final_url, status_code=302)
+    for guild_id in configured_guilds():
+        if not missing:
+            break
+        members = await MemberStore.load(guild_id)
+        if members:
+            from_snapshot = avatar_urls_from_members(members, set(missing))
+            if from_snapshot:
+                result.update(from_snapshot)
+                await CacheClient.mset_with_ttl(
+                    {CACHE_KEY_AVATAR.format(user_id=user_id): url for user_id, url in from_snapshot.items()},
+                    ttl=AVATAR_CACHE_TTL,
+                    soft_ttl=AVATAR_SOFT_TTL
+                )
+                missing = [user_id for user_id in missing if user_id not in from_snapshot]
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Avatar error: {e}")
-        raise HTTPException(status_code=500, detail="Server Error")
+    if missing and settings.DISCORD_BOT_TOKEN:
+        result.update(await _resolve_from_api(missing))
+
+    return result
+
+
+async def refresh_hot_avatars_job():
+    """
+    刷新本 worker 最热门且已过软期限的头像，逐个请求避免突发打满 Discord 限速。
+    """
+    if not settings.DISCORD_BOT_TOKEN:
+        return
+
+    hot_ids = [user_id for user_id, _ in _hot_avatars.most_common(settings.HOT_AVATAR_LIMIT)]
+    _hot_avatars.clear()
+
+    cache_keys = [CACHE_KEY_AVATAR.format(user_id=user_id) for user_id in hot_ids]
+    stale_flags = await CacheClient.is_stale_many(cache_keys)
+    for user_id, stale in zip(hot_ids, stale_flags):
+        if not stale:
+            continue
+        try:
+            await _fetch_avatar_url(user_id)
+        except Exception as e:
+            logger.warning(f"Failed to refresh avatar {user_id}: {e}")
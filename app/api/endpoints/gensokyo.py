@@ -1,18 +1,38 @@
-import json
-from typing import List, Optional, Union, Dict
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import List, Optional, Union, Dict, Tuple
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Body
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Body, Depends, Header, Path, Query
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
+from app.api.deps import require_admin
 from app.core.config import settings
 from app.core.logger import logger
+from app.models import ContributorConfig
+from app.services.avatars import build_avatar_url
+from app.services.contributor_views import ContributorViews
+from app.services.guilds import CACHE_KEY_ROLES, configured_guilds, resolve_guild
+from app.services.member_store import CACHE_KEY_MEMBERS_SNAPSHOT, MemberStore
+from app.services.member_sync import MemberSync
 from app.utils.cache import CacheClient
-from app.utils.http_client import HttpClient
+from app.utils.compression import choose_encoding, compress, preferred_encoding
+from app.utils.discord_client import DiscordClient
+from app.utils.etag import encoded_etag, matched_etag
+from app.utils.serialization import dumps, loads
+from app.utils.singleflight import SingleFlight
 
 router = APIRouter()
 
-CACHE_KEY_RAW_MEMBERS = "gensokyo:discord:members:raw"
-CACHE_TTL = 60 * 60 * 24 * 7  # 7天
+ROLES_CACHE_TTL = 60 * 60
+ROLES_SOFT_TTL = 60 * 10
+CACHE_KEY_CONTRIBUTORS = "gensokyo:contributors:{guild_id}:{version}:{digest}"
+CONTRIBUTORS_CACHE_TTL = 60 * 60
+CONTRIBUTOR_FIELDS = ("id", "name", "avatar", "avatarUseGithub", "position", "contact")
+CONFIG_NAME_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+# 与 /contributors/configs 路由冲突的名字
+RESERVED_CONFIG_NAMES = {"configs", "refresh"}
 
 
 class Contact(BaseModel):
@@ -45,6 +65,17 @@ class ContributorRequest(BaseModel):
     overrides: Optional[Dict[str, ContributorOverride]] = {}
 
 
+class ContributorQuery(BaseModel):
+    """
+    查询参数，在生成结果时应用，不影响未选中的部分。
+    """
+    teams: Optional[List[str]] = None
+    offset: int = 0
+    limit: Optional[int] = None
+    fields: Optional[List[str]] = None
+    q: Optional[str] = None
+
+
 class DiscordRole(BaseModel):
     id: str
     name: str
@@ -64,209 +95,530 @@ def _int_to_hex_color(color_int: int) -> str:
 
 
 def _get_avatar_url(user_data: dict) -> str:
-    user_id = user_data['id']
-    avatar = user_data.get('avatar')
-    discriminator = user_data.get('discriminator', '0')
-
-    if avatar:
-        ext = "gif" if avatar.startswith("a_") else "png"
-        return f"https://cdn.discordapp.com/avatars/{user_id}/{avatar}.{ext}?size=256"
-    else:
-        if discriminator == '0':
-            idx = (int(user_id) >> 22) % 6
-        else:
-            idx = int(discriminator) % 5
-        return f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
-
-
-async def _fetch_raw_guild_members(guild_id: str) -> List[dict]:
-    if not settings.DISCORD_BOT_TOKEN:
-        logger.error("Discord Bot Token missing")
-        return []
-
-    url = f"https://discord.com/api/v10/guilds/{guild_id}/members"
-    headers = {"Authorization": f"Bot {settings.DISCORD_BOT_TOKEN}"}
-
-    members = []
-    last_id = "0"
-    max_loops = 50
-    loop_count = 0
-
-    while loop_count < max_loops:
-        try:
-            resp = await HttpClient.get(url, headers=headers, params={"limit": 1000, "after": last_id})
-            if resp.status_code != 200:
-                logger.error(f"Failed to fetch members: {resp.text}")
-                break
-            batch = resp.json()
-            if not batch:
-                break
-            members.extend(batch)
-            last_id = batch[-1]["user"]["id"]
-            if len(batch) < 1000:
-                break
-            loop_count += 1
-        except Exception as e:
-            logger.error(f"Error fetching members: {e}")
-            break
-    logger.info(f"Fetched {len(members)} raw members from Discord.")
-    return members
-
-
-async def _get_cached_members() -> List[dict]:
-    cached = await CacheClient.get(CACHE_KEY_RAW_MEMBERS)
-    if cached:
-        return json.loads(cached)
+    return build_avatar_url(user_data['id'], user_data.get('avatar'), user_data.get('discriminator', '0'), size=256)
 
-    if not settings.DISCORD_GUILD_ID:
-        logger.warning("DISCORD_GUILD_ID not set")
-        return []
 
-    raw_data = await _fetch_raw_guild_members(settings.DISCORD_GUILD_ID)
-    if raw_data:
-        await CacheClient.set(CACHE_KEY_RAW_MEMBERS, json.dumps(raw_data), ttl=CACHE_TTL)
+def _guild_id(
+        guild_id: Optional[str] = Query(None, description="Discord guild id, defaults to the configured default guild")
+) -> str:
+    """
+    解析请求的公会，只接受 DISCORD_GUILD_ID / DISCORD_GUILD_IDS 中配置的。
+    """
+    resolved = resolve_guild(guild_id)
+    if resolved is not None:
+        return resolved
+    if guild_id:
+        raise HTTPException(status_code=404, detail="Guild not configured")
+    raise HTTPException(status_code=500, detail="Guild ID not set")
+
 
-    return raw_data
+def _optional_guild_id(
+        guild_id: Optional[str] = Query(None, description="Discord guild id, defaults to the configured default guild")
+) -> Optional[str]:
+    """
+    同 _guild_id，但没有默认公会且未指定时返回 None，与只支持单个公会时一样按没有成员处理。
+    """
+    if not guild_id and not settings.DISCORD_GUILD_ID:
+        return None
+    return _guild_id(guild_id)
+
+
+async def _load_members(guild_id: str) -> Optional[int]:
+    return await MemberSync.run(guild_id)
+
+
+async def _get_cached_members(guild_id: str) -> List[dict]:
+    snapshot_key = CACHE_KEY_MEMBERS_SNAPSHOT.format(guild_id=guild_id)
+    cached = await MemberStore.load(guild_id)
+    if cached:
+        # 网关同步时快照由事件维护，不按软过期重新全量分页
+        if not settings.DISCORD_GATEWAY_ENABLED and await MemberStore.is_stale(guild_id):
+            SingleFlight.refresh(snapshot_key, lambda: _load_members(guild_id), lock_ttl=120)
+        return cached
+
+    # 第一份快照（可能只有前几页）写入后就返回，分页在后台继续
+    return await SingleFlight.do(
+        snapshot_key,
+        lambda: MemberSync.wait_for_members(guild_id, timeout=120),
+        recheck=lambda: MemberStore.load(guild_id),
+        lock_ttl=120,
+        wait_timeout=120
+    )
+
+
+def _split_csv(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    return items or None
+
+
+def _request_digest(body: ContributorRequest, query: Optional[ContributorQuery] = None) -> str:
+    """
+    规范化请求体和查询参数后取 sha256，字段顺序和 overrides 为 None/{} 都不影响结果。
+    """
+    data = body.model_dump()
+    data["overrides"] = data["overrides"] or {}
+    if query is not None and query != ContributorQuery():
+        data["query"] = query.model_dump()
+    return hashlib.sha256(dumps(data, sort_keys=True)).hexdigest()
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+@lru_cache(maxsize=64)
+def _compile_role_index(role_groups: Tuple[Tuple[str, ...], ...]) -> Dict[str, int]:
+    """
+    role_id -> 最靠前的 config 下标。
+    按 config 的 role_ids 缓存，同一份配置只编译一次。
+    """
+    index = {}
+    for idx, role_ids in enumerate(role_groups):
+        for role_id in role_ids:
+            index.setdefault(role_id, idx)
+    return index
+
+
+def _compile_overrides(overrides: Dict[str, ContributorOverride]) -> Dict[str, Tuple[dict, dict]]:
+    """
+    预先把 override 展开成 (字段补丁, contact 补丁)，合并时直接 dict.update。
+    """
+    compiled = {}
+    for user_id, override in overrides.items():
+        if override is None:
+            continue
+        patch = {}
+        if override.name:
+            patch["name"] = override.name
+        if override.avatar:
+            patch["avatar"] = override.avatar
+        if override.avatarUseGithub is not None:
+            patch["avatarUseGithub"] = override.avatarUseGithub
+        if override.position:
+            patch["position"] = override.position
+
+        contact_patch = {}
+        if override.contact:
+            for field, value in override.contact.model_dump().items():
+                if value:
+                    contact_patch[field] = value
+        compiled[user_id] = (patch, contact_patch)
+    return compiled
 
 
 def _process_contributors(
         members: List[dict],
         configs: List[TeamConfig],
-        overrides: Dict[str, ContributorOverride]
+        overrides: Dict[str, ContributorOverride],
+        query: Optional[ContributorQuery] = None
 ) -> List[dict]:
+    """
+    成员按 role 归入最靠前的组，再按 query 过滤：
+    teams 只输出选中的组（归属仍按全部配置计算），q 匹配显示名和 Discord 用户名，
+    offset/limit 在每个组内分页，只为当页的成员生成结果，分页时附带 total 和 next_offset。
+    """
+    query = query or ContributorQuery()
+    selected = set(query.teams) if query.teams else None
+    search = query.q.casefold() if query.q else None
+    fields = query.fields
+    stop = query.offset + query.limit if query.limit else None
+
     result = []
+    lists: List[Optional[list]] = []
+    entries: List[Optional[dict]] = []
     manual_map = {}
 
     for idx, cfg in enumerate(configs):
-        result.append({
+        for uid in cfg.include_user_ids:
+            manual_map[uid] = idx
+        if selected is not None and cfg.name not in selected:
+            lists.append(None)
+            entries.append(None)
+            continue
+        team_list = []
+        entry = {
             "name": cfg.name,
             "image": cfg.image,
             "color": cfg.color,
-            "list": []
-        })
-        for uid in cfg.include_user_ids:
-            manual_map[uid] = idx
+            "list": team_list
+        }
+        result.append(entry)
+        lists.append(team_list)
+        entries.append(entry)
+
+    role_index = _compile_role_index(tuple(tuple(cfg.role_ids) for cfg in configs))
+    compiled_overrides = _compile_overrides(overrides)
+    matched = [0] * len(configs)
 
     for member in members:
         user = member.get("user", {})
         user_id = user.get("id")
-        roles = member.get("roles", [])
 
-        target_idx = -1
+        target_idx = manual_map.get(user_id, -1)
 
-        if user_id in manual_map:
-            target_idx = manual_map[user_id]
-
-        if target_idx == -1:
-            member_roles_set = set(roles)
-            for idx, cfg in enumerate(configs):
-                cfg_roles_set = set(cfg.role_ids)
-                if not cfg_roles_set.isdisjoint(member_roles_set):
+        if target_idx == -1 and role_index:
+            for role_id in member.get("roles", ()):
+                idx = role_index.get(role_id)
+                if idx is not None and (target_idx == -1 or idx < target_idx):
                     target_idx = idx
-                    break
-
-        if target_idx != -1:
-            base_name = member.get("nick") or user.get("global_name") or user.get("username")
-            base_avatar = _get_avatar_url(user)
-            base_position = result[target_idx]["name"]
-
-            override_data = overrides.get(user_id)
-
-            final_name = override_data.name if (override_data and override_data.name) else base_name
-            final_avatar = override_data.avatar if (override_data and override_data.avatar) else base_avatar
-            final_use_github = override_data.avatarUseGithub if (
-                    override_data and override_data.avatarUseGithub is not None) else False
-            final_position = override_data.position if (override_data and override_data.position) else base_position
-
-            final_contact = {
+                    if idx == 0:
+                        break
+
+        if target_idx == -1 or lists[target_idx] is None:
+            continue
+
+        compiled = compiled_overrides.get(user_id)
+        name = member.get("nick") or user.get("global_name") or user.get("username")
+        if compiled and "name" in compiled[0]:
+            name = compiled[0]["name"]
+
+        if search is not None and search not in (name or "").casefold() \
+                and search not in (user.get("username") or "").casefold():
+            continue
+
+        position = matched[target_idx]
+        matched[target_idx] += 1
+        if position < query.offset or (stop is not None and position >= stop):
+            continue
+
+        contributor = {
+            "id": user_id,
+            "name": name,
+            "avatar": _get_avatar_url(user),
+            "avatarUseGithub": False,
+            "position": configs[target_idx].name,
+            "contact": {
                 "discord": user.get("username"),
                 "twitter": None, "github": None, "youtube": None, "other": None
             }
+        }
 
-            if override_data and override_data.contact:
-                if override_data.contact.discord: final_contact["discord"] = override_data.contact.discord
-                if override_data.contact.twitter: final_contact["twitter"] = override_data.contact.twitter
-                if override_data.contact.github: final_contact["github"] = override_data.contact.github
-                if override_data.contact.youtube: final_contact["youtube"] = override_data.contact.youtube
-                if override_data.contact.other: final_contact["other"] = override_data.contact.other
-
-            contributor = {
-                "id": user_id,
-                "name": final_name,
-                "avatar": final_avatar,
-                "avatarUseGithub": final_use_github,
-                "position": final_position,
-                "contact": final_contact
-            }
-            result[target_idx]["list"].append(contributor)
+        if compiled:
+            patch, contact_patch = compiled
+            contributor.update(patch)
+            if contact_patch:
+                contributor["contact"].update(contact_patch)
+
+        if fields:
+            contributor = {field: contributor[field] for field in fields}
+        lists[target_idx].append(contributor)
+
+    if query.limit:
+        for idx, entry in enumerate(entries):
+            if entry is not None:
+                entry["total"] = matched[idx]
+                entry["next_offset"] = stop if stop < matched[idx] else None
 
     return result
 
 
+def _contributor_query(
+        teams: Optional[str],
+        offset: int,
+        limit: Optional[int],
+        fields: Optional[str],
+        q: Optional[str]
+) -> ContributorQuery:
+    field_list = _split_csv(fields)
+    if field_list:
+        unknown = [field for field in field_list if field not in CONTRIBUTOR_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        # id 总是返回，前端用作列表 key
+        field_list = ["id"] + [field for field in CONTRIBUTOR_FIELDS[1:] if field in field_list]
+    return ContributorQuery(
+        teams=_split_csv(teams),
+        offset=offset,
+        limit=limit,
+        fields=field_list,
+        q=q.strip() if q and q.strip() else None
+    )
+
+
+def _json_response(
+        payload: bytes,
+        accept_encoding: Optional[str],
+        headers: Optional[Dict[str, str]] = None,
+        encoded: Optional[bytes] = None
+) -> Response:
+    """
+    :param encoded: Already compressed body for the chosen encoding, compressed here when omitted
+    """
+    # 是否压缩取决于 Accept-Encoding，未压缩的响应也要带 Vary，否则共享缓存可能把它发给其他客户端
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    encoding = choose_encoding(accept_encoding, len(payload))
+    if encoding is None:
+        return Response(content=payload, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    if "ETag" in headers:
+        headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+    body = encoded if encoded is not None else compress(payload, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.post("/contributors", summary="Obtain contributor list based on configuration")
 async def get_contributors_dynamic(
-        body: ContributorRequest = Body(..., description="Configuration object")
+        body: ContributorRequest = Body(..., description="Configuration object"),
+        teams: Optional[str] = Query(None, description="Comma-separated team names to return"),
+        offset: int = Query(0, ge=0, description="Members to skip in each team"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Max members per team"),
+        fields: Optional[str] = Query(None, description="Comma-separated contributor fields to return"),
+        q: Optional[str] = Query(None, max_length=100, description="Case-insensitive name search"),
+        guild_id: Optional[str] = Depends(_optional_guild_id),
+        if_none_match: Optional[str] = Header(None),
+        accept_encoding: Optional[str] = Header(None)
+):
+    """
+    结果按 (公会, 成员快照版本, 请求体和查询参数的哈希) 缓存为序列化后的 JSON，并附带 ETag；
+    压缩后的响应体按编码方式另存一份，命中时不必重新压缩。
+    成员快照版本不存在（缓存为空或 Redis 不可用）时不做缓存。
+    成员同步尚未完成时结果不完整，带 X-Members-Partial 头且不缓存。
+    """
+    query = _contributor_query(teams, offset, limit, fields, q)
+    if guild_id is None:
+        logger.warning("DISCORD_GUILD_ID not set")
+        payload = dumps(_process_contributors([], body.config, body.overrides or {}, query))
+        return _json_response(payload, accept_encoding)
+
+    digest = _request_digest(body, query)
+    version = await MemberStore.get_version(guild_id)
+
+    if version is not None:
+        etag = f'"{version}-{digest[:32]}"'
+        matched = matched_etag(if_none_match, etag)
+        if matched:
+            return _not_modified(matched)
+
+        cache_key = CACHE_KEY_CONTRIBUTORS.format(guild_id=guild_id, version=version, digest=digest)
+        cached = await CacheClient.get_decoded(cache_key, bytes)
+        if cached:
+            encoding = choose_encoding(accept_encoding, len(cached))
+            encoded = await CacheClient.get_decoded(f"{cache_key}:{encoding}", bytes) if encoding else None
+            response = _json_response(cached, accept_encoding, {"ETag": etag}, encoded)
+            if encoding and encoded is None:
+                await CacheClient.set(f"{cache_key}:{encoding}", response.body, ttl=CONTRIBUTORS_CACHE_TTL)
+            return response
+
+    all_members = await _get_cached_members(guild_id)
+    final_data = _process_contributors(all_members, body.config, body.overrides or {}, query)
+    payload = dumps(final_data)
+
+    # 成员可能刚被拉取并写入，重新读取版本号，保证 ETag 对应实际使用的数据；
+    # 计算期间快照被其他请求重写时不缓存这次结果
+    current_version = await MemberStore.get_version(guild_id)
+    if await MemberSync.is_partial(guild_id):
+        return _json_response(payload, accept_encoding, {"X-Members-Partial": "true"})
+    if current_version is None or (version is not None and current_version != version):
+        return _json_response(payload, accept_encoding)
+
+    version = current_version
+    etag = f'"{version}-{digest[:32]}"'
+    cache_key = CACHE_KEY_CONTRIBUTORS.format(guild_id=guild_id, version=version, digest=digest)
+    response = _json_response(payload, accept_encoding, {"ETag": etag})
+    async with CacheClient.pipeline() as pipe:
+        pipe.set(cache_key, payload, ttl=CONTRIBUTORS_CACHE_TTL)
+        encoding = response.headers.get("Content-Encoding")
+        if encoding:
+            pipe.set(f"{cache_key}:{encoding}", response.body, ttl=CONTRIBUTORS_CACHE_TTL)
+    return response
+
+
+async def render_contributor_view(guild_id: str, config: dict) -> bytes:
+    """
+    ContributorViews 的渲染函数：按保存的配置计算公会完整的贡献者列表。
+    """
+    body = ContributorRequest.model_validate(config)
+    members = await _get_cached_members(guild_id)
+    return dumps(_process_contributors(members, body.config, body.overrides or {}))
+
+
+def _config_summary(record: ContributorConfig) -> dict:
+    return {"name": record.name, "created_at": record.created_at, "updated_at": record.updated_at}
+
+
+@router.get("/contributors/configs", summary="List named contributor configurations")
+async def list_contributor_configs(guild_id: str = Depends(_guild_id)):
+    records = await ContributorConfig.filter(guild_id=guild_id).order_by("name")
+    return [_config_summary(record) for record in records]
+
+
+@router.get("/contributors/configs/{name}", response_model=ContributorRequest,
+            summary="Get a named contributor configuration")
+async def get_contributor_config(
+        name: str = Path(..., pattern=CONFIG_NAME_PATTERN),
+        guild_id: str = Depends(_guild_id)
+):
+    record = await ContributorConfig.get_or_none(guild_id=guild_id, name=name)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Configuration not found")
+    return record.config
+
+
+@router.put("/contributors/configs/{name}", dependencies=[Depends(require_admin)],
+            summary="Create or replace a named contributor configuration")
+async def put_contributor_config(
+        name: str = Path(..., pattern=CONFIG_NAME_PATTERN),
+        body: ContributorRequest = Body(..., description="Configuration object"),
+        guild_id: str = Depends(_guild_id)
+):
+    """
+    保存后立即物化，GET /contributors/{name} 直接返回结果。
+    """
+    if name in RESERVED_CONFIG_NAMES:
+        raise HTTPException(status_code=400, detail=f"'{name}' is a reserved name")
+    config = body.model_dump()
+    record, _ = await ContributorConfig.update_or_create(guild_id=guild_id, name=name, defaults={"config": config})
+    await ContributorViews.build(record)
+    return _config_summary(record)
+
+
+@router.delete("/contributors/configs/{name}", dependencies=[Depends(require_admin)],
+               summary="Delete a named contributor configuration")
+async def delete_contributor_config(
+        name: str = Path(..., pattern=CONFIG_NAME_PATTERN),
+        guild_id: str = Depends(_guild_id)
 ):
-    all_members = await _get_cached_members()
-    final_data = _process_contributors(all_members, body.config, body.overrides or {})
-    return final_data
+    deleted = await ContributorConfig.filter(guild_id=guild_id, name=name).delete()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Configuration not found")
+    await ContributorViews.drop(guild_id, name)
+    return {"status": "deleted", "name": name}
+
+
+@router.get("/contributors/{name}", summary="Get the precomputed contributor list of a named configuration")
+async def get_contributors_by_name(
+        name: str = Path(..., pattern=CONFIG_NAME_PATTERN),
+        guild_id: str = Depends(_guild_id),
+        if_none_match: Optional[str] = Header(None),
+        accept_encoding: Optional[str] = Header(None)
+):
+    view = await ContributorViews.get(guild_id, name, preferred_encoding(accept_encoding))
+    if view is None:
+        raise HTTPException(status_code=404, detail="Configuration not found")
+
+    etag, body, encoding = view
+    matched = matched_etag(if_none_match, etag)
+    if matched:
+        return _not_modified(matched)
+    if encoding is None:
+        return _json_response(body, accept_encoding, {"ETag": etag})
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": encoded_etag(etag, encoding), "Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+    )
 
 
 @router.post("/contributors/refresh", summary="Force refresh of Discord member cache")
-async def refresh_contributors_cache(background_tasks: BackgroundTasks):
+async def refresh_contributors_cache(
+        background_tasks: BackgroundTasks,
+        guild_id: Optional[str] = Depends(_optional_guild_id)
+):
     async def task():
-        logger.info("Starting background refresh of Discord members...")
-        if not settings.DISCORD_GUILD_ID:
+        if guild_id is None:
+            logger.warning("DISCORD_GUILD_ID not set")
             return
-        raw_data = await _fetch_raw_guild_members(settings.DISCORD_GUILD_ID)
-        if raw_data:
-            await CacheClient.set(CACHE_KEY_RAW_MEMBERS, json.dumps(raw_data), ttl=CACHE_TTL)
-            logger.info("Discord members cache updated.")
+        logger.info(f"Starting background refresh of Discord members of guild {guild_id}...")
+        count = await _load_members(guild_id)
+        if count:
+            logger.info(f"Discord members cache of guild {guild_id} updated.")
 
     background_tasks.add_task(task)
     return {"status": "refreshing", "message": "Background refresh started"}
 
 
-@router.get("/roles", response_model=List[DiscordRole], summary="Get all role groups of the server")
-async def get_guild_roles():
-    if not settings.DISCORD_GUILD_ID:
-        raise HTTPException(status_code=500, detail="Guild ID not set")
+@router.get("/members/sync", summary="Get progress of the current or last member sync")
+async def get_member_sync_status(guild_id: str = Depends(_guild_id)):
+    return await MemberSync.status(guild_id)
+
+
+async def _fetch_guild_roles(guild_id: str) -> bytes:
+    """
+    拉取并缓存序列化后的 role 列表，返回响应体。
+    """
+    response = await DiscordClient.get(f"/guilds/{guild_id}/roles")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch roles")
+
+    roles_data = loads(response.content)
+    roles_data.sort(key=lambda x: x['position'], reverse=True)
+
+    processed_roles = []
+    for r in roles_data:
+        processed_roles.append({
+            "id": r["id"],
+            "name": r["name"],
+            "color": r["color"],
+            "color_hex": _int_to_hex_color(r["color"]),
+            "position": r["position"],
+            "hoist": r.get("hoist", False),
+            "managed": r.get("managed", False),
+            "mentionable": r.get("mentionable", False)
+        })
+
+    payload = dumps(processed_roles)
+    await CacheClient.set(
+        CACHE_KEY_ROLES.format(guild_id=guild_id),
+        payload,
+        ttl=ROLES_CACHE_TTL,
+        soft_ttl=ROLES_SOFT_TTL
+    )
+    return payload
+
 
-    cache_key = f"discord:roles:{settings.DISCORD_GUILD_ID}"
-    cached_data = await CacheClient.get(cache_key)
+@router.get("/roles", response_model=List[DiscordRole], summary="Get all role groups of the server")
+async def get_guild_roles(guild_id: str = Depends(_guild_id)):
+    """
+    缓存中保存的就是响应体，原样返回，不经过 Pydantic 校验和重新编码；
+    response_model 只用于生成文档。
+    """
+    cache_key = CACHE_KEY_ROLES.format(guild_id=guild_id)
+    cached_data, stale = await CacheClient.get_with_stale(cache_key, binary=True)
     if cached_data:
-        return json.loads(cached_data)
+        if settings.DISCORD_BOT_TOKEN and stale:
+            SingleFlight.refresh(cache_key, lambda: _fetch_guild_roles(guild_id))
+        return Response(content=cached_data, media_type="application/json")
 
     if not settings.DISCORD_BOT_TOKEN:
         raise HTTPException(status_code=500, detail="Bot Token missing")
 
-    url = f"https://discord.com/api/v10/guilds/{settings.DISCORD_GUILD_ID}/roles"
-    headers = {"Authorization": f"Bot {settings.DISCORD_BOT_TOKEN}"}
-
     try:
-        response = await HttpClient.get(url, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch roles")
-
-        roles_data = response.json()
-        roles_data.sort(key=lambda x: x['position'], reverse=True)
-
-        processed_roles = []
-        for r in roles_data:
-            processed_roles.append({
-                "id": r["id"],
-                "name": r["name"],
-                "color": r["color"],
-                "color_hex": _int_to_hex_color(r["color"]),
-                "position": r["position"],
-                "hoist": r.get("hoist", False),
-                "managed": r.get("managed", False),
-                "mentionable": r.get("mentionable", False)
-            })
-
-        await CacheClient.set(cache_key, json.dumps(processed_roles), ttl=3600)
-        return processed_roles
+        payload = await SingleFlight.do(
+            cache_key,
+            lambda: _fetch_guild_roles(guild_id),
+            recheck=lambda: CacheClient.get(cache_key, binary=True)
+        )
+        return Response(content=payload, media_type="application/json")
 
     except Exception as e:
         logger.error(f"Get roles error: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+async def refresh_members_job(guild_id: str):
+    if settings.DISCORD_BOT_TOKEN:
+        await _load_members(guild_id)
+
+
+async def refresh_roles_job(guild_id: str):
+    if settings.DISCORD_BOT_TOKEN:
+        await _fetch_guild_roles(guild_id)
+
+
+async def resync_all_members():
+    """
+    网关会话重建后对所有公会做全量同步，分页请求由 MemberSync 限制并发。
+    """
+    results = await asyncio.gather(
+        *(refresh_members_job(guild_id) for guild_id in configured_guilds()),
+        return_exceptions=True
+    )
+    failed = [result for result in results if isinstance(result, Exception)]
+    for guild_id, result in zip(configured_guilds(), results):
+        if isinstance(result, Exception):
+            logger.error(f"Member resync of guild {guild_id} failed: {result}")
+    # 有公会失败时让网关在下次连接后重试
+    if failed:
+        raise failed[0]
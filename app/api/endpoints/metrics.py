@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus 文本格式，数据只属于处理本次请求的 worker。
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,11 +1,20 @@
+import asyncio
 import re
-from typing import Optional
+import time
+from functools import lru_cache
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from mcstatus import JavaServer
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from app.api.deps import require_admin
+from app.core.config import settings
 from app.core.logger import logger
+from app.services import mc_probe
+from app.services.mc_poller import MCPoller, downsample
+from app.utils.cache import CacheClient
 
 router = APIRouter()
 
@@ -24,60 +33,94 @@ class MCStatusResponse(BaseModel):
     version: Optional[str] = None
     game_version: Optional[str] = None
     latency: Optional[float] = None
+    protocol: Optional[str] = None
+    player_list: Optional[List[str]] = None
     error: Optional[str] = None
+    cached: bool = False
+    cache_age: Optional[float] = None
 
 
-def extract_game_version(raw_version: str) -> str:
+# 单次扫描：遇到 "(MC: x)" / "(Java: x)" 直接采用，否则取最后一个 1.x 版本号
+_VERSION_RE = re.compile(r"\((?:MC|Java):\s*(\d[\d.]*)|\b(1\.\d+(?:\.\d+|\.x)?)\b")
+
+
+def extract_game_version(raw_version: Optional[str]) -> str:
     """
     - "1.20.4" -> "1.20.4"
     - "git-Paper-378 (MC: 1.16.5)" -> "1.16.5"
+    - "git-Purpur-2062 (MC: 1.20.4)" / "git-Folia-17 (MC: 1.20.2)" -> "1.20.4" / "1.20.2"
     - "Velocity 1.7.2-1.21.11" -> "1.21.11"
-    - "BungeeCord 1.8.x-1.19.x" -> "1.8.x-1.19.x"
+    - "BungeeCord 1.8.x-1.19.x" / "Waterfall 1.8.x-1.20.x" -> "1.19.x" / "1.20.x"
+    - "Geyser 2.2.0 (Java: 1.20.4, Bedrock: 1.20.40 - 1.20.51)" -> "1.20.4"
     """
     if not raw_version:
         return "Unknown"
-    mc_match = re.search(r"\(MC:\s*([\d\.]+)\)", raw_version)
-    if mc_match:
-        return mc_match.group(1)
-    versions = re.findall(r"\b1\.\d+(?:\.\d+|.x)?\b", raw_version)
-
-    if versions:
-        if len(versions) > 1:
-            if "-" in raw_version and len(versions) >= 2:
-                return versions[-1]
-            return versions[-1]
-        return versions[0]
+    return _parse_game_version(raw_version)
+
 
+@lru_cache(maxsize=4096)
+def _parse_game_version(raw_version: str) -> str:
+    last_version = None
+    for match in _VERSION_RE.finditer(raw_version):
+        if match.group(1):
+            return match.group(1)
+        last_version = match.group(2)
+
+    if last_version:
+        return last_version
     return raw_version.split(" ")[-1]
 
 
-@router.get("/status", response_model=MCStatusResponse, summary="Query information about the Minecraft Java server")
-async def check_mc_server(
-        ip: str = Query(..., description="Server IP address"),
-        port: int = Query(25565, description="Server port")
-):
-    target = f"{ip}:{port}"
-    logger.info(f"Checking MC Server status: {target}")
+Protocol = Literal["java", "query", "bedrock", "auto"]
 
-    try:
-        server = await JavaServer.async_lookup(target)
-        status = await server.async_status()
 
-        raw_version_str = status.version.name
-        clean_version = extract_game_version(raw_version_str)
+class MCTarget(BaseModel):
+    ip: str
+    port: Optional[int] = Field(None, ge=1, le=65535)
+    protocol: Protocol = "java"
+    srv: bool = Field(False, description="Resolve the port from the SRV record when port is omitted (Java)")
+
+
+class MCHistoryResponse(BaseModel):
+    ip: str
+    port: Optional[int] = None
+    protocol: Protocol
+    interval: int
+    series: List[dict]
+
+
+class MCBatchRequest(BaseModel):
+    targets: List[MCTarget] = Field(..., description="Servers to query")
+    timeout: float = Field(5.0, gt=0, le=30, description="Per-target timeout (seconds)")
+
+
+def _cache_target(ip: str, port: Optional[int], protocol: str, srv: bool = False) -> str:
+    # 按 SRV 记录解析时端口可能不是默认端口，结果分开缓存
+    target = f"{ip}:{port}" if port else f"{ip}:srv" if srv else ip
+    return f"{protocol}:{target}"
+
+
+async def _probe_server(ip: str, port: Optional[int], protocol: str = "java", srv: bool = False) -> MCStatusResponse:
+    target = f"{ip}:{port}" if port else ip
+    logger.info(f"Checking MC Server status: {target} ({protocol})")
+
+    try:
+        result = await mc_probe.probe(ip, port, protocol, srv)
 
         return MCStatusResponse(
             online=True,
             ip=ip,
-            port=port,
-            motd=status.description,
+            port=result.port,
+            protocol=result.protocol,
+            motd=result.motd,
             players=PlayerInfo(
-                online=status.players.online,
-                max=status.players.max
+                online=result.players_online,
+                max=result.players_max
             ),
-            version=raw_version_str,
-            game_version=clean_version,
-            latency=status.latency
+            player_list=result.player_list,
+            version=result.version,
+            game_version=extract_game_version(result.version),
+            latency=result.latency
         )
 
     except Exception as e:
@@ -85,12 +128,183 @@ async def check_mc_server(
         error_msg = "Server is offline"
         if "gaierror" in str(e):
             error_msg = "Invalid Hostname"
-        elif "timed out" in str(e):
+        elif "timed out" in str(e) or isinstance(e, asyncio.TimeoutError):
             error_msg = "Connection Timed Out"
 
         return MCStatusResponse(
             online=False,
             ip=ip,
-            port=port,
+            port=port or _default_port(protocol),
+            protocol=None if protocol == "auto" else protocol,
             error=error_msg
         )
+
+
+def _default_port(protocol: str) -> int:
+    engine = mc_probe.ENGINES.get(protocol)
+    return engine.default_port if engine else JavaServer.DEFAULT_PORT
+
+
+def _status_ttl(online: bool) -> int:
+    return settings.MC_STATUS_CACHE_TTL if online else settings.MC_STATUS_NEGATIVE_TTL
+
+
+async def _store_status(cache_key: str, result: MCStatusResponse, ttl: int):
+    if ttl > 0:
+        await CacheClient.set_json(
+            cache_key,
+            {**result.model_dump(), "checked_at": time.time(), "ttl": ttl},
+            ttl=ttl
+        )
+
+
+async def poll_server(ip: str, port: Optional[int], protocol: str) -> MCStatusResponse:
+    """
+    供 MCPoller 使用：实时探测并写入状态缓存，所有 worker 都从缓存读取。
+    结果保留到下一轮轮询之后，轮询期间关注的服务器不会被请求触发探测。
+    """
+    result = await _probe_server(ip, port, protocol)
+    await _store_status(
+        f"mc:status:{_cache_target(ip, port, protocol)}",
+        result,
+        max(_status_ttl(result.online), settings.MC_POLL_INTERVAL * 2)
+    )
+    return result
+
+
+async def _get_status(ip: str, port: Optional[int], protocol: str = "java", srv: bool = False) -> MCStatusResponse:
+    """
+    被关注的服务器直接返回轮询器写入的最近结果；
+    其余在线结果缓存 MC_STATUS_CACHE_TTL 秒，离线/超时结果缓存 MC_STATUS_NEGATIVE_TTL 秒。
+    """
+    cache_key = f"mc:status:{_cache_target(ip, port, protocol, srv)}"
+    cached = await CacheClient.get_json(cache_key)
+    # 按 checked_at 和写入时的 ttl 再核对一次有效期，不依赖 L1 的过期时间
+    if cached and time.time() - cached.get("checked_at", 0) <= cached.get("ttl", 0):
+        # L1 中的对象是共享的，不能原地修改
+        data = dict(cached)
+        checked_at = data.pop("checked_at")
+        data.pop("ttl")
+        result = MCStatusResponse(**data)
+        result.cached = True
+        result.cache_age = round(max(0.0, time.time() - checked_at), 3)
+        return result
+
+    result = await _probe_server(ip, port, protocol, srv)
+    await _store_status(cache_key, result, _status_ttl(result.online))
+    return result
+
+
+async def _probe_with_timeout(target: MCTarget, timeout: float, semaphore: asyncio.Semaphore) -> MCStatusResponse:
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(_get_status(target.ip, target.port, target.protocol, target.srv), timeout)
+        except asyncio.TimeoutError:
+            return MCStatusResponse(
+                online=False,
+                ip=target.ip,
+                port=target.port or _default_port(target.protocol),
+                protocol=None if target.protocol == "auto" else target.protocol,
+                error="Connection Timed Out"
+            )
+
+
+@router.get("/status", response_model=MCStatusResponse, summary="Query information about a Minecraft server")
+async def check_mc_server(
+        ip: str = Query(..., description="Server IP address"),
+        port: Optional[int] = Query(
+            None, ge=1, le=65535, description="Server port, the protocol's default port (25565 for Java) when omitted"
+        ),
+        protocol: Protocol = Query("java", description="java / query (UDP, full player list) / bedrock / auto"),
+        srv: bool = Query(False, description="Resolve the port from the _minecraft._tcp SRV record when port is omitted")
+):
+    """
+    protocol=auto 时并发尝试 MC_AUTO_PROTOCOLS 中的协议，返回最先成功的结果。
+    Java 服务器未指定端口时默认不查 SRV 记录，直接连接 25565；srv=true 时按 SRV 记录确定端口。
+    """
+    return await _get_status(ip, port, protocol, srv)
+
+
+@router.post("/status/batch", summary="Query many Minecraft servers, streaming results as they finish")
+async def check_mc_servers_batch(
+        body: MCBatchRequest,
+        format: Literal["ndjson", "sse"] = Query("ndjson", description="Stream format")
+):
+    """
+    并发查询多个服务器，受 MC_BATCH_CONCURRENCY 限制；
+    每个结果完成后立即以 NDJSON 行或 SSE 事件返回，不等待最慢的服务器。
+    """
+    if len(body.targets) > settings.MC_BATCH_MAX_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many targets (max {settings.MC_BATCH_MAX_TARGETS})"
+        )
+
+    semaphore = asyncio.Semaphore(settings.MC_BATCH_CONCURRENCY)
+
+    async def stream():
+        tasks = [
+            asyncio.create_task(_probe_with_timeout(target, body.timeout, semaphore))
+            for target in body.targets
+        ]
+        try:
+            for future in asyncio.as_completed(tasks):
+                result = (await future).model_dump_json()
+                if format == "sse":
+                    yield f"event: status\ndata: {result}\n\n"
+                else:
+                    yield f"{result}\n"
+            if format == "sse":
+                yield "event: done\ndata: {}\n\n"
+        finally:
+            # 客户端中途断开时取消剩余查询
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/watch", response_model=List[MCTarget], summary="List servers watched by the background poller")
+async def list_watched_servers():
+    return [MCTarget(ip=ip, port=port, protocol=protocol) for ip, port, protocol in await MCPoller.list_watched()]
+
+
+@router.post("/watch", dependencies=[Depends(require_admin)], summary="Add a server to the background poller")
+async def watch_server(target: MCTarget):
+    try:
+        added = await MCPoller.add(target.ip, target.port, target.protocol)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "added" if added else "exists"}
+
+
+@router.delete("/watch", dependencies=[Depends(require_admin)],
+               summary="Remove a server from the background poller")
+async def unwatch_server(
+        ip: str = Query(..., description="Server IP address"),
+        port: Optional[int] = Query(None, ge=1, le=65535, description="Server port"),
+        protocol: Protocol = Query("java", description="Probe protocol")
+):
+    if not await MCPoller.remove(ip, port, protocol):
+        raise HTTPException(status_code=404, detail="Server is not watched")
+    return {"status": "removed"}
+
+
+@router.get("/history", response_model=MCHistoryResponse, summary="Get downsampled latency/player history of a watched server")
+async def get_server_history(
+        ip: str = Query(..., description="Server IP address"),
+        port: Optional[int] = Query(None, ge=1, le=65535, description="Server port"),
+        protocol: Protocol = Query("java", description="Probe protocol"),
+        points: int = Query(120, ge=1, le=1000, description="Max number of points in the series")
+):
+    samples = await MCPoller.get_history(ip, port, protocol)
+    if samples is None:
+        raise HTTPException(status_code=404, detail="Server is not watched")
+    return MCHistoryResponse(
+        ip=ip,
+        port=port,
+        protocol=protocol,
+        interval=settings.MC_POLL_INTERVAL,
+        series=downsample(samples, points)
+    )
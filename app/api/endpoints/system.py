@@ -0,0 +1,32 @@
+import asyncio
+
+from fastapi import APIRouter
+
+from app.services.avatar_proxy import AvatarDiskCache
+from app.services.guilds import configured_guilds, guild_stats
+from app.utils.cache import CacheClient
+from app.utils.http_client import HttpClient
+
+router = APIRouter()
+
+
+@router.get("/cache/stats", summary="Get hit/miss/eviction counters of each cache tier")
+async def get_cache_stats():
+    return CacheClient.stats()
+
+
+@router.get("/http/stats", summary="Get request counts and in-flight utilization of each upstream HTTP client")
+async def get_http_stats():
+    return HttpClient.stats()
+
+
+@router.get("/avatar/stats", summary="Get disk usage of the avatar image cache")
+async def get_avatar_cache_stats():
+    return AvatarDiskCache.stats()
+
+
+@router.get("/guilds/stats", summary="Get member counts, cache sizes and sync state of each configured guild")
+async def get_guild_stats():
+    guilds = configured_guilds()
+    stats = await asyncio.gather(*(guild_stats(guild_id) for guild_id in guilds))
+    return dict(zip(guilds, stats))
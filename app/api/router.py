@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import discord, minecraft, gensokyo
+from app.api.endpoints import discord, minecraft, gensokyo, system
 
 api_router = APIRouter()
 
@@ -21,3 +21,9 @@ api_router.include_router(
     prefix="/gensokyo",
     tags=["Gensokyo Reimagined"]
 )
+
+api_router.include_router(
+    system.router,
+    prefix="/system",
+    tags=["System"]
+)
@@ -1,32 +1,127 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
 
+class HttpClientProfile(BaseModel):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 5.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "My FastAPI Project"
     DEBUG: bool = True
     API_PREFIX: str = "/api"
 
+    # 管理接口（命名贡献者配置的增删改、MC 轮询列表的增删）所需的 X-Admin-Token，为空时管理接口关闭
+    ADMIN_TOKEN: str = ""
+
     # DB
     DB_URL: str = "sqlite://db.sqlite3"
     DB_MODELS: list = ["app.models", "aerich.models"]
 
     # cache
+    # L2 后端：redis / memory（进程内，不共享）/ sqlite（本地文件，重启后保留）
+    CACHE_BACKEND: str = "redis"
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    # Redis 连不上时改用进程内存储，每隔 CACHE_FALLBACK_RETRY 秒重试 Redis
+    CACHE_FALLBACK_ENABLED: bool = True
+    CACHE_FALLBACK_RETRY: int = 30
+    CACHE_MEMORY_MAX_ENTRIES: int = 10000
+    CACHE_SQLITE_PATH: str = "data/cache.sqlite3"
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 1024
+    CACHE_L1_TTL: int = 300
+    # 成员快照压缩方式：none / zlib / zstd（zstd 需要 zstandard）
+    MEMBER_SNAPSHOT_COMPRESSION: str = "zlib"
+    # 默认公会，接口不带 guild_id 时使用
     DISCORD_GUILD_ID: str = ""
+    # 额外服务的公会，各自独立缓存和刷新；未列出的 guild_id 请求返回 404
+    DISCORD_GUILD_IDS: List[str] = []
+
+    # Prometheus 指标，暴露在 /metrics
+    METRICS_ENABLED: bool = True
+
+    # 超过该字节数的 JSON 响应按 Accept-Encoding 压缩（br 需要 brotli），0 表示不压缩
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+
+    # Background refresh
+    SCHEDULER_ENABLED: bool = True
+    REFRESH_MEMBERS_INTERVAL: int = 60 * 60 * 3
+    # 所有公会的成员同步共用的分页请求并发数，按页轮流占用
+    MEMBER_SYNC_CONCURRENCY: int = 2
+    REFRESH_ROLES_INTERVAL: int = 60 * 5
+    REFRESH_AVATARS_INTERVAL: int = 60 * 5
+    HOT_AVATAR_LIMIT: int = 200
+    AVATAR_BATCH_MAX_IDS: int = 500
+    AVATAR_BATCH_CONCURRENCY: int = 8
+    # 头像代理：直接返回图片而不是跳转到 Discord CDN，图片缓存在本地磁盘
+    AVATAR_PROXY_ENABLED: bool = False
+    AVATAR_PROXY_DIR: str = "data/avatars"
+    AVATAR_PROXY_MAX_BYTES: int = 512 * 1024 * 1024
+    AVATAR_PROXY_MAX_AGE: int = 60 * 10
+
+    # Minecraft
+    MC_BATCH_CONCURRENCY: int = 16
+    MC_BATCH_MAX_TARGETS: int = 100
+    MC_STATUS_CACHE_TTL: int = 30
+    MC_STATUS_NEGATIVE_TTL: int = 10
+    MC_DNS_CACHE_TTL: int = 300
+    MC_PROBE_TIMEOUT: float = 3.0
+    # protocol=auto 时并发尝试的协议，只能是 java / query / bedrock，启动时校验
+    MC_AUTO_PROTOCOLS: List[Literal["java", "query", "bedrock"]] = Field(["java", "bedrock"], min_length=1)
+    # 后台轮询，MC_WATCHED_SERVERS 为 "host"、"host:port" 或 "bedrock://host:port"
+    MC_POLL_ENABLED: bool = True
+    MC_POLL_INTERVAL: int = 30
+    MC_POLL_TIMEOUT: float = 5.0
+    MC_POLL_HISTORY_SIZE: int = 2880
+    MC_POLL_MAX_SERVERS: int = 50
+    MC_WATCHED_SERVERS: List[str] = []
 
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_RETENTION_DAYS: int = 7
     LOG_DIR: str = "logs"
+    # text: Rich 控制台 + 文本文件；json: 每行一条 JSON
+    LOG_FORMAT: str = "text"
+    # 日志先进内存队列，由后台线程输出；0 表示同步输出
+    LOG_QUEUE_SIZE: int = 10000
+    # INFO 及以下每个消息模板每秒最多输出的条数，0 表示不限
+    LOG_SAMPLE_RATE: int = 20
 
     # Proxy
     HTTP_PROXY: Optional[str] = None
 
+    # HTTP client，每个上游一个连接池，环境变量中以 JSON 配置
+    HTTP_CLIENT_PROFILES: Dict[str, HttpClientProfile] = {
+        "default": HttpClientProfile(),
+        "discord_api": HttpClientProfile(max_connections=50, keepalive_expiry=30.0, http2=True, read_timeout=20.0),
+        "discord_cdn": HttpClientProfile(max_connections=50, keepalive_expiry=30.0, http2=True, read_timeout=15.0),
+    }
+    HTTP_CLIENT_HOST_PROFILES: Dict[str, str] = {
+        "discord.com": "discord_api",
+        "cdn.discordapp.com": "discord_cdn",
+        "media.discordapp.net": "discord_cdn",
+    }
+
     # Discord
     DISCORD_BOT_TOKEN: str = ""
+    DISCORD_API_BASE: str = "https://discord.com/api/v10"
+    DISCORD_GLOBAL_RATE_LIMIT: int = 50  # 每秒请求数
+    DISCORD_RETRY_BASE_DELAY: float = 0.5
+    DISCORD_RETRY_MAX_DELAY: float = 30
+    # 启用后通过网关事件增量同步成员，需要 websockets 和 GUILD_MEMBERS 特权 intent
+    DISCORD_GATEWAY_ENABLED: bool = False
+    DISCORD_GATEWAY_URL: str = "wss://gateway.discord.gg/?v=10&encoding=json"
 
     class Config:
         env_file = ".env"
@@ -1,33 +1,127 @@
+import atexit
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Dict, List, Optional, Tuple
 
 from rich.logging import RichHandler
 
 from app.core.config import settings
-
-
-def setup_logger():
-    if not os.path.exists(settings.LOG_DIR):
-        os.makedirs(settings.LOG_DIR)
-
-    logger = logging.getLogger()
-    logger.setLevel(settings.LOG_LEVEL)
-
-    logger.handlers = []
-
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(name)s:%(lineno)d - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
-    console_formatter = logging.Formatter("[%(name)s] %(message)s")
-
-    console_handler = RichHandler(
-        rich_tracebacks=True,
-        markup=True,
-        show_path=False
-    )
+from app.utils.serialization import dumps
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    每条日志一行 JSON，便于日志采集系统解析。
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    """
+    在消息后附上 SamplingFilter 记录的被丢弃条数。
+    """
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            # record.message 每次 format 都会由 getMessage() 重新生成，这里改它不会重复追加
+            record.message = f"{record.message} (+{suppressed} similar messages suppressed)"
+        return super().formatMessage(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    INFO 及以下的日志按消息模板限流，每个模板每秒最多放行 rate 条，
+    被丢弃的条数记在下一条放行日志的 suppressed 属性上，由 formatter 输出，
+    不改动 msg/args（消息中可能有字面的 %）。WARNING 及以上不受影响。
+    依赖 %-style 的模板，f-string 拼好的消息每条都不同，限流不起作用。
+    """
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        # (logger, 模板) -> [当前窗口开始时间, 窗口内已放行条数, 被丢弃条数]
+        self._windows: Dict[Tuple[str, str], List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else "")
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= 1:
+            if len(self._windows) > 10000:
+                self._windows.clear()
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if window[1] < self.rate:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    直接把 LogRecord 放进队列，消息格式化、异常堆栈渲染都留给后台线程。
+    标准 QueueHandler.prepare 会在调用线程（事件循环）上先格式化一遍。
+    队列满时丢弃并计数，不阻塞调用方。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def _build_handlers() -> List[logging.Handler]:
+    json_mode = settings.LOG_FORMAT.lower() == "json"
+
+    if json_mode:
+        file_formatter = console_formatter = JsonFormatter()
+        console_handler = logging.StreamHandler()
+    else:
+        file_formatter = TextFormatter(
+            "%(asctime)s - %(levelname)s - %(name)s:%(lineno)d - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
+        console_formatter = TextFormatter("[%(name)s] %(message)s")
+        console_handler = RichHandler(
+            rich_tracebacks=True,
+            markup=True,
+            show_path=False
+        )
     console_handler.setFormatter(console_formatter)
     console_handler.setLevel(settings.LOG_LEVEL)
 
@@ -44,8 +138,38 @@ def setup_logger():
     file_handler.setFormatter(file_formatter)
     file_handler.setLevel(settings.LOG_LEVEL)
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    return [console_handler, file_handler]
+
+
+def setup_logger():
+    """
+    根 logger 只挂一个 QueueHandler，控制台和文件输出由后台 QueueListener 线程完成，
+    事件循环上只剩一次入队。LOG_QUEUE_SIZE 为 0 时退回同步输出。
+    """
+    global _listener
+
+    if not os.path.exists(settings.LOG_DIR):
+        os.makedirs(settings.LOG_DIR)
+
+    logger = logging.getLogger()
+    logger.setLevel(settings.LOG_LEVEL)
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    logger.handlers = []
+
+    handlers = _build_handlers()
+    if settings.LOG_QUEUE_SIZE > 0:
+        queue_handler = LazyQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+        _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        handlers = [queue_handler]
+
+    for handler in handlers:
+        if settings.LOG_SAMPLE_RATE > 0:
+            handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+        logger.addHandler(handler)
 
     logging.getLogger("uvicorn.access").handlers = []
     logging.getLogger("tortoise").setLevel(logging.WARNING)
@@ -53,4 +177,15 @@ def setup_logger():
     return logger
 
 
+def stop_logger():
+    """
+    停止后台线程，队列中剩余的日志会先写完。
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 logger = setup_logger()
+atexit.register(stop_logger)
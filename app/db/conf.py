@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from app.core.config import settings
 
 TORTOISE_ORM = {
@@ -11,3 +13,6 @@ TORTOISE_ORM = {
         },
     },
 }
+
+# aerich 迁移目录，与 pyproject.toml 的 [tool.aerich] location 一致
+MIGRATIONS_LOCATION = str(Path(__file__).resolve().parents[2] / "migrations")
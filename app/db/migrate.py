@@ -0,0 +1,74 @@
+"""
+启动时按 migrations/ 中的 aerich 迁移升级数据库。
+"""
+import asyncio
+from typing import List
+
+from aerich import Command
+from aerich.migrate import Migrate
+from aerich.models import Aerich
+from aerich.utils import decompress_dict, get_app_connection, import_py_module
+from tortoise.exceptions import OperationalError
+
+from app.core.logger import logger
+from app.db.conf import MIGRATIONS_LOCATION, TORTOISE_ORM
+from app.utils.cache import CacheClient
+
+APP = "models"
+# 多个 worker 同时启动时只让一个执行迁移，其余等它完成后发现已是最新
+MIGRATE_LOCK = "db:migrate"
+MIGRATE_LOCK_TTL = 300
+# 引入迁移之前由 generate_schemas 建表，那时的表结构对应这个版本
+LEGACY_SCHEMA_VERSION = 1
+
+
+async def _is_legacy_schema() -> bool:
+    """
+    没有迁移记录，但 generate_schemas 已经按 LEGACY_SCHEMA_VERSION 的结构建好了表。
+    只有 guild_id 列之前的旧表不算：0 号迁移建表时跳过已有的表，1 号迁移照常执行。
+    """
+    try:
+        if await Aerich.filter(app=APP).exists():
+            return False
+        # 列名要带表名：SQLite 会把不存在的裸列名当成字符串常量
+        await get_app_connection(TORTOISE_ORM, APP).execute_query(
+            'SELECT "contributor_config"."guild_id" FROM "contributor_config" LIMIT 1'
+        )
+    except OperationalError:
+        return False
+    return True
+
+
+async def _record_legacy_schema() -> None:
+    """
+    只记录 LEGACY_SCHEMA_VERSION 及之前的迁移，不执行；之后的迁移照常升级。
+    """
+    for module in Migrate.get_all_version_modules():
+        if int(module.name.split("_", 1)[0]) > LEGACY_SCHEMA_VERSION:
+            break
+        content = decompress_dict(import_py_module(module).MODELS_STATE)
+        await Aerich.create(version=f"{module.name}.py", app=APP, content=content)
+        logger.info(f"Recorded migration {module.name} for schema created by generate_schemas")
+
+
+async def upgrade_db() -> List[str]:
+    """
+    需要 Tortoise 和 CacheClient 已经初始化。返回本次执行的迁移文件。
+    """
+    while not (token := await CacheClient.acquire_lock(MIGRATE_LOCK, MIGRATE_LOCK_TTL)):
+        await asyncio.sleep(0.5)
+    try:
+        return await _upgrade()
+    finally:
+        await CacheClient.release_lock(MIGRATE_LOCK, token)
+
+
+async def _upgrade() -> List[str]:
+    command = Command(tortoise_config=TORTOISE_ORM, app=APP, location=MIGRATIONS_LOCATION)
+    await command.init()
+    if await _is_legacy_schema():
+        await _record_legacy_schema()
+    migrated = await command.upgrade()
+    for version in migrated:
+        logger.info(f"Applied migration {version}")
+    return migrated
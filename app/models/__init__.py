@@ -0,0 +1,3 @@
+from app.models.contributor import ContributorConfig
+
+__all__ = ["ContributorConfig"]
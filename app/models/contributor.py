@@ -0,0 +1,19 @@
+from tortoise import fields
+from tortoise.models import Model
+
+
+class ContributorConfig(Model):
+    """
+    命名的贡献者配置，config 为 ContributorRequest 的 JSON。
+    role id 只在所属公会内有意义，名字在每个公会内唯一。
+    """
+    id = fields.IntField(primary_key=True)
+    guild_id = fields.CharField(max_length=32)
+    name = fields.CharField(max_length=64)
+    config = fields.JSONField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "contributor_config"
+        unique_together = (("guild_id", "name"),)
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.http_client import HttpClient
+from app.utils.singleflight import SingleFlight
+
+# Discord CDN 支持的尺寸
+ALLOWED_SIZES = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+DEFAULT_SIZE = 1024
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MEDIA_TYPES = {"png": "image/png", "gif": "image/gif"}
+
+_AVATAR_URL_RE = re.compile(
+    r"^https://cdn\.discordapp\.com/(?:avatars/\d+/(?P<hash>\w+)|embed/avatars/(?P<default>\d+))\.(?P<ext>png|gif)"
+)
+
+
+@dataclass
+class AvatarVariant:
+    name: str
+    source_url: str
+    media_type: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.name}"'
+
+
+def avatar_variant(url: str, size: Optional[int]) -> Optional[AvatarVariant]:
+    """
+    由 CDN 地址得到磁盘缓存的文件名。头像 hash 随图片内容变化，直接用作 key；
+    默认头像只有固定的几张，不区分尺寸。无法识别的地址返回 None。
+    """
+    match = _AVATAR_URL_RE.match(url)
+    if not match:
+        return None
+    ext = match.group("ext")
+    if match.group("default") is not None:
+        name = f"embed_{match.group('default')}.{ext}"
+        return AvatarVariant(name, url.split("?", 1)[0], MEDIA_TYPES[ext])
+
+    size = size or DEFAULT_SIZE
+    avatar_hash = match.group("hash")
+    source_url = f"{url.split('?', 1)[0]}?size={size}"
+    return AvatarVariant(f"{avatar_hash}_{size}.{ext}", source_url, MEDIA_TYPES[ext])
+
+
+class AvatarDiskCache:
+    """
+    头像图片的本地磁盘缓存，按 AVATAR_PROXY_MAX_BYTES 做 LRU 淘汰。
+    索引保存在进程内，启动后第一次使用时按文件修改时间扫描目录重建；
+    多 worker 时各自只统计自己见过的文件，实际占用可能略超预算。
+    """
+    _entries: "OrderedDict[str, int]" = OrderedDict()
+    _total_bytes = 0
+    _loaded = False
+    _load_lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def _path(cls, name: str) -> str:
+        # 按前两位分目录，避免单目录文件过多
+        return os.path.join(settings.AVATAR_PROXY_DIR, name[:2], name)
+
+    @classmethod
+    def _scan(cls) -> list:
+        files = []
+        now = time.time()
+        if not os.path.isdir(settings.AVATAR_PROXY_DIR):
+            return files
+        for shard in os.scandir(settings.AVATAR_PROXY_DIR):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.endswith(".tmp"):
+                    # 上次退出时没写完的下载；较新的可能是其他 worker 正在写
+                    if stat.st_mtime < now - 60:
+                        os.unlink(entry.path)
+                    continue
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        return files
+
+    @classmethod
+    async def _ensure_loaded(cls):
+        if cls._loaded:
+            return
+        if cls._load_lock is None:
+            cls._load_lock = asyncio.Lock()
+        async with cls._load_lock:
+            if cls._loaded:
+                return
+            files = await asyncio.to_thread(cls._scan)
+            for _, name, size in files:
+                cls._entries[name] = size
+                cls._total_bytes += size
+            cls._loaded = True
+            logger.info(f"Avatar disk cache loaded: {len(files)} files, {cls._total_bytes} bytes")
+            await cls._evict()
+
+    @staticmethod
+    def _stat(path: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    async def _lookup(cls, name: str) -> Optional[Tuple[str, os.stat_result]]:
+        if name not in cls._entries:
+            return None
+        path = cls._path(name)
+        stat = await asyncio.to_thread(cls._stat, path)
+        if stat is None:
+            # 被其他 worker 淘汰了
+            if name in cls._entries:
+                cls._total_bytes -= cls._entries.pop(name)
+            return None
+        if name in cls._entries:
+            cls._entries.move_to_end(name)
+        return path, stat
+
+    @staticmethod
+    def _discard(f, tmp_path: str):
+        f.close()
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    async def _download(cls, variant: AvatarVariant) -> str:
+        """
+        边下载边写入临时文件，写完再 rename，其他 worker 不会读到写了一半的文件。
+        磁盘写入都在线程中进行，超过 MAX_IMAGE_BYTES 时中止并删除临时文件。
+        """
+        path = cls._path(variant.name)
+        if await asyncio.to_thread(os.path.exists, path):
+            return path
+
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            size = 0
+            async with HttpClient.stream("GET", variant.source_url, profile="discord_cdn") as response:
+                if response.status_code != 200:
+                    raise ValueError(f"CDN returned {response.status_code} for {variant.source_url}")
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    size += len(chunk)
+                    if size > MAX_IMAGE_BYTES:
+                        raise ValueError(f"Avatar larger than {MAX_IMAGE_BYTES} bytes")
+                    await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(os.replace, tmp_path, path)
+        except BaseException:
+            await asyncio.to_thread(cls._discard, f, tmp_path)
+            raise
+        return path
+
+    @classmethod
+    async def get(cls, variant: AvatarVariant) -> Optional[Tuple[str, os.stat_result]]:
+        """
+        返回本地文件路径和 stat 结果，不在缓存中时从 CDN 下载；
+        下载失败或文件刚写入就被其他 worker 淘汰时返回 None，由调用方退回跳转。
+        stat 结果交给 FileResponse，发送前不必再检查文件是否存在。
+        """
+        await cls._ensure_loaded()
+        cached = await cls._lookup(variant.name)
+        if cached:
+            return cached
+
+        try:
+            path = await SingleFlight.do(
+                f"avatar_file:{variant.name}",
+                lambda: cls._download(variant),
+                recheck=lambda: cls._recheck(variant.name)
+            )
+        except Exception as e:
+            logger.warning(f"Avatar proxy download failed: {e}")
+            return None
+
+        stat = await asyncio.to_thread(cls._stat, path)
+        if stat is None:
+            return None
+        if variant.name not in cls._entries:
+            cls._entries[variant.name] = stat.st_size
+            cls._total_bytes += stat.st_size
+            await cls._evict()
+        return path, stat
+
+    @classmethod
+    async def _recheck(cls, name: str) -> Optional[str]:
+        path = cls._path(name)
+        return path if await asyncio.to_thread(os.path.exists, path) else None
+
+    @classmethod
+    async def _evict(cls):
+        victims = []
+        while cls._total_bytes > settings.AVATAR_PROXY_MAX_BYTES and len(cls._entries) > 1:
+            name, size = cls._entries.popitem(last=False)
+            cls._total_bytes -= size
+            victims.append(cls._path(name))
+        if victims:
+            await asyncio.to_thread(cls._unlink_all, victims)
+
+    @staticmethod
+    def _unlink_all(paths: list):
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "enabled": settings.AVATAR_PROXY_ENABLED,
+            "files": len(cls._entries),
+            "bytes": cls._total_bytes,
+            "max_bytes": settings.AVATAR_PROXY_MAX_BYTES,
+        }
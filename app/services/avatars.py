@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, Optional
+
+from app.core.logger import logger
+from app.utils.cache import CacheClient
+
+CACHE_KEY_AVATAR = "discord:avatar:{user_id}"
+AVATAR_CACHE_TTL = 60 * 60 * 24
+AVATAR_SOFT_TTL = 60 * 10
+
+
+def build_avatar_url(user_id: str, avatar: Optional[str], discriminator: Optional[str] = "0", size: int = 1024) -> str:
+    """
+    有自定义头像时返回 CDN 地址，否则按 Discord 规则返回默认头像。
+    """
+    if avatar:
+        ext = "gif" if avatar.startswith("a_") else "png"
+        return f"https://cdn.discordapp.com/avatars/{user_id}/{avatar}.{ext}?size={size}"
+    if not discriminator or discriminator == "0":
+        idx = (int(user_id) >> 22) % 6
+    else:
+        idx = int(discriminator) % 5
+    return f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
+
+
+def avatar_urls_from_members(members: Iterable[dict], user_ids: Optional[set] = None) -> Dict[str, str]:
+    """
+    从成员列表计算头像地址；给定 user_ids 时只计算其中的用户。
+    """
+    urls = {}
+    for member in members:
+        user = member.get("user") or {}
+        user_id = user.get("id")
+        if not user_id or (user_ids is not None and user_id not in user_ids):
+            continue
+        urls[user_id] = build_avatar_url(user_id, user.get("avatar"), user.get("discriminator", "0"))
+    return urls
+
+
+async def warm_avatar_cache(members: Iterable[dict]):
+    """
+    成员同步后用一个 pipeline 写入所有头像地址，头像接口无需再逐个请求 /users/{id}。
+    """
+    urls = avatar_urls_from_members(members)
+    if not urls:
+        return
+    mapping = {CACHE_KEY_AVATAR.format(user_id=user_id): url for user_id, url in urls.items()}
+    if await CacheClient.mset_with_ttl(mapping, ttl=AVATAR_CACHE_TTL, soft_ttl=AVATAR_SOFT_TTL):
+        logger.info(f"Warmed {len(mapping)} avatar cache entries")
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.logger import logger
+from app.models import ContributorConfig
+from app.services.member_sync import MemberSync
+from app.utils.cache import CacheClient
+from app.utils.compression import SUPPORTED_ENCODINGS, compress, should_compress
+from app.utils.singleflight import SingleFlight
+
+# 值为 ETag + "\n" + 响应体；压缩版本存在 {key}:{encoding}
+CACHE_KEY_CONTRIBUTOR_VIEW = "gensokyo:contributors:view:{guild_id}:{name}"
+VIEW_CACHE_TTL = 60 * 60 * 24
+REBUILD_DELAY = 1  # 合并短时间内的多次快照写入
+# 写入或删除一个结果前持有，检查配置版本和写入之间不会插入其他 worker 的写入
+STORE_LOCK = "gensokyo:contributors:store:{guild_id}:{name}"
+STORE_LOCK_TTL = 10
+
+
+def _encode_view(etag: str, body: bytes) -> bytes:
+    return etag.encode("ascii") + b"\n" + body
+
+
+def _decode_view(data: bytes) -> Tuple[str, bytes]:
+    etag, _, body = data.partition(b"\n")
+    return etag.decode("ascii"), body
+
+
+class ContributorViews:
+    """
+    命名贡献者配置的物化结果，配置和结果都按公会区分。
+    配置保存或该公会的成员快照重写后重新计算并写入缓存，读取时只取一个 key；
+    缓存缺失（过期或刚启动）时按数据库中的配置现算一次。
+    成员同步未完成（部分快照）时计算的结果不写入缓存。
+    计算期间配置被修改或删除时，旧配置的结果不写入缓存，以 updated_at 作为配置的版本。
+    """
+    _render: Optional[Callable[[str, dict], Awaitable[bytes]]] = None
+    _rebuild_tasks: Dict[str, asyncio.Task] = {}
+    _dirty: Set[str] = set()
+
+    @classmethod
+    def set_renderer(cls, render: Callable[[str, dict], Awaitable[bytes]]):
+        """
+        :param render: Coroutine turning a guild id and a stored ContributorRequest JSON into the response body
+        """
+        cls._render = render
+
+    @staticmethod
+    def _key(guild_id: str, name: str) -> str:
+        return CACHE_KEY_CONTRIBUTOR_VIEW.format(guild_id=guild_id, name=name)
+
+    @classmethod
+    async def get(
+            cls,
+            guild_id: str,
+            name: str,
+            encoding: Optional[str] = None
+    ) -> Optional[Tuple[str, bytes, Optional[str]]]:
+        """
+        返回 (ETag, 响应体, 响应体的编码)。有对应编码的压缩版本时直接返回它，
+        否则返回未压缩的版本；配置不存在时返回 None。
+        """
+        key = cls._key(guild_id, name)
+        if encoding:
+            cached = await CacheClient.get_decoded(f"{key}:{encoding}", _decode_view)
+            if cached:
+                return cached[0], cached[1], encoding
+
+        cached = await CacheClient.get_decoded(key, _decode_view)
+        if cached:
+            return cached[0], cached[1], None
+
+        view = await SingleFlight.do(
+            key,
+            lambda: cls._build_from_db(guild_id, name),
+            recheck=lambda: CacheClient.get_decoded(key, _decode_view)
+        )
+        if view is None:
+            return None
+        return view[0], view[1], None
+
+    @classmethod
+    async def _build_from_db(cls, guild_id: str, name: str) -> Optional[Tuple[str, bytes]]:
+        record = await ContributorConfig.get_or_none(guild_id=guild_id, name=name)
+        if record is None:
+            return None
+        return await cls.build(record)
+
+    @staticmethod
+    @asynccontextmanager
+    async def _store_lock(guild_id: str, name: str):
+        lock_name = STORE_LOCK.format(guild_id=guild_id, name=name)
+        while not (token := await CacheClient.acquire_lock(lock_name, STORE_LOCK_TTL)):
+            await asyncio.sleep(0.05)
+        try:
+            yield
+        finally:
+            await CacheClient.release_lock(lock_name, token)
+
+    @classmethod
+    async def build(cls, record: ContributorConfig) -> Tuple[str, bytes]:
+        """
+        计算并写入一个命名配置的结果，返回 (ETag, 响应体)。
+        数据库中的配置已不是 record 的版本时只返回结果，由修改它的一方写入。
+        """
+        guild_id, name = record.guild_id, record.name
+        body = await cls._render(guild_id, record.config)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        if await MemberSync.is_partial(guild_id):
+            return etag, body
+
+        key = cls._key(guild_id, name)
+        async with cls._store_lock(guild_id, name):
+            current = await ContributorConfig.get_or_none(guild_id=guild_id, name=name).only("updated_at")
+            if current is None or current.updated_at != record.updated_at:
+                logger.debug(f"Contributor config {guild_id}/{name} changed while rendering, result not stored")
+                return etag, body
+            async with CacheClient.pipeline() as pipe:
+                pipe.set(key, _encode_view(etag, body), ttl=VIEW_CACHE_TTL)
+                for encoding in SUPPORTED_ENCODINGS:
+                    if should_compress(len(body)):
+                        pipe.set(f"{key}:{encoding}", _encode_view(etag, compress(body, encoding)), ttl=VIEW_CACHE_TTL)
+                    else:
+                        pipe.delete(f"{key}:{encoding}")
+        return etag, body
+
+    @classmethod
+    async def drop(cls, guild_id: str, name: str):
+        """
+        配置从数据库删除后调用。
+        """
+        key = cls._key(guild_id, name)
+        async with cls._store_lock(guild_id, name):
+            await CacheClient.delete_many([key] + [f"{key}:{encoding}" for encoding in SUPPORTED_ENCODINGS])
+
+    @classmethod
+    async def schedule_rebuild(cls, guild_id: str):
+        """
+        公会的成员快照重写后调用。该公会的重建进行中再次调用时，结束后再重建一轮。
+        """
+        if cls._render is None:
+            return
+        task = cls._rebuild_tasks.get(guild_id)
+        if task is not None and not task.done():
+            cls._dirty.add(guild_id)
+            return
+        cls._rebuild_tasks[guild_id] = asyncio.create_task(cls._rebuild_loop(guild_id))
+
+    @classmethod
+    async def _rebuild_loop(cls, guild_id: str):
+        while True:
+            cls._dirty.discard(guild_id)
+            await asyncio.sleep(REBUILD_DELAY)
+            try:
+                await cls.rebuild_all(guild_id)
+            except Exception as e:
+                logger.error(f"Failed to rebuild contributor views of guild {guild_id}: {e}")
+            if guild_id not in cls._dirty:
+                return
+
+    @classmethod
+    async def rebuild_all(cls, guild_id: str):
+        records = await ContributorConfig.filter(guild_id=guild_id)
+        for record in records:
+            await cls.build(record)
+        if records:
+            logger.info(f"Rebuilt {len(records)} contributor views of guild {guild_id}")
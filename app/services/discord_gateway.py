@@ -0,0 +1,227 @@
+import asyncio
+import json
+import random
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.guilds import configured_guilds
+from app.services.member_store import MemberStore, member_from_event
+from app.utils.cache import CacheClient
+
+try:
+    import websockets
+except ImportError:  # 可选依赖，只有启用网关同步时才需要
+    websockets = None
+
+# https://discord.com/developers/docs/topics/gateway#gateway-intents
+INTENT_GUILDS = 1 << 0
+INTENT_GUILD_MEMBERS = 1 << 1
+
+OP_DISPATCH = 0
+OP_HEARTBEAT = 1
+OP_IDENTIFY = 2
+OP_RESUME = 6
+OP_RECONNECT = 7
+OP_INVALID_SESSION = 9
+OP_HELLO = 10
+OP_HEARTBEAT_ACK = 11
+
+LEADER_LOCK = "gateway:leader"
+LEADER_LOCK_TTL = 30
+
+
+class _Reconnect(Exception):
+    pass
+
+
+class DiscordGateway:
+    """
+    通过 Discord Gateway 接收 GUILD_MEMBER_ADD/UPDATE/REMOVE，增量更新对应公会的 MemberStore。
+    一条连接收到 bot 所在全部公会的事件，只处理已配置的公会。
+    启动时以及会话无法 resume（期间的事件已丢失）时调用 resync 对所有公会做一次全量同步。
+    多 worker 下通过 Redis 锁只保留一条网关连接。
+    """
+    _task: Optional[asyncio.Task] = None
+    _resync: Optional[Callable[[], Awaitable[None]]] = None
+
+    _session_id: Optional[str] = None
+    _resume_url: Optional[str] = None
+    _seq: Optional[int] = None
+    _heartbeat_acked = True
+    _needs_resync = True
+
+    @classmethod
+    def start(cls, resync: Callable[[], Awaitable[None]]):
+        if websockets is None:
+            logger.error("DISCORD_GATEWAY_ENABLED is set but the 'websockets' package is not installed")
+            return
+        if not settings.DISCORD_BOT_TOKEN or not configured_guilds():
+            logger.warning("Discord gateway disabled: bot token or guild id missing")
+            return
+        cls._resync = resync
+        cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls):
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            token = await CacheClient.acquire_lock(LEADER_LOCK, LEADER_LOCK_TTL)
+            if not token:
+                await asyncio.sleep(LEADER_LOCK_TTL / 2)
+                continue
+
+            logger.info("Acquired gateway leadership")
+            keepalive = asyncio.create_task(cls._keep_leadership(token))
+            session = asyncio.create_task(cls._run_sessions())
+            try:
+                # 任意一个结束（失去锁或会话退出）都放弃本轮领导权
+                await asyncio.wait({keepalive, session}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                keepalive.cancel()
+                session.cancel()
+                await asyncio.gather(keepalive, session, return_exceptions=True)
+                await CacheClient.release_lock(LEADER_LOCK, token)
+                cls._needs_resync = True
+
+    @classmethod
+    async def _keep_leadership(cls, token: str):
+        while True:
+            await asyncio.sleep(LEADER_LOCK_TTL / 3)
+            if not await CacheClient.extend_lock(LEADER_LOCK, token, LEADER_LOCK_TTL):
+                logger.warning("Lost gateway leadership")
+                return
+
+    @classmethod
+    async def _run_sessions(cls):
+        retry_delay = 1
+        while True:
+            try:
+                await cls._connect()
+                retry_delay = 1
+            except asyncio.CancelledError:
+                raise
+            except _Reconnect:
+                pass
+            except Exception as e:
+                logger.warning(f"Gateway connection error: {e}, reconnecting in {retry_delay}s")
+                await asyncio.sleep(retry_delay + random.random())
+                retry_delay = min(retry_delay * 2, 60)
+
+    @classmethod
+    async def _connect(cls):
+        resuming = cls._session_id is not None and cls._seq is not None
+        url = cls._resume_url if (resuming and cls._resume_url) else settings.DISCORD_GATEWAY_URL
+
+        async with websockets.connect(url, max_size=None) as ws:
+            hello = json.loads(await ws.recv())
+            if hello.get("op") != OP_HELLO:
+                raise _Reconnect()
+            interval = hello["d"]["heartbeat_interval"] / 1000
+
+            if resuming:
+                await ws.send(json.dumps({"op": OP_RESUME, "d": {
+                    "token": settings.DISCORD_BOT_TOKEN,
+                    "session_id": cls._session_id,
+                    "seq": cls._seq,
+                }}))
+            else:
+                await cls._identify(ws)
+
+            heartbeat = asyncio.create_task(cls._heartbeat(ws, interval))
+            # 全量分页耗时较长，放到后台，心跳和事件处理不能停
+            resync = asyncio.create_task(cls._full_resync()) if cls._needs_resync else None
+            try:
+                async for message in ws:
+                    await cls._handle(ws, json.loads(message))
+            finally:
+                heartbeat.cancel()
+                if resync:
+                    resync.cancel()
+
+    @classmethod
+    async def _identify(cls, ws):
+        cls._session_id = None
+        cls._resume_url = None
+        cls._seq = None
+        # 新会话意味着断开期间的事件都拿不到了
+        cls._needs_resync = True
+        await ws.send(json.dumps({"op": OP_IDENTIFY, "d": {
+            "token": settings.DISCORD_BOT_TOKEN,
+            "intents": INTENT_GUILDS | INTENT_GUILD_MEMBERS,
+            "properties": {"os": "linux", "browser": settings.PROJECT_NAME, "device": settings.PROJECT_NAME},
+        }}))
+
+    @classmethod
+    async def _full_resync(cls):
+        logger.info("Gateway: running full member resync")
+        try:
+            await cls._resync()
+            cls._needs_resync = False
+        except Exception as e:
+            logger.error(f"Gateway full resync failed: {e}")
+
+    @classmethod
+    async def _heartbeat(cls, ws, interval: float):
+        cls._heartbeat_acked = True
+        await asyncio.sleep(interval * random.random())
+        while True:
+            if not cls._heartbeat_acked:
+                logger.warning("Gateway heartbeat not acknowledged, reconnecting")
+                await ws.close(code=4000)
+                return
+            cls._heartbeat_acked = False
+            await ws.send(json.dumps({"op": OP_HEARTBEAT, "d": cls._seq}))
+            await asyncio.sleep(interval)
+
+    @classmethod
+    async def _handle(cls, ws, payload: dict):
+        op = payload.get("op")
+        if payload.get("s") is not None:
+            cls._seq = payload["s"]
+
+        if op == OP_DISPATCH:
+            await cls._dispatch(payload.get("t"), payload.get("d") or {})
+        elif op == OP_HEARTBEAT:
+            await ws.send(json.dumps({"op": OP_HEARTBEAT, "d": cls._seq}))
+        elif op == OP_HEARTBEAT_ACK:
+            cls._heartbeat_acked = True
+        elif op == OP_RECONNECT:
+            raise _Reconnect()
+        elif op == OP_INVALID_SESSION:
+            if not payload.get("d"):
+                cls._session_id = None
+                cls._seq = None
+            await asyncio.sleep(1 + random.random() * 4)
+            raise _Reconnect()
+
+    @classmethod
+    async def _dispatch(cls, event: Optional[str], data: dict):
+        if event == "READY":
+            cls._session_id = data.get("session_id")
+            resume_url = data.get("resume_gateway_url")
+            if resume_url and "?" not in resume_url:
+                resume_url = f"{resume_url}/?v=10&encoding=json"
+            cls._resume_url = resume_url
+            return
+        if event == "RESUMED":
+            logger.info("Gateway session resumed")
+            return
+
+        guild_id = data.get("guild_id")
+        if guild_id not in configured_guilds():
+            return
+
+        if event in ("GUILD_MEMBER_ADD", "GUILD_MEMBER_UPDATE"):
+            await MemberStore.upsert(guild_id, member_from_event(data))
+        elif event == "GUILD_MEMBER_REMOVE":
+            await MemberStore.remove(guild_id, data["user"]["id"])
@@ -0,0 +1,50 @@
+"""
+服务的公会列表。DISCORD_GUILD_ID 为默认公会，DISCORD_GUILD_IDS 为额外的公会；
+每个公会的缓存 key 都带 guild id，同步和刷新任务也按公会分开。
+"""
+from typing import List, Optional
+
+from app.core.config import settings
+from app.services.member_store import MemberStore
+from app.services.member_sync import MemberSync
+from app.utils.cache import CacheClient
+
+CACHE_KEY_ROLES = "discord:roles:{guild_id}"
+
+
+def configured_guilds() -> List[str]:
+    """
+    默认公会在前，去重。
+    """
+    guilds = [settings.DISCORD_GUILD_ID] + list(settings.DISCORD_GUILD_IDS)
+    return list(dict.fromkeys(guild_id for guild_id in guilds if guild_id))
+
+
+def resolve_guild(guild_id: Optional[str]) -> Optional[str]:
+    """
+    未指定时返回默认公会，指定了未配置的公会时返回 None。
+    """
+    if not guild_id:
+        return settings.DISCORD_GUILD_ID or None
+    return guild_id if guild_id in configured_guilds() else None
+
+
+def key_in_guild(key: str, guild_id: str) -> bool:
+    """
+    key 中是否有一段等于 guild_id。snowflake 全局唯一，不会与用户或 role 的 id 重复。
+    """
+    return guild_id in key.split(":")
+
+
+async def guild_stats(guild_id: str) -> dict:
+    """
+    公会占用的缓存：最近一次写入快照时的成员数和字节数、role 列表大小、
+    本 worker L1 中属于该公会的条目，以及成员同步的进度。
+    """
+    roles = await CacheClient.get(CACHE_KEY_ROLES.format(guild_id=guild_id), binary=True)
+    return {
+        "members": await MemberStore.usage(guild_id),
+        "roles_bytes": len(roles) if roles else 0,
+        "l1": CacheClient.local_usage(lambda key: key_in_guild(key, guild_id)),
+        "sync": await MemberSync.status(guild_id),
+    }
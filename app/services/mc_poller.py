@@ -0,0 +1,192 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.cache import CacheClient
+from app.utils.serialization import dumps, loads
+
+# 关注列表：field 为 _target_id，值为 {"ip", "port", "protocol"}
+CACHE_KEY_WATCHED = "mc:watched:servers"
+# 采样环形缓冲区：field 为时间槽序号，值为 Sample 的 JSON
+CACHE_KEY_HISTORY = "mc:history:{target}"
+# (ip, port, protocol)
+Target = Tuple[str, Optional[int], str]
+WATCHED_TTL = 60 * 60 * 24 * 30
+
+
+@dataclass
+class Sample:
+    ts: float
+    online: bool
+    latency: Optional[float]
+    players_online: Optional[int]
+    players_max: Optional[int]
+    version: Optional[str]
+
+
+def _target_id(target: Target) -> str:
+    ip, port, protocol = target
+    return f"{protocol}://{ip}:{port or ''}"
+
+
+def _history_span() -> float:
+    return settings.MC_POLL_INTERVAL * settings.MC_POLL_HISTORY_SIZE
+
+
+class MCPoller:
+    """
+    周期探测被关注的服务器，探测结果由 probe 写入状态缓存，请求直接命中。
+    关注列表和采样都保存在缓存中：轮询任务每轮只在拿到 leader 锁的 worker 上执行，
+    所有 worker 读到的是同一份数据。
+    采样按时间槽写入 hash，槽位循环使用，hash 最多 MC_POLL_HISTORY_SIZE 个 field。
+    """
+    _probe: Optional[Callable[[str, Optional[int], str], Awaitable[Any]]] = None
+
+    @classmethod
+    def set_probe(cls, probe: Callable[[str, Optional[int], str], Awaitable[Any]]):
+        """
+        :param probe: Coroutine probing (ip, port, protocol), storing and returning an MCStatusResponse
+        """
+        cls._probe = probe
+
+    @classmethod
+    def _parse_configured(cls, target: str) -> Target:
+        # "host"、"host:port" 或 "bedrock://host:port"
+        protocol, sep, address = target.partition("://")
+        if not sep:
+            protocol, address = "java", target
+        host, _, port = address.rpartition(":")
+        if host and port.isdigit():
+            return host, int(port), protocol
+        return address, None, protocol
+
+    @classmethod
+    async def _load_stored(cls) -> List[Target]:
+        stored = map(loads, await CacheClient.hvals(CACHE_KEY_WATCHED))
+        return sorted((item["ip"], item["port"], item["protocol"]) for item in stored)
+
+    @classmethod
+    async def _load_registry(cls) -> List[Target]:
+        targets = [cls._parse_configured(target) for target in settings.MC_WATCHED_SERVERS]
+        targets.extend(await cls._load_stored())
+        return list(dict.fromkeys(targets))
+
+    @classmethod
+    async def add(cls, ip: str, port: Optional[int], protocol: str = "java") -> bool:
+        """
+        每个服务器是关注列表 hash 中的一个 field，并发的添加和删除互不覆盖。
+        数量上限在写入前检查，同时添加时可能略微超出。
+        """
+        target = (ip, port, protocol)
+        targets = await cls._load_stored()
+        if target in targets:
+            return False
+        if len(targets) + len(settings.MC_WATCHED_SERVERS) >= settings.MC_POLL_MAX_SERVERS:
+            raise ValueError(f"Too many watched servers (max {settings.MC_POLL_MAX_SERVERS})")
+        value = dumps({"ip": ip, "port": port, "protocol": protocol}).decode("utf-8")
+        await CacheClient.hset_many(CACHE_KEY_WATCHED, {_target_id(target): value}, ttl=WATCHED_TTL)
+        return True
+
+    @classmethod
+    async def remove(cls, ip: str, port: Optional[int], protocol: str = "java") -> bool:
+        target = (ip, port, protocol)
+        if target not in await cls._load_stored():
+            return False
+        await CacheClient.hdel(CACHE_KEY_WATCHED, _target_id(target))
+        await CacheClient.delete_many([CACHE_KEY_HISTORY.format(target=_target_id(target))])
+        return True
+
+    @classmethod
+    async def list_watched(cls) -> List[Target]:
+        return await cls._load_registry()
+
+    @classmethod
+    async def get_history(cls, ip: str, port: Optional[int], protocol: str = "java") -> Optional[List[Sample]]:
+        """
+        按时间排序的采样，不在关注列表中时返回 None。
+        """
+        target = (ip, port, protocol)
+        if target not in await cls._load_registry():
+            return None
+        values = await CacheClient.hvals(CACHE_KEY_HISTORY.format(target=_target_id(target)))
+        # 轮询中断过时，没被覆盖的槽位里是一圈之前的旧采样
+        since = time.time() - _history_span()
+        samples = [Sample(**loads(value)) for value in values]
+        return sorted((sample for sample in samples if sample.ts > since), key=lambda sample: sample.ts)
+
+    @classmethod
+    async def poll_once(cls):
+        if cls._probe is None:
+            return
+        semaphore = asyncio.Semaphore(settings.MC_BATCH_CONCURRENCY)
+        await asyncio.gather(*(cls._poll_server(target, semaphore) for target in await cls._load_registry()))
+
+    @classmethod
+    async def _poll_server(cls, target: Target, semaphore: asyncio.Semaphore):
+        ip, port, protocol = target
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(cls._probe(ip, port, protocol), settings.MC_POLL_TIMEOUT)
+            except asyncio.TimeoutError:
+                result = None
+            except Exception as e:
+                logger.warning(f"MC poll failed for {protocol}://{ip}:{port}: {e}")
+                result = None
+
+        now = time.time()
+        if result is None:
+            sample = Sample(now, False, None, None, None, None)
+        else:
+            players = result.players
+            sample = Sample(
+                now,
+                result.online,
+                result.latency,
+                players.online if players else None,
+                players.max if players else None,
+                result.game_version,
+            )
+        # 相邻两轮至少间隔 MC_POLL_INTERVAL，不会落在同一个槽
+        slot = int(now // settings.MC_POLL_INTERVAL) % settings.MC_POLL_HISTORY_SIZE
+        await CacheClient.hset_many(
+            CACHE_KEY_HISTORY.format(target=_target_id(target)),
+            {str(slot): dumps(asdict(sample)).decode("utf-8")},
+            ttl=int(_history_span())
+        )
+
+
+def downsample(samples: List[Sample], points: int) -> List[dict]:
+    """
+    按时间等分为 points 个桶，桶内延迟/人数取在线样本的平均值，版本取最后一个。
+    """
+    if not samples:
+        return []
+    if points <= 0 or len(samples) <= points:
+        buckets = [[sample] for sample in samples]
+    else:
+        start, end = samples[0].ts, samples[-1].ts
+        width = (end - start) / points or 1.0
+        buckets = [[] for _ in range(points)]
+        for sample in samples:
+            buckets[min(int((sample.ts - start) / width), points - 1)].append(sample)
+
+    series = []
+    for bucket in buckets:
+        if not bucket:
+            continue
+        online = [sample for sample in bucket if sample.online]
+        latencies = [sample.latency for sample in online if sample.latency is not None]
+        players = [sample.players_online for sample in online if sample.players_online is not None]
+        series.append({
+            "ts": round(sum(sample.ts for sample in bucket) / len(bucket), 3),
+            "uptime": round(len(online) / len(bucket), 3),
+            "latency": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "players_online": round(sum(players) / len(players), 2) if players else None,
+            "players_max": online[-1].players_max if online else None,
+            "version": online[-1].version if online else None,
+            "samples": len(bucket),
+        })
+    return series
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from mcstatus import BedrockServer, JavaServer
+
+from app.core.config import settings
+from app.utils.cache import CacheClient
+from app.utils.metrics import MC_PROBE_LATENCY
+
+
+@dataclass
+class ProbeResult:
+    protocol: str
+    host: str
+    port: int
+    motd: Optional[str]
+    players_online: int
+    players_max: int
+    version: Optional[str]
+    latency: Optional[float]
+    player_list: Optional[List[str]] = None
+
+
+class ProbeEngine:
+    """
+    探测协议的统一接口，失败时直接抛出异常。
+    port 为 None 时使用协议的默认端口；srv 为真时 Java 协议改为按 SRV 记录确定地址。
+    """
+    protocol: str = ""
+    default_port: int = 0
+
+    async def probe(self, host: str, port: Optional[int], timeout: float, srv: bool = False) -> ProbeResult:
+        raise NotImplementedError
+
+
+async def resolve_java(host: str, port: Optional[int], timeout: float, srv: bool = False) -> JavaServer:
+    """
+    未指定端口且 srv 为真时解析 SRV 记录，结果单独缓存 MC_DNS_CACHE_TTL 秒，没有记录时使用 25565；
+    其余情况直接使用 port（默认 25565）。A 记录仍交给系统解析器，握手包里需要保留原始主机名。
+    """
+    if port is not None or not srv:
+        return JavaServer(host, port or JavaServer.DEFAULT_PORT, timeout=timeout)
+
+    cache_key = f"mc:dns:{host}"
+    cached = await CacheClient.get_json(cache_key)
+    if cached:
+        return JavaServer(cached["host"], cached["port"], timeout=timeout)
+
+    server = await JavaServer.async_lookup(host, timeout=timeout)
+    await CacheClient.set_json(
+        cache_key,
+        {"host": server.address.host, "port": server.address.port},
+        ttl=settings.MC_DNS_CACHE_TTL
+    )
+    return server
+
+
+class JavaStatusProbe(ProbeEngine):
+    protocol = "java"
+    default_port = JavaServer.DEFAULT_PORT
+
+    async def probe(self, host: str, port: Optional[int], timeout: float, srv: bool = False) -> ProbeResult:
+        server = await resolve_java(host, port, timeout, srv)
+        status = await server.async_status()
+        return ProbeResult(
+            protocol=self.protocol,
+            host=host,
+            port=server.address.port,
+            motd=status.description,
+            players_online=status.players.online,
+            players_max=status.players.max,
+            version=status.version.name,
+            latency=status.latency,
+            player_list=[player.name for player in status.players.sample or []] or None,
+        )
+
+
+class JavaQueryProbe(ProbeEngine):
+    """
+    GameSpy4 Query (UDP)，需要服务端开启 enable-query，能拿到完整玩家列表。
+    """
+    protocol = "query"
+    default_port = JavaServer.DEFAULT_PORT
+
+    async def probe(self, host: str, port: Optional[int], timeout: float, srv: bool = False) -> ProbeResult:
+        server = await resolve_java(host, port, timeout, srv)
+        start = time.perf_counter()
+        query = await server.async_query(tries=1)
+        latency = (time.perf_counter() - start) * 1000
+        return ProbeResult(
+            protocol=self.protocol,
+            host=host,
+            port=server.address.port,
+            motd=query.motd.to_minecraft(),
+            players_online=query.players.online,
+            players_max=query.players.max,
+            version=f"{query.software.brand} {query.software.version}".strip(),
+            latency=latency,
+            player_list=list(query.players.list),
+        )
+
+
+class BedrockProbe(ProbeEngine):
+    protocol = "bedrock"
+    default_port = 19132
+
+    async def probe(self, host: str, port: Optional[int], timeout: float, srv: bool = False) -> ProbeResult:
+        server = BedrockServer(host, port or self.default_port, timeout=timeout)
+        status = await server.async_status()
+        return ProbeResult(
+            protocol=self.protocol,
+            host=host,
+            port=server.address.port,
+            motd=status.description,
+            players_online=status.players.online,
+            players_max=status.players.max,
+            version=status.version.name,
+            latency=status.latency,
+        )
+
+
+ENGINES: Dict[str, ProbeEngine] = {
+    engine.protocol: engine for engine in (JavaStatusProbe(), JavaQueryProbe(), BedrockProbe())
+}
+
+
+async def probe_first_success(
+        engines: List[ProbeEngine],
+        host: str,
+        port: Optional[int],
+        timeout: float,
+        srv: bool = False
+) -> ProbeResult:
+    """
+    并发探测多个协议，返回最先成功的结果并取消其余探测。
+    全部失败时抛出排在最前的协议的异常。
+    """
+    if not engines:
+        raise ValueError("No protocol to probe, check MC_AUTO_PROTOCOLS")
+    tasks = {asyncio.create_task(engine.probe(host, port, timeout, srv)): idx for idx, engine in enumerate(engines)}
+    pending = set(tasks)
+    errors = {}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors[tasks[task]] = task.exception()
+        raise errors[min(errors)]
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def probe(host: str, port: Optional[int], protocol: str = "java", srv: bool = False) -> ProbeResult:
+    """
+    :param protocol: java / query / bedrock, or auto to race MC_AUTO_PROTOCOLS
+    :param srv: Resolve Java servers through their SRV record when port is omitted
+    """
+    timeout = settings.MC_PROBE_TIMEOUT
+    start = time.perf_counter()
+    try:
+        if protocol == "auto":
+            engines = [ENGINES[name] for name in settings.MC_AUTO_PROTOCOLS]
+            result = await probe_first_success(engines, host, port, timeout, srv)
+        else:
+            result = await ENGINES[protocol].probe(host, port, timeout, srv)
+    except Exception:
+        MC_PROBE_LATENCY.observe(time.perf_counter() - start, (protocol, "error"))
+        raise
+    MC_PROBE_LATENCY.observe(time.perf_counter() - start, (protocol, "ok"))
+    return result
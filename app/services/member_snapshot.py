@@ -0,0 +1,169 @@
+"""
+成员快照的紧凑二进制格式。
+
+    MAGIC(4) | schema version(1) | codec(1) | payload
+
+payload 为 msgpack 编码的 [role_table, rows]，role id 只在 role_table 中出现一次，
+每个成员一行：[id, username, global_name, nick, avatar, discriminator, [role 下标...]]。
+"""
+import zlib
+from typing import Dict, List, Optional
+
+import msgpack
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时 zstd 退回 zlib
+    zstandard = None
+
+MAGIC = b"GSKM"
+SCHEMA_VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+_CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+
+def project_member(member: dict) -> dict:
+    """
+    只保留贡献者处理会用到的字段，结构仍与 Discord 成员对象一致。
+    """
+    user = member.get("user", {})
+    return {
+        "user": {
+            "id": user.get("id"),
+            "username": user.get("username"),
+            "global_name": user.get("global_name"),
+            "avatar": user.get("avatar"),
+            "discriminator": user.get("discriminator", "0"),
+        },
+        "nick": member.get("nick"),
+        "roles": member.get("roles", []),
+    }
+
+
+def _resolve_codec() -> int:
+    codec = _CODECS.get(settings.MEMBER_SNAPSHOT_COMPRESSION.lower())
+    if codec is None:
+        logger.warning(f"Unknown MEMBER_SNAPSHOT_COMPRESSION {settings.MEMBER_SNAPSHOT_COMPRESSION!r}, using zlib")
+        return CODEC_ZLIB
+    if codec == CODEC_ZSTD and zstandard is None:
+        return CODEC_ZLIB
+    return codec
+
+
+class SnapshotWriter:
+    """
+    逐个追加成员，每行立即打包成 msgpack 字节，不保留成员对象。
+    可以直接传入 Discord 原始成员对象，只会读取投影后的字段。
+    build() 的结果与 encode_snapshot 完全相同。
+
+    打包后的行要一直保留到 build()：role_table 在格式中位于所有行之前，
+    最后才能确定，快照也只能整体写入一个 key。因此内存随公会人数增长，
+    约为整个公会未压缩的紧凑快照（每人几十字节），而不是一页原始成员对象。
+    """
+
+    def __init__(self):
+        self.role_table: List[str] = []
+        self._role_index: Dict[str, int] = {}
+        self._rows = bytearray()
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self.count = 0
+
+    def add(self, member: dict):
+        user = member["user"]
+        role_idx = []
+        for role_id in member.get("roles", ()):
+            idx = self._role_index.get(role_id)
+            if idx is None:
+                idx = self._role_index[role_id] = len(self.role_table)
+                self.role_table.append(role_id)
+            role_idx.append(idx)
+        self._rows += self._packer.pack((
+            user["id"], user.get("username"), user.get("global_name"), member.get("nick"),
+            user.get("avatar"), user.get("discriminator", "0"), role_idx,
+        ))
+        self.count += 1
+
+    def build(self, codec: Optional[int] = None) -> bytes:
+        """
+        :param codec: CODEC_* constant, defaults to MEMBER_SNAPSHOT_COMPRESSION
+        """
+        if codec is None:
+            codec = _resolve_codec()
+
+        # 与 msgpack.packb((role_table, rows)) 的输出逐字节一致
+        parts = (
+            self._packer.pack_array_header(2),
+            self._packer.pack(self.role_table),
+            self._packer.pack_array_header(self.count),
+            self._rows,
+        )
+        if codec == CODEC_ZLIB:
+            # 分段送入压缩器，不必先把行缓冲区再拼接复制一份；输出与 zlib.compress 相同
+            compressor = zlib.compressobj(6)
+            payload = b"".join([compressor.compress(part) for part in parts] + [compressor.flush()])
+        elif codec == CODEC_ZSTD:
+            payload = zstandard.ZstdCompressor(level=3).compress(b"".join(parts))
+        else:
+            payload = b"".join(parts)
+        return MAGIC + bytes((SCHEMA_VERSION, codec)) + payload
+
+    @property
+    def buffered_bytes(self) -> int:
+        return len(self._rows)
+
+
+def encode_snapshot(members: List[dict], codec: Optional[int] = None) -> bytes:
+    """
+    :param members: Projected members (see project_member)
+    :param codec: CODEC_* constant, defaults to MEMBER_SNAPSHOT_COMPRESSION
+    """
+    writer = SnapshotWriter()
+    for member in members:
+        writer.add(member)
+    return writer.build(codec)
+
+
+def decode_snapshot(data: bytes) -> Optional[List[dict]]:
+    """
+    格式或版本不匹配时返回 None，由调用方当作缓存未命中处理。
+    """
+    if len(data) < 6 or data[:4] != MAGIC:
+        return None
+    version, codec = data[4], data[5]
+    if version != SCHEMA_VERSION:
+        logger.info(f"Ignoring member snapshot with schema version {version}")
+        return None
+
+    payload = memoryview(data)[6:]
+    if codec == CODEC_ZLIB:
+        payload = zlib.decompress(payload)
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            logger.warning("Member snapshot is zstd compressed but zstandard is not installed")
+            return None
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec != CODEC_NONE:
+        return None
+
+    role_table, rows = msgpack.unpackb(payload, raw=False, use_list=False)
+    return [
+        {
+            "user": {
+                "id": user_id,
+                "username": username,
+                "global_name": global_name,
+                "avatar": avatar,
+                "discriminator": discriminator,
+            },
+            "nick": nick,
+            "roles": [role_table[i] for i in role_idx],
+        }
+        for user_id, username, global_name, nick, avatar, discriminator, role_idx in rows
+    ]
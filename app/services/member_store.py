@@ -0,0 +1,263 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.logger import logger
+from app.services.member_snapshot import SnapshotWriter, decode_snapshot, encode_snapshot, project_member
+from app.utils.cache import CacheClient
+from app.utils.metrics import MEMBER_SNAPSHOT_BYTES
+from app.utils.serialization import dumps, loads
+
+# 以下 key 都按公会区分
+# 紧凑二进制快照，格式见 member_snapshot
+CACHE_KEY_MEMBERS_SNAPSHOT = "gensokyo:discord:members:{guild_id}:snapshot"
+# 按 user id 存放的成员 hash，网关增量事件直接改这里
+CACHE_KEY_MEMBERS_HASH = "gensokyo:discord:members:{guild_id}:hash"
+# 每次重写快照都换成新的随机值，用于失效已计算的贡献者结果并作为 ETag 的一部分；
+# 不用自增计数器，否则计数器丢失（重启、淘汰）后会重新发出旧值，客户端拿到过期的 304
+CACHE_KEY_MEMBERS_VERSION = "gensokyo:discord:members:{guild_id}:version"
+# 全量同步的进度，见 MemberSync
+CACHE_KEY_MEMBERS_SYNC = "gensokyo:discord:members:{guild_id}:sync"
+# 最近一次写入快照时的成员数和占用的缓存大小
+CACHE_KEY_MEMBERS_USAGE = "gensokyo:discord:members:{guild_id}:usage"
+CACHE_TTL = 60 * 60 * 24 * 7  # 7天
+CACHE_SOFT_TTL = 60 * 60 * 6  # 超过后先返回旧数据，后台刷新
+SNAPSHOT_FLUSH_DELAY = 2  # 合并短时间内的多个增量后再重建列表
+STAGING_TTL = 60 * 30  # 同步中途退出时临时 hash 的保留时间
+
+
+class MemberIngest:
+    """
+    分页写入一次全量同步的结果，内存中不保留成员对象。
+    每页写入临时 hash，并追加到 SnapshotWriter；commit() 时临时 hash 整体替换正式 hash。
+    内存占用为当前页加上整个公会的紧凑快照行（见 SnapshotWriter），不是只有一页。
+    """
+
+    def __init__(self, guild_id: str):
+        self.guild_id = guild_id
+        self._staging_key = f"{CACHE_KEY_MEMBERS_HASH.format(guild_id=guild_id)}:sync:{uuid.uuid4().hex}"
+        self._writer = SnapshotWriter()
+        self._hash_bytes = 0
+
+    @property
+    def count(self) -> int:
+        return self._writer.count
+
+    async def add_page(self, members: List[dict]):
+        mapping = {}
+        for member in members:
+            member = project_member(member)
+            value = dumps(member)
+            mapping[member["user"]["id"]] = value.decode("utf-8")
+            self._hash_bytes += len(value)
+            self._writer.add(member)
+        await CacheClient.hset_many(self._staging_key, mapping, ttl=STAGING_TTL)
+
+    async def publish(self):
+        """
+        把目前已写入的成员发布为快照（部分结果），正式 hash 保持不变。
+        """
+        await MemberStore._write_snapshot_bytes(self.guild_id, self._writer.build(), self.count, self._hash_bytes)
+
+    async def commit(self):
+        hash_key = CACHE_KEY_MEMBERS_HASH.format(guild_id=self.guild_id)
+        await CacheClient.rename_hash(self._staging_key, hash_key, ttl=CACHE_TTL)
+        await MemberStore._write_snapshot_bytes(self.guild_id, self._writer.build(), self.count, self._hash_bytes)
+
+    async def abort(self):
+        await CacheClient.delete_many([self._staging_key])
+
+
+class MemberStore:
+    """
+    公会成员存储，每个公会一份。
+    hash (user id -> 投影后的成员 JSON) 是可增量修改的源数据，
+    快照是由它物化出来的完整列表，供读取方一次取出。
+    全量同步提交时会整体替换 hash 和快照，同步期间收到的增量在本进程中另存一份，
+    等同步结束后重放到 hash 再重建快照，不会被覆盖掉。
+    """
+    _flush_tasks: Dict[str, asyncio.Task] = {}
+    # guild id -> user id -> 投影后的成员，None 表示已移除；重放后清空
+    _pending: Dict[str, Dict[str, Optional[dict]]] = {}
+    # guild id -> 收到的增量数，重建期间有新增量时据此再重建一次
+    _dirty: Dict[str, int] = {}
+    _listeners: List[Callable[[str], Awaitable[None]]] = []
+
+    @classmethod
+    def on_snapshot_written(cls, callback: Callable[[str], Awaitable[None]]):
+        """
+        注册快照重写后的回调，参数为 guild id，在写入快照的 worker 上以后台任务执行。
+        """
+        cls._listeners.append(callback)
+
+    @classmethod
+    def _notify(cls, guild_id: str):
+        for callback in cls._listeners:
+            asyncio.create_task(callback(guild_id))
+
+    @classmethod
+    async def load(cls, guild_id: str) -> Optional[List[dict]]:
+        return await CacheClient.get_decoded(CACHE_KEY_MEMBERS_SNAPSHOT.format(guild_id=guild_id), decode_snapshot)
+
+    @classmethod
+    async def is_stale(cls, guild_id: str) -> bool:
+        return await CacheClient.is_stale(CACHE_KEY_MEMBERS_SNAPSHOT.format(guild_id=guild_id))
+
+    @classmethod
+    async def get_version(cls, guild_id: str) -> Optional[str]:
+        return await CacheClient.get(CACHE_KEY_MEMBERS_VERSION.format(guild_id=guild_id))
+
+    @classmethod
+    async def usage(cls, guild_id: str) -> Optional[dict]:
+        """
+        最近一次写入快照时记录的成员数、快照和 hash 的字节数。
+        """
+        return await CacheClient.get_json(CACHE_KEY_MEMBERS_USAGE.format(guild_id=guild_id))
+
+    @classmethod
+    def begin_ingest(cls, guild_id: str) -> MemberIngest:
+        """
+        开始一次分页写入的全量同步。
+        """
+        return MemberIngest(guild_id)
+
+    @classmethod
+    async def replace_all(cls, guild_id: str, members: List[dict]):
+        """
+        全量同步后整体替换。
+        """
+        ingest = cls.begin_ingest(guild_id)
+        await ingest.add_page(members)
+        await ingest.commit()
+
+    @classmethod
+    async def upsert(cls, guild_id: str, member: dict):
+        member = project_member(member)
+        user_id = member["user"]["id"]
+        await CacheClient.hset_many(
+            CACHE_KEY_MEMBERS_HASH.format(guild_id=guild_id),
+            {user_id: dumps(member).decode("utf-8")},
+            ttl=CACHE_TTL
+        )
+        cls._pending.setdefault(guild_id, {})[user_id] = member
+        cls._schedule_flush(guild_id)
+
+    @classmethod
+    async def remove(cls, guild_id: str, user_id: str):
+        await CacheClient.hdel(CACHE_KEY_MEMBERS_HASH.format(guild_id=guild_id), user_id)
+        cls._pending.setdefault(guild_id, {})[user_id] = None
+        cls._schedule_flush(guild_id)
+
+    @classmethod
+    async def _sync_running(cls, guild_id: str) -> bool:
+        """
+        任意 worker 上该公会的全量同步是否正在进行。超过 STAGING_TTL 仍为 running 的视为已中断。
+        """
+        status = await CacheClient.get_json(CACHE_KEY_MEMBERS_SYNC.format(guild_id=guild_id))
+        return bool(status) and status.get("state") == "running" \
+            and time.time() - status.get("started_at", 0) < STAGING_TTL
+
+    @classmethod
+    async def _replay_pending(cls, guild_id: str):
+        """
+        把增量重新写入 hash，同步提交时被替换掉的部分由此恢复；没有同步时重复写入也无影响。
+        """
+        pending = cls._pending.pop(guild_id, None)
+        if not pending:
+            return
+        hash_key = CACHE_KEY_MEMBERS_HASH.format(guild_id=guild_id)
+        upserts = {user_id: dumps(member).decode("utf-8") for user_id, member in pending.items() if member}
+        removed = [user_id for user_id, member in pending.items() if member is None]
+        if upserts:
+            await CacheClient.hset_many(hash_key, upserts, ttl=CACHE_TTL)
+        if removed:
+            await CacheClient.hdel(hash_key, *removed)
+
+    @classmethod
+    async def flush(cls, guild_id: str):
+        """
+        从 hash 重建完整列表。
+        """
+        values = await CacheClient.hvals(CACHE_KEY_MEMBERS_HASH.format(guild_id=guild_id))
+        members = [loads(value) for value in values]
+        await cls._write_snapshot(guild_id, members, sum(len(value) for value in values))
+
+    @staticmethod
+    def _usage(count: int, snapshot_bytes: int, hash_bytes: int) -> dict:
+        return {"members": count, "snapshot_bytes": snapshot_bytes, "hash_bytes": hash_bytes, "written_at": time.time()}
+
+    @classmethod
+    async def _write_snapshot(cls, guild_id: str, members: List[dict], hash_bytes: int):
+        # 快照和版本号在同一个事务里写入，读方不会拿到新版本号配旧快照
+        async with CacheClient.pipeline(transaction=True) as pipe:
+            size = pipe.set_encoded(
+                CACHE_KEY_MEMBERS_SNAPSHOT.format(guild_id=guild_id),
+                members,
+                encode_snapshot,
+                ttl=CACHE_TTL,
+                soft_ttl=CACHE_SOFT_TTL
+            )
+            pipe.set(CACHE_KEY_MEMBERS_VERSION.format(guild_id=guild_id), uuid.uuid4().hex[:16], ttl=CACHE_TTL)
+            pipe.set_json(
+                CACHE_KEY_MEMBERS_USAGE.format(guild_id=guild_id),
+                cls._usage(len(members), size, hash_bytes),
+                ttl=CACHE_TTL
+            )
+        if pipe.ok:
+            MEMBER_SNAPSHOT_BYTES.set(size, (guild_id,))
+            logger.info(f"Member snapshot of guild {guild_id} written: {len(members)} members, {size} bytes")
+            cls._notify(guild_id)
+
+    @classmethod
+    async def _write_snapshot_bytes(cls, guild_id: str, data: bytes, count: int, hash_bytes: int):
+        """
+        写入已编码的快照，L1 中不放解码结果，下次读取时再解码。
+        """
+        async with CacheClient.pipeline(transaction=True) as pipe:
+            pipe.set(CACHE_KEY_MEMBERS_SNAPSHOT.format(guild_id=guild_id), data, ttl=CACHE_TTL, soft_ttl=CACHE_SOFT_TTL)
+            pipe.set(CACHE_KEY_MEMBERS_VERSION.format(guild_id=guild_id), uuid.uuid4().hex[:16], ttl=CACHE_TTL)
+            pipe.set_json(
+                CACHE_KEY_MEMBERS_USAGE.format(guild_id=guild_id),
+                cls._usage(count, len(data), hash_bytes),
+                ttl=CACHE_TTL
+            )
+        if pipe.ok:
+            MEMBER_SNAPSHOT_BYTES.set(len(data), (guild_id,))
+            logger.info(f"Member snapshot of guild {guild_id} written: {count} members, {len(data)} bytes")
+            cls._notify(guild_id)
+
+    @classmethod
+    def _schedule_flush(cls, guild_id: str):
+        cls._dirty[guild_id] = cls._dirty.get(guild_id, 0) + 1
+        task = cls._flush_tasks.get(guild_id)
+        if task is None or task.done():
+            cls._flush_tasks[guild_id] = asyncio.create_task(cls._delayed_flush(guild_id))
+
+    @classmethod
+    async def _delayed_flush(cls, guild_id: str):
+        # 任务结束前新到的增量不会另起任务；读取 hash 之后才到的增量不在这次的快照里，
+        # 所以重建后计数有变化就再来一轮
+        while True:
+            await asyncio.sleep(SNAPSHOT_FLUSH_DELAY)
+            # 同步进行中时 hash 可能还不完整，提交后又会被替换，等同步结束再重放和重建
+            while await cls._sync_running(guild_id):
+                await asyncio.sleep(SNAPSHOT_FLUSH_DELAY)
+            dirty = cls._dirty.get(guild_id, 0)
+            try:
+                await cls._replay_pending(guild_id)
+                await cls.flush(guild_id)
+            except Exception as e:
+                logger.error(f"Failed to rebuild member snapshot of guild {guild_id}: {e}")
+            if cls._dirty.get(guild_id, 0) == dirty:
+                return
+
+
+def member_from_event(data: Dict) -> dict:
+    """
+    GUILD_MEMBER_ADD/UPDATE 事件去掉 guild_id 后即为成员对象。
+    """
+    member = dict(data)
+    member.pop("guild_id", None)
+    member.setdefault("roles", [])
+    return member
@@ -0,0 +1,227 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.avatars import warm_avatar_cache
+from app.services.member_store import CACHE_KEY_MEMBERS_SYNC, CACHE_TTL, MemberStore
+from app.utils.cache import CacheClient
+from app.utils.discord_client import DiscordClient
+from app.utils.metrics import (
+    MEMBER_SYNC_DURATION,
+    MEMBER_SYNC_IN_PROGRESS,
+    MEMBER_SYNC_MEMBERS,
+    MEMBER_SYNC_PAGES,
+)
+from app.utils.serialization import loads
+
+PAGE_SIZE = 1000
+MAX_PAGES = 50
+SYNC_LOCK = "member_sync:{guild_id}"
+SYNC_LOCK_TTL = 120  # 每写入一页续期一次
+PARTIAL_PUBLISH_INTERVAL = 5  # 缓存为空时发布部分快照的最小间隔（秒）
+
+
+class MemberSync:
+    """
+    全量分页拉取公会成员，每页到达后立即写入 MemberStore，原始成员对象只保留当前的几页，
+    快照行以紧凑格式累积到同步结束。
+    Discord 按 after 游标分页，请求只能逐页串行；拉取下一页与写入当前页同时进行，
+    两者之间的队列只容纳一页。
+    缓存为空时边同步边发布部分快照，读方不必等到最后一页；
+    已有完整快照时继续使用旧快照，同步完成后再替换。
+    每个公会同时只有一个同步；各公会的分页请求共用 MEMBER_SYNC_CONCURRENCY 个名额，
+    每拉一页就归还，大公会不会占着名额让小公会等它拉完。
+    """
+    _tasks: Dict[str, asyncio.Task] = {}
+    _published: Dict[str, asyncio.Event] = {}
+    _slots: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def start(cls, guild_id: str) -> asyncio.Task:
+        """
+        在后台启动同步，本进程已在同步该公会时返回正在运行的任务。
+        """
+        task = cls._tasks.get(guild_id)
+        if task is None or task.done():
+            cls._published[guild_id] = asyncio.Event()
+            task = cls._tasks[guild_id] = asyncio.create_task(cls.run(guild_id))
+        return task
+
+    @classmethod
+    async def wait_for_members(cls, guild_id: str, timeout: float) -> List[dict]:
+        """
+        缓存为空时使用：启动同步，等到第一份快照（可能不完整）写入后立即返回，
+        同步在后台继续。其他 worker 正在同步时轮询等待它写入，直到对方释放锁。
+        """
+        if not settings.DISCORD_BOT_TOKEN:
+            logger.error("Discord Bot Token missing")
+            return await MemberStore.load(guild_id) or []
+
+        deadline = time.monotonic() + timeout
+        task = cls.start(guild_id)
+        waiter = asyncio.create_task(cls._published[guild_id].wait())
+        try:
+            await asyncio.wait({task, waiter}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+
+        # run() 返回 None：锁被其他 worker 持有，等它写入快照；锁释放后不再等
+        busy = task.done() and not task.cancelled() and task.exception() is None and task.result() is None
+        lock_name = SYNC_LOCK.format(guild_id=guild_id)
+        members = await MemberStore.load(guild_id)
+        while members is None and busy and time.monotonic() < deadline:
+            await asyncio.sleep(0.5)
+            members = await MemberStore.load(guild_id)
+            busy = await CacheClient.lock_held(lock_name)
+        return members or await MemberStore.load(guild_id) or []
+
+    @classmethod
+    async def status(cls, guild_id: str) -> dict:
+        """
+        最近一次同步的进度。partial 为 True 表示当前快照来自未完成的同步。
+        """
+        return await CacheClient.get_json(CACHE_KEY_MEMBERS_SYNC.format(guild_id=guild_id)) \
+            or {"state": "idle", "partial": False}
+
+    @classmethod
+    async def is_partial(cls, guild_id: str) -> bool:
+        return bool((await cls.status(guild_id)).get("partial"))
+
+    @classmethod
+    async def _set_status(cls, guild_id: str, status: dict):
+        # L1 中保存的是传入的对象，这里传副本，后续修改 status 不影响缓存
+        await CacheClient.set_json(CACHE_KEY_MEMBERS_SYNC.format(guild_id=guild_id), dict(status), ttl=CACHE_TTL)
+
+    @classmethod
+    async def run(cls, guild_id: str) -> Optional[int]:
+        """
+        返回写入的成员数，同步失败且保留了旧快照时为 0；
+        其他 worker 正在同步或 token 未配置时返回 None。
+        """
+        if not settings.DISCORD_BOT_TOKEN:
+            logger.error("Discord Bot Token missing")
+            return None
+
+        lock_name = SYNC_LOCK.format(guild_id=guild_id)
+        token = await CacheClient.acquire_lock(lock_name, SYNC_LOCK_TTL)
+        if not token:
+            logger.info(f"Member sync for guild {guild_id} already running in another worker")
+            return None
+
+        MEMBER_SYNC_IN_PROGRESS.set(1, (guild_id,))
+        try:
+            return await cls._sync(guild_id, lock_name, token)
+        finally:
+            MEMBER_SYNC_IN_PROGRESS.set(0, (guild_id,))
+            await CacheClient.release_lock(lock_name, token)
+            published = cls._published.get(guild_id)
+            if published is not None:
+                published.set()
+
+    @classmethod
+    async def _sync(cls, guild_id: str, lock_name: str, token: str) -> int:
+        cold = await MemberStore.load(guild_id) is None
+        # 已有快照时 partial 沿用上次的结果，直到这次同步完成
+        status = {
+            "state": "running",
+            "started_at": time.time(),
+            "finished_at": None,
+            "pages": 0,
+            "members": 0,
+            "partial": False if cold else await cls.is_partial(guild_id),
+        }
+        await cls._set_status(guild_id, status)
+
+        ingest = MemberStore.begin_ingest(guild_id)
+        pages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        fetcher = asyncio.create_task(cls._fetch_pages(guild_id, pages))
+        start = time.perf_counter()
+        last_publish = 0.0
+
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    break
+                await ingest.add_page(page)
+                await warm_avatar_cache(page)
+                status["pages"] += 1
+                status["members"] = ingest.count
+
+                if cold and time.monotonic() - last_publish >= PARTIAL_PUBLISH_INTERVAL:
+                    await ingest.publish()
+                    status["partial"] = True
+                    last_publish = time.monotonic()
+                    published = cls._published.get(guild_id)
+                    if published is not None:
+                        published.set()
+                await cls._set_status(guild_id, status)
+                await CacheClient.extend_lock(lock_name, token, SYNC_LOCK_TTL)
+            complete = await fetcher
+        except BaseException:
+            fetcher.cancel()
+            await ingest.abort()
+            status.update(state="failed", finished_at=time.time())
+            await cls._set_status(guild_id, status)
+            raise
+
+        # 中途失败时，已有完整快照就保留旧的，缓存为空则先用拿到的部分
+        written = 0
+        if ingest.count and (complete or cold):
+            await ingest.commit()
+            status["partial"] = not complete
+            written = ingest.count
+        else:
+            await ingest.abort()
+        status.update(state="done" if complete else "failed", finished_at=time.time())
+        await cls._set_status(guild_id, status)
+
+        MEMBER_SYNC_DURATION.observe(time.perf_counter() - start, (guild_id,))
+        MEMBER_SYNC_MEMBERS.set(ingest.count, (guild_id,))
+        logger.info(f"Fetched {ingest.count} raw members of guild {guild_id} from Discord in {status['pages']} pages.")
+        return written
+
+    @classmethod
+    async def _fetch_pages(cls, guild_id: str, pages: asyncio.Queue) -> bool:
+        """
+        逐页拉取放入队列，结束时放入 None。返回是否拉取完整，达到 MAX_PAGES 也算不完整。
+        """
+        complete = False
+        try:
+            complete = await cls._fetch_into(guild_id, pages)
+        except Exception as e:
+            logger.error(f"Error fetching members of guild {guild_id}: {e}")
+        await pages.put(None)
+        return complete
+
+    @classmethod
+    def _page_slots(cls) -> asyncio.Semaphore:
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(max(1, settings.MEMBER_SYNC_CONCURRENCY))
+        return cls._slots
+
+    @classmethod
+    async def _fetch_into(cls, guild_id: str, pages: asyncio.Queue) -> bool:
+        last_id = "0"
+        for _ in range(MAX_PAGES):
+            # 只在请求期间占用名额，放入队列（等待写入）时已经归还
+            async with cls._page_slots():
+                resp = await DiscordClient.get(
+                    f"/guilds/{guild_id}/members",
+                    params={"limit": PAGE_SIZE, "after": last_id}
+                )
+            if resp.status_code != 200:
+                logger.error(f"Failed to fetch members of guild {guild_id}: {resp.text}")
+                return False
+            batch = loads(resp.content)
+            MEMBER_SYNC_PAGES.inc((guild_id,))
+            if batch:
+                last_id = batch[-1]["user"]["id"]
+                await pages.put(batch)
+            if len(batch) < PAGE_SIZE:
+                return True
+        # 成员没有拉完，按不完整处理：已有完整快照时保留旧的，否则发布为部分结果
+        logger.warning(f"Member sync of guild {guild_id} stopped after {MAX_PAGES} pages, result is incomplete")
+        return False
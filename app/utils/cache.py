@@ -1,46 +1,604 @@
-from typing import Optional
-
-import redis.asyncio as redis
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.utils.cache_backends import CacheBackend, MemoryBackend, RedisBackend, SqliteBackend
+from app.utils.metrics import CACHE_REQUESTS, key_prefix
+from app.utils.serialization import dumps, loads
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    进程内 LRU + TTL 缓存，作为 Redis 前面的 L1。
+    存放的是已经解码好的对象，调用方拿到后不要修改。
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def usage(self, match: Callable[[Hashable], bool]) -> dict:
+        """
+        key 满足 match 的条目数和占用。字节数只统计 str/bytes 值，其余（解码后的对象）只计数。
+        """
+        entries = objects = size = 0
+        for key, (_, value) in list(self._data.items()):
+            if not match(key):
+                continue
+            entries += 1
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+            else:
+                objects += 1
+        return {"entries": entries, "bytes": size, "objects": objects}
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CachePipeline:
+    """
+    CacheClient.pipeline() 产出的批量写入器。
+    命令先排队，退出 async with 时连同 L1 失效通知一次发给后端；
+    后端不可用或执行出错时与单条命令一样放行，此时 ok 为 False、results 为 None。
+    """
+
+    def __init__(self):
+        self._ops: List[tuple] = []
+        self._written: List[str] = []
+        self._local_values: List[tuple] = []
+        self.ok = False
+        self.results: Optional[list] = None
+
+    def set(self, key: str, value, ttl: int = 600, soft_ttl: Optional[int] = None):
+        self._ops.append(("setex", key, ttl, value))
+        self._written.append(key)
+        if soft_ttl is not None:
+            # 软过期时间写成绝对时间戳，L1 缓存这个值也不会算错
+            soft_key = CacheClient.soft_key(key)
+            self._ops.append(("setex", soft_key, ttl, str(time.time() + soft_ttl)))
+            self._written.append(soft_key)
+
+    def set_json(self, key: str, value: Any, ttl: int = 600, soft_ttl: Optional[int] = None):
+        self.set(key, dumps(value), ttl, soft_ttl)
+        self._local_values.append(((key, "json"), value, ttl))
+
+    def set_encoded(
+            self,
+            key: str,
+            value: Any,
+            encoder: Callable[[Any], bytes],
+            ttl: int = 600,
+            soft_ttl: Optional[int] = None
+    ) -> int:
+        """
+        返回编码后的字节数。
+        """
+        data = encoder(value)
+        self.set(key, data, ttl, soft_ttl)
+        self._local_values.append(((key, "decoded"), value, ttl))
+        return len(data)
+
+    def delete(self, *keys: str):
+        if keys:
+            self._ops.append(("delete", *keys))
+            self._written.extend(keys)
+
+    def incr(self, key: str):
+        self._ops.append(("incr", key))
+        self._written.append(key)
 
 
 class CacheClient:
-    _redis: Optional[redis.Redis] = None
+    """
+    两级缓存：L1 为进程内 LocalCache，L2 为 CACHE_BACKEND 选定的后端 (redis / memory / sqlite)。
+    Redis 后端写入/删除时通过 pub/sub 通知其他 worker 丢弃各自的 L1；
+    Redis 连不上时切换到进程内存储，CACHE_FALLBACK_RETRY 秒后再尝试 Redis。
+    """
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    SOFT_EXPIRY_SUFFIX = ":soft_expires"
+
+    _backend: Optional[CacheBackend] = None
+    # Redis 故障期间使用的降级存储
+    _fallback: Optional[CacheBackend] = None
+    _primary_down_until = 0.0
+    _local = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_TTL)
+    _listener: Optional[asyncio.Task] = None
+    _worker_id = uuid.uuid4().hex
+    _l2_stats = {"hits": 0, "misses": 0, "errors": 0, "fallbacks": 0}
+    _invalidations = 0
+
+    @classmethod
+    def _create_backend(cls) -> CacheBackend:
+        name = settings.CACHE_BACKEND.lower()
+        if name == "memory":
+            return MemoryBackend(settings.CACHE_MEMORY_MAX_ENTRIES)
+        if name == "sqlite":
+            return SqliteBackend(settings.CACHE_SQLITE_PATH)
+        if name != "redis":
+            logger.warning(f"Unknown CACHE_BACKEND {settings.CACHE_BACKEND!r}, using redis")
+        return RedisBackend(settings.REDIS_URL, connect_timeout=settings.REDIS_CONNECT_TIMEOUT)
 
     @classmethod
     def init(cls):
-        if cls._redis is None:
-            cls._redis = redis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True
-            )
-            logger.info(f"Redis client initialized: {settings.REDIS_URL}")
+        if cls._backend is None:
+            cls._backend = cls._create_backend()
+            logger.info(f"Cache backend initialized: {cls._backend.name}")
+            if cls._backend.name == "redis":
+                logger.info(f"Redis client initialized: {settings.REDIS_URL}")
+                if settings.CACHE_FALLBACK_ENABLED:
+                    cls._fallback = MemoryBackend(settings.CACHE_MEMORY_MAX_ENTRIES)
+
+        if settings.CACHE_L1_ENABLED and cls._backend.supports_invalidation and cls._listener is None:
+            try:
+                cls._listener = asyncio.get_running_loop().create_task(cls._listen_invalidations())
+            except RuntimeError:
+                logger.warning("No running event loop, L1 cache invalidation listener not started")
 
     @classmethod
     async def close(cls):
-        if cls._redis:
-            await cls._redis.close()
-            logger.info("Redis client closed")
+        if cls._listener:
+            cls._listener.cancel()
+            try:
+                await cls._listener
+            except asyncio.CancelledError:
+                pass
+            cls._listener = None
+        if cls._backend:
+            await cls._backend.close()
+            logger.info(f"Cache backend closed: {cls._backend.name}")
+            cls._backend = None
+        cls._fallback = None
+
+    @classmethod
+    async def _listen_invalidations(cls):
+        retry_delay = 1
+        while True:
+            pubsub = None
+            try:
+                pubsub = cls._backend.client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(cls.INVALIDATION_CHANNEL)
+                # 断线期间可能漏掉了失效消息，重新订阅后清空 L1
+                cls._local.clear()
+                retry_delay = 1
+                async for message in pubsub.listen():
+                    worker_id, _, key = message["data"].partition(":")
+                    if worker_id != cls._worker_id:
+                        cls._drop_local(key)
+                        cls._invalidations += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis invalidation listener error: {e}, retrying in {retry_delay}s")
+                cls._local.clear()
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    @classmethod
+    def _drop_local(cls, key: str):
+        cls._local.delete((key, "raw"))
+        cls._local.delete((key, "bytes"))
+        cls._local.delete((key, "json"))
+        cls._local.delete((key, "decoded"))
 
     @classmethod
-    async def get(cls, key: str) -> Optional[str]:
+    def _active_backend(cls) -> Optional[CacheBackend]:
+        if cls._fallback is not None and time.monotonic() < cls._primary_down_until:
+            return cls._fallback
+        return cls._backend
+
+    @classmethod
+    async def _l2(cls, op: str, call: Callable[[CacheBackend], Awaitable[Any]], default: Any = None) -> Any:
+        """
+        在当前后端上执行 call，出错时记录并返回 default。
+        主后端整体不可用时改用降级存储，并在 CACHE_FALLBACK_RETRY 秒内不再尝试主后端。
+        """
+        backend = cls._active_backend()
+        if backend is None:
+            return default
         try:
-            if cls._redis:
-                return await cls._redis.get(key)
+            return await call(backend)
         except Exception as e:
-            logger.warning(f"Redis GET error: {e}")
-        return None
+            cls._l2_stats["errors"] += 1
+            logger.warning(f"Cache {op} error ({backend.name}): {e}")
+            if backend is not cls._backend or cls._fallback is None or not backend.is_unavailable(e):
+                return default
 
-    @classmethod
-    async def set(cls, key: str, value: str, ttl: int = 600):
+        cls._primary_down_until = time.monotonic() + settings.CACHE_FALLBACK_RETRY
+        cls._l2_stats["fallbacks"] += 1
+        logger.warning(
+            f"Cache backend {cls._backend.name} unavailable, "
+            f"using {cls._fallback.name} for {settings.CACHE_FALLBACK_RETRY}s"
+        )
         try:
-            if cls._redis:
-                await cls._redis.setex(key, ttl, value)
+            return await call(cls._fallback)
         except Exception as e:
-            logger.warning(f"Redis SET error: {e}")
+            logger.warning(f"Cache {op} error ({cls._fallback.name}): {e}")
+            return default
+
+    @classmethod
+    def _count(cls, value: Any):
+        cls._l2_stats["hits" if value is not None else "misses"] += 1
+
+    @staticmethod
+    def _record(key: str, result: str):
+        CACHE_REQUESTS.inc((key_prefix(key), result))
+
+    @classmethod
+    async def _l2_get(cls, key: str, binary: bool = False) -> Tuple[Optional[Union[str, bytes]], Optional[float]]:
+        """
+        返回 (值, L2 中剩余的秒数)，回填 L1 时用后者限制 L1 的有效期，
+        避免短 TTL 的 key 在 L1 中按 CACHE_L1_TTL 多留。
+        """
+        value, ttl = await cls._l2("GET", lambda backend: backend.get_with_ttl(key, binary), default=(None, None))
+        cls._count(value)
+        return value, ttl
+
+    @classmethod
+    async def get(cls, key: str, binary: bool = False) -> Optional[Union[str, bytes]]:
+        """
+        :param binary: Return the stored bytes as-is instead of decoding to str
+        """
+        local_key = (key, "bytes" if binary else "raw")
+        if settings.CACHE_L1_ENABLED:
+            value = cls._local.get(local_key, _MISSING)
+            if value is not _MISSING:
+                cls._record(key, "hit_l1")
+                return value
+
+        value, ttl = await cls._l2_get(key, binary)
+        cls._record(key, "miss" if value is None else "hit_l2")
+        if value is not None and settings.CACHE_L1_ENABLED:
+            cls._local.set(local_key, value, ttl)
+        return value
+
+    @classmethod
+    async def set(cls, key: str, value: Union[str, bytes], ttl: int = 600, soft_ttl: Optional[int] = None):
+        """
+        :param ttl: Hard TTL, the key is gone from the backend after this
+        :param soft_ttl: Soft TTL, after this is_stale() reports True but the value is still served
+        """
+        async with cls.pipeline() as pipe:
+            pipe.set(key, value, ttl, soft_ttl)
+
+    @classmethod
+    async def mget(cls, keys: List[str], binary: bool = False) -> List[Optional[Union[str, bytes]]]:
+        """
+        批量读取，先查 L1，剩下的用一次 MGET 取回。
+        返回值与 keys 一一对应，未命中为 None。
+        """
+        kind = "bytes" if binary else "raw"
+        values: List[Optional[Union[str, bytes]]] = [None] * len(keys)
+        missing = []
+        for idx, key in enumerate(keys):
+            value = cls._local.get((key, kind), _MISSING) if settings.CACHE_L1_ENABLED else _MISSING
+            if value is _MISSING:
+                missing.append(idx)
+            else:
+                values[idx] = value
+                cls._record(key, "hit_l1")
+
+        if not missing:
+            return values
+        missing_keys = [keys[idx] for idx in missing]
+        fetched = await cls._l2("MGET", lambda backend: backend.mget_with_ttl(missing_keys, binary))
+        if fetched is None:
+            for key in missing_keys:
+                cls._record(key, "miss")
+            return values
+        for idx, (value, ttl) in zip(missing, fetched):
+            values[idx] = value
+            cls._count(value)
+            cls._record(keys[idx], "miss" if value is None else "hit_l2")
+            if value is not None and settings.CACHE_L1_ENABLED:
+                cls._local.set((keys[idx], kind), value, ttl)
+        return values
+
+    @classmethod
+    async def mset_with_ttl(cls, mapping: Dict[str, str], ttl: int = 600, soft_ttl: Optional[int] = None) -> bool:
+        """
+        批量写入，值、软过期标记和 L1 失效通知一次发出。
+        """
+        if not mapping:
+            return True
+        async with cls.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ttl, soft_ttl)
+        return pipe.ok
+
+    @classmethod
+    async def delete_many(cls, keys: List[str]) -> bool:
+        if not keys:
+            return True
+        async with cls.pipeline() as pipe:
+            pipe.delete(*keys)
+        return pipe.ok
+
+    @classmethod
+    @asynccontextmanager
+    async def pipeline(cls, transaction: bool = False) -> AsyncIterator[CachePipeline]:
+        """
+        批量写入，退出 async with 时一次往返发出所有命令：
+
+            async with CacheClient.pipeline() as pipe:
+                pipe.set_json("a", 1, ttl=60)
+                pipe.incr("b")
+            pipe.ok, pipe.results
+
+        :param transaction: Apply the commands atomically (MULTI/EXEC on Redis)
+        """
+        batch = CachePipeline()
+        yield batch
+        await cls._execute(batch, transaction)
+
+    @classmethod
+    async def _execute(cls, batch: CachePipeline, transaction: bool = False):
+        if not batch._ops:
+            batch.ok, batch.results = True, []
+            return
+
+        written = list(dict.fromkeys(batch._written))
+
+        async def run(backend: CacheBackend) -> list:
+            ops = list(batch._ops)
+            if settings.CACHE_L1_ENABLED and backend.supports_invalidation:
+                ops.extend(("publish", cls.INVALIDATION_CHANNEL, f"{cls._worker_id}:{key}") for key in written)
+            return (await backend.execute(ops, transaction))[:len(batch._ops)]
+
+        results = await cls._l2("PIPELINE", run)
+        if results is None:
+            return
+
+        batch.results = results
+        batch.ok = True
+        for key in written:
+            cls._drop_local(key)
+        if settings.CACHE_L1_ENABLED:
+            for local_key, value, ttl in batch._local_values:
+                cls._local.set(local_key, value, ttl)
+
+    @classmethod
+    async def get_json(cls, key: str) -> Any:
+        """
+        读取 JSON 值，L1 中保存解码后的对象，命中时跳过解码。
+        """
+        if settings.CACHE_L1_ENABLED:
+            value = cls._local.get((key, "json"), _MISSING)
+            if value is not _MISSING:
+                cls._record(key, "hit_l1")
+                return value
+
+        raw, ttl = await cls._l2_get(key)
+        cls._record(key, "miss" if raw is None else "hit_l2")
+        if raw is None:
+            return None
+        value = loads(raw)
+        if settings.CACHE_L1_ENABLED:
+            cls._local.set((key, "json"), value, ttl)
+        return value
+
+    @classmethod
+    async def set_json(cls, key: str, value: Any, ttl: int = 600, soft_ttl: Optional[int] = None):
+        async with cls.pipeline() as pipe:
+            pipe.set_json(key, value, ttl, soft_ttl)
+
+    @classmethod
+    async def get_decoded(cls, key: str, decoder: Callable[[bytes], Any]) -> Any:
+        """
+        读取二进制值并用 decoder 解码，L1 中保存解码结果。
+        decoder 返回 None 视为未命中（例如格式版本不兼容）。
+        """
+        if settings.CACHE_L1_ENABLED:
+            value = cls._local.get((key, "decoded"), _MISSING)
+            if value is not _MISSING:
+                cls._record(key, "hit_l1")
+                return value
+
+        raw, ttl = await cls._l2_get(key, binary=True)
+        cls._record(key, "miss" if raw is None else "hit_l2")
+        if raw is None:
+            return None
+
+        value = decoder(raw)
+        if value is not None and settings.CACHE_L1_ENABLED:
+            cls._local.set((key, "decoded"), value, ttl)
+        return value
+
+    @classmethod
+    async def set_encoded(
+            cls,
+            key: str,
+            value: Any,
+            encoder: Callable[[Any], bytes],
+            ttl: int = 600,
+            soft_ttl: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        编码为二进制后写入，返回写入的字节数，失败返回 None。
+        """
+        async with cls.pipeline() as pipe:
+            size = pipe.set_encoded(key, value, encoder, ttl, soft_ttl)
+        return size if pipe.ok else None
+
+    @classmethod
+    def soft_key(cls, key: str) -> str:
+        return f"{key}{cls.SOFT_EXPIRY_SUFFIX}"
+
+    @staticmethod
+    def _soft_expired(soft_expires_at: Optional[Union[str, bytes]]) -> bool:
+        # 没有软过期标记（旧数据）也视为过期
+        if soft_expires_at is None:
+            return True
+        try:
+            return float(soft_expires_at) <= time.time()
+        except ValueError:
+            return True
+
+    @classmethod
+    async def is_stale(cls, key: str) -> bool:
+        """
+        值超过 soft TTL 时返回 True；没有软过期标记（旧数据）也视为过期。
+        """
+        return cls._soft_expired(await cls.get(cls.soft_key(key)))
+
+    @classmethod
+    async def is_stale_many(cls, keys: List[str]) -> List[bool]:
+        soft_values = await cls.mget([cls.soft_key(key) for key in keys])
+        return [cls._soft_expired(value) for value in soft_values]
+
+    @classmethod
+    async def get_with_stale(cls, key: str, binary: bool = False) -> Tuple[Optional[Union[str, bytes]], bool]:
+        """
+        一次 MGET 同时取回值和软过期标记，返回 (值, 是否已过软期限)。
+        """
+        value, soft_expires_at = await cls.mget([key, cls.soft_key(key)], binary)
+        return value, cls._soft_expired(soft_expires_at)
+
+    @classmethod
+    async def incr(cls, key: str) -> Optional[int]:
+        async with cls.pipeline() as pipe:
+            pipe.incr(key)
+        return pipe.results[0] if pipe.ok else None
+
+    @classmethod
+    async def acquire_lock(cls, name: str, ttl: int) -> Optional[str]:
+        """
+        跨 worker 的简单互斥锁 (SET NX PX)。
+        成功返回 token，被他人持有返回 None；后端不可用时放行并返回 token。
+        降级到进程内存储期间只在本 worker 内互斥。
+        """
+        token = uuid.uuid4().hex
+        acquired = await cls._l2("LOCK", lambda backend: backend.set_nx(name, token, ttl), default=True)
+        return token if acquired else None
+
+    @classmethod
+    async def lock_held(cls, name: str) -> bool:
+        """
+        锁当前是否被持有（不经过 L1）。后端不可用时返回 False。
+        """
+        return await cls._l2("LOCK GET", lambda backend: backend.get(name)) is not None
+
+    @classmethod
+    async def release_lock(cls, name: str, token: str):
+        await cls._l2("UNLOCK", lambda backend: backend.delete_if_equals(name, token))
+
+    @classmethod
+    async def extend_lock(cls, name: str, token: str, ttl: int) -> bool:
+        """
+        续期仍由自己持有的锁，锁已丢失时返回 False；后端不可用时视为成功。
+        """
+        return await cls._l2("LOCK EXTEND", lambda backend: backend.expire_if_equals(name, token, ttl), default=True)
+
+    @classmethod
+    async def hset_many(cls, key: str, mapping: Dict[str, str], ttl: Optional[int] = None):
+        if mapping:
+            await cls._l2("HSET", lambda backend: backend.hset_many(key, mapping, ttl))
+
+    @classmethod
+    async def hdel(cls, key: str, *fields: str):
+        if fields:
+            await cls._l2("HDEL", lambda backend: backend.hdel(key, *fields))
+
+    @classmethod
+    async def hvals(cls, key: str) -> List[str]:
+        return await cls._l2("HVALS", lambda backend: backend.hvals(key), default=[])
+
+    @classmethod
+    async def replace_hash(cls, key: str, mapping: Dict[str, str], ttl: int):
+        """
+        整体替换 hash，读方不会看到写了一半的结果。
+        """
+        await cls._l2("HASH REPLACE", lambda backend: backend.replace_hash(key, mapping, ttl))
+
+    @classmethod
+    async def rename_hash(cls, src: str, dst: str, ttl: int):
+        """
+        用分批写好的 src 整体替换 dst。
+        """
+        await cls._l2("HASH RENAME", lambda backend: backend.rename_hash(src, dst, ttl))
+
+    @classmethod
+    def local_usage(cls, match: Callable[[str], bool]) -> dict:
+        """
+        本 worker 的 L1 中 key 满足 match 的条目占用，见 LocalCache.usage。
+        """
+        return cls._local.usage(lambda local_key: match(local_key[0]))
+
+    @classmethod
+    def stats(cls) -> dict:
+        active = cls._active_backend()
+        return {
+            "l1": {
+                "enabled": settings.CACHE_L1_ENABLED,
+                "invalidations_received": cls._invalidations,
+                **cls._local.stats(),
+            },
+            "l2": {
+                "backend": cls._backend.name if cls._backend else None,
+                "active": active.name if active else None,
+                "degraded": active is not None and active is not cls._backend,
+                **cls._l2_stats,
+                **(active.stats() if active else {}),
+            },
+        }
 
 
 cache = CacheClient()
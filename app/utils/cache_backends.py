@@ -0,0 +1,573 @@
+"""
+CacheClient 的 L2 存储后端。
+
+- RedisBackend: 多 worker / 多节点共享，支持 L1 失效广播
+- MemoryBackend: 进程内 LRU + TTL，不需要任何外部服务；也用作 Redis 故障时的降级存储
+- SqliteBackend: 本地文件持久化，重启后缓存仍在，同一台机器上的 worker 共享
+
+后端方法出错时直接抛异常，由 CacheClient 统一记录并放行。
+写操作以 op 元组的形式批量提交给 execute()：
+    ("setex", key, ttl, value) / ("delete", key, ...) / ("incr", key) / ("publish", channel, message)
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import ResponseError as RedisResponseError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+Value = Union[str, bytes]
+
+
+def _as_text(value: Value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _as_bytes(value: Value) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+class CacheBackend:
+    name = ""
+    # 是否支持跨 worker 的 L1 失效广播
+    supports_invalidation = False
+
+    async def close(self):
+        pass
+
+    def is_unavailable(self, error: Exception) -> bool:
+        """
+        该异常是否表示后端整体不可用（而不是单条命令出错），CacheClient 据此切换到降级存储。
+        """
+        return False
+
+    async def get(self, key: str, binary: bool = False) -> Optional[Value]:
+        raise NotImplementedError
+
+    async def mget(self, keys: List[str], binary: bool = False) -> List[Optional[Value]]:
+        raise NotImplementedError
+
+    async def get_with_ttl(self, key: str, binary: bool = False) -> Tuple[Optional[Value], Optional[float]]:
+        """
+        返回 (值, 剩余秒数)，没有过期时间时剩余秒数为 None。供 CacheClient 回填 L1 时限制 L1 的有效期。
+        """
+        return (await self.mget_with_ttl([key], binary))[0]
+
+    async def mget_with_ttl(self, keys: List[str], binary: bool = False) -> List[Tuple[Optional[Value], Optional[float]]]:
+        raise NotImplementedError
+
+    async def execute(self, ops: List[tuple], transaction: bool = False) -> list:
+        raise NotImplementedError
+
+    async def set_nx(self, key: str, value: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        raise NotImplementedError
+
+    async def expire_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    async def hset_many(self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None):
+        raise NotImplementedError
+
+    async def hdel(self, key: str, *fields: str):
+        raise NotImplementedError
+
+    async def hvals(self, key: str) -> List[str]:
+        raise NotImplementedError
+
+    async def replace_hash(self, key: str, mapping: Dict[str, str], ttl: int):
+        """
+        整体替换 hash，读方不会看到写了一半的结果。
+        """
+        raise NotImplementedError
+
+    async def rename_hash(self, src: str, dst: str, ttl: int):
+        """
+        用 src 整体替换 dst，src 随之消失；src 不存在时 dst 保持不变。
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class RedisBackend(CacheBackend):
+    name = "redis"
+    supports_invalidation = True
+
+    _RELEASE_LOCK_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+    _EXTEND_LOCK_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("pexpire", KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, connect_timeout: Optional[float] = None):
+        self.client = redis.from_url(
+            url,
+            encoding="utf-8",
+            decode_responses=True,
+            socket_connect_timeout=connect_timeout
+        )
+        # 读取二进制值（如成员快照）走不做 decode 的连接
+        self.bytes_client = redis.from_url(url, decode_responses=False, socket_connect_timeout=connect_timeout)
+
+    async def close(self):
+        await self.bytes_client.close()
+        await self.client.close()
+
+    def is_unavailable(self, error: Exception) -> bool:
+        return isinstance(error, (RedisConnectionError, RedisTimeoutError, OSError))
+
+    async def get(self, key: str, binary: bool = False) -> Optional[Value]:
+        return await (self.bytes_client if binary else self.client).get(key)
+
+    async def mget(self, keys: List[str], binary: bool = False) -> List[Optional[Value]]:
+        return await (self.bytes_client if binary else self.client).mget(keys)
+
+    async def mget_with_ttl(self, keys: List[str], binary: bool = False) -> List[Tuple[Optional[Value], Optional[float]]]:
+        # MGET 和各 key 的 PTTL 放在同一个 pipeline 里，仍是一次往返
+        async with (self.bytes_client if binary else self.client).pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            values, *ttls = await pipe.execute()
+        return [(value, ttl / 1000 if ttl > 0 else None) for value, ttl in zip(values, ttls)]
+
+    async def execute(self, ops: List[tuple], transaction: bool = False) -> list:
+        async with self.client.pipeline(transaction=transaction) as pipe:
+            for op, *args in ops:
+                if op == "setex":
+                    key, ttl, value = args
+                    pipe.setex(key, ttl, value)
+                else:
+                    getattr(pipe, op)(*args)
+            return await pipe.execute()
+
+    async def set_nx(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self.client.set(key, value, nx=True, px=int(ttl * 1000)))
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        return bool(await self.client.eval(self._RELEASE_LOCK_SCRIPT, 1, key, value))
+
+    async def expire_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self.client.eval(self._EXTEND_LOCK_SCRIPT, 1, key, value, int(ttl * 1000)))
+
+    async def hset_many(self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=mapping)
+            if ttl:
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def hdel(self, key: str, *fields: str):
+        await self.client.hdel(key, *fields)
+
+    async def hvals(self, key: str) -> List[str]:
+        return await self.client.hvals(key)
+
+    async def replace_hash(self, key: str, mapping: Dict[str, str], ttl: int):
+        # 先写临时 key 再 RENAME
+        tmp_key = f"{key}:tmp:{os.urandom(8).hex()}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            if mapping:
+                pipe.hset(tmp_key, mapping=mapping)
+                pipe.expire(tmp_key, ttl)
+                pipe.rename(tmp_key, key)
+            else:
+                pipe.delete(key)
+            await pipe.execute()
+
+    async def rename_hash(self, src: str, dst: str, ttl: int):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.expire(src, ttl)
+            pipe.rename(src, dst)
+            try:
+                await pipe.execute()
+            except RedisResponseError:
+                # src 不存在
+                pass
+
+
+class MemoryBackend(CacheBackend):
+    """
+    进程内存储，按 max_entries 做 LRU 淘汰，过期在访问时惰性清理。
+    锁和计数器不参与淘汰，也不占 max_entries，被淘汰会破坏互斥或让计数器从头开始。
+    多 worker 之间不共享。
+    """
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (expires_at 或 None, 值)；hash 的值为 dict
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._pinned: Set[str] = set()
+        self.evictions = 0
+
+    def _get_entry(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _remove(self, key: str) -> bool:
+        self._pinned.discard(key)
+        return self._data.pop(key, None) is not None
+
+    def _put(self, key: str, value: Any, ttl: Optional[float], pinned: bool = False):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if pinned:
+            self._pinned.add(key)
+        while len(self._data) - len(self._pinned) > self.max_entries:
+            oldest = next(key for key in self._data if key not in self._pinned)
+            del self._data[oldest]
+            self.evictions += 1
+
+    def _ttl_left(self, key: str) -> Optional[float]:
+        expires_at = self._data[key][0]
+        return None if expires_at is None else max(expires_at - time.monotonic(), 0.001)
+
+    async def get(self, key: str, binary: bool = False) -> Optional[Value]:
+        value = self._get_entry(key)
+        if value is None or isinstance(value, dict):
+            return None
+        return _as_bytes(value) if binary else _as_text(value)
+
+    async def mget(self, keys: List[str], binary: bool = False) -> List[Optional[Value]]:
+        return [await self.get(key, binary) for key in keys]
+
+    async def mget_with_ttl(self, keys: List[str], binary: bool = False) -> List[Tuple[Optional[Value], Optional[float]]]:
+        result = []
+        for key in keys:
+            value = await self.get(key, binary)
+            result.append((value, self._ttl_left(key) if value is not None else None))
+        return result
+
+    async def execute(self, ops: List[tuple], transaction: bool = False) -> list:
+        # 单线程事件循环内同步执行，天然是原子的
+        results = []
+        for op, *args in ops:
+            if op == "setex":
+                key, ttl, value = args
+                self._put(key, value, ttl)
+                results.append(True)
+            elif op == "delete":
+                results.append(sum(self._remove(key) for key in args))
+            elif op == "incr":
+                key = args[0]
+                value = int(_as_text(self._get_entry(key) or "0")) + 1
+                self._put(key, str(value), self._ttl_left(key) if key in self._data else None, pinned=True)
+                results.append(value)
+            elif op == "publish":
+                results.append(0)
+            else:
+                raise ValueError(f"Unsupported cache op {op!r}")
+        return results
+
+    async def set_nx(self, key: str, value: str, ttl: float) -> bool:
+        if self._get_entry(key) is not None:
+            return False
+        self._put(key, value, ttl, pinned=True)
+        return True
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        if self._get_entry(key) != value:
+            return False
+        self._remove(key)
+        return True
+
+    async def expire_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        if self._get_entry(key) != value:
+            return False
+        self._put(key, value, ttl, pinned=True)
+        return True
+
+    async def hset_many(self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None):
+        current = self._get_entry(key)
+        if not isinstance(current, dict):
+            current = {}
+        ttl = ttl or (self._ttl_left(key) if key in self._data else None)
+        self._put(key, {**current, **mapping}, ttl)
+
+    async def hdel(self, key: str, *fields: str):
+        current = self._get_entry(key)
+        if isinstance(current, dict):
+            for field in fields:
+                current.pop(field, None)
+
+    async def hvals(self, key: str) -> List[str]:
+        current = self._get_entry(key)
+        return list(current.values()) if isinstance(current, dict) else []
+
+    async def replace_hash(self, key: str, mapping: Dict[str, str], ttl: int):
+        if mapping:
+            self._put(key, dict(mapping), ttl)
+        else:
+            self._remove(key)
+
+    async def rename_hash(self, src: str, dst: str, ttl: int):
+        current = self._get_entry(src)
+        if isinstance(current, dict):
+            self._remove(src)
+            self._put(dst, current, ttl)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "pinned_entries": len(self._pinned),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
+
+
+class SqliteBackend(CacheBackend):
+    """
+    SQLite 持久化存储，同步调用放到线程池执行。
+    WAL 模式下同一台机器的多个 worker 可以共享同一个文件，但没有 L1 失效广播，
+    其他 worker 的 L1 要等 CACHE_L1_TTL 到期才会看到新值。
+    """
+    name = "sqlite"
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hash (key TEXT, field TEXT, value TEXT, PRIMARY KEY (key, field))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hash_ttl (key TEXT PRIMARY KEY, expires_at REAL)"
+            )
+
+    async def _run(self, func, *args):
+        return await asyncio.to_thread(self._locked, func, *args)
+
+    def _locked(self, func, *args):
+        with self._lock:
+            return func(*args)
+
+    def _transaction(self, func, *args):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge()
+        return result
+
+    def _purge(self):
+        now = time.time()
+        self._conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT key FROM hash_ttl WHERE expires_at <= ?", (now,)
+        )]
+        for key in expired:
+            self._drop_hash(key)
+
+    def _drop_hash(self, key: str):
+        self._conn.execute("DELETE FROM hash WHERE key = ?", (key,))
+        self._conn.execute("DELETE FROM hash_ttl WHERE key = ?", (key,))
+
+    def _get(self, key: str) -> Optional[Value]:
+        row = self._conn.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    async def get(self, key: str, binary: bool = False) -> Optional[Value]:
+        value = await self._run(self._get, key)
+        if value is None:
+            return None
+        return _as_bytes(value) if binary else _as_text(value)
+
+    async def mget(self, keys: List[str], binary: bool = False) -> List[Optional[Value]]:
+        def read():
+            return [self._get(key) for key in keys]
+
+        convert = _as_bytes if binary else _as_text
+        return [None if value is None else convert(value) for value in await self._run(read)]
+
+    async def mget_with_ttl(self, keys: List[str], binary: bool = False) -> List[Tuple[Optional[Value], Optional[float]]]:
+        def read():
+            now = time.time()
+            rows = []
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, now)
+                ).fetchone()
+                rows.append((row[0], None if row[1] is None else row[1] - now) if row else (None, None))
+            return rows
+
+        convert = _as_bytes if binary else _as_text
+        return [(None if value is None else convert(value), ttl) for value, ttl in await self._run(read)]
+
+    def _setex(self, key: str, ttl: Optional[float], value: Value):
+        expires_at = time.time() + ttl if ttl else None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at)
+        )
+
+    def _execute_ops(self, ops: List[tuple]) -> list:
+        results = []
+        for op, *args in ops:
+            if op == "setex":
+                key, ttl, value = args
+                self._setex(key, ttl, value)
+                results.append(True)
+            elif op == "delete":
+                deleted = 0
+                for key in args:
+                    deleted += self._conn.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount
+                    self._drop_hash(key)
+                results.append(deleted)
+            elif op == "incr":
+                key = args[0]
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, time.time())
+                ).fetchone()
+                value = int(_as_text(row[0])) + 1 if row else 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, str(value), row[1] if row else None)
+                )
+                results.append(value)
+            elif op == "publish":
+                results.append(0)
+            else:
+                raise ValueError(f"Unsupported cache op {op!r}")
+        return results
+
+    async def execute(self, ops: List[tuple], transaction: bool = False) -> list:
+        # 每批都在一个事务里执行
+        return await self._run(self._transaction, self._execute_ops, ops)
+
+    async def set_nx(self, key: str, value: str, ttl: float) -> bool:
+        def set_nx():
+            if self._get(key) is not None:
+                return False
+            self._setex(key, ttl, value)
+            return True
+
+        return await self._run(self._transaction, set_nx)
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        def delete():
+            if self._get(key) != value:
+                return False
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            return True
+
+        return await self._run(self._transaction, delete)
+
+    async def expire_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        def expire():
+            if self._get(key) != value:
+                return False
+            self._setex(key, ttl, value)
+            return True
+
+        return await self._run(self._transaction, expire)
+
+    def _hash_expired(self, key: str) -> bool:
+        row = self._conn.execute("SELECT expires_at FROM hash_ttl WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] <= time.time()
+
+    def _write_hash(self, key: str, mapping: Dict[str, str], ttl: Optional[int]):
+        if self._hash_expired(key):
+            self._drop_hash(key)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO hash (key, field, value) VALUES (?, ?, ?)",
+            [(key, field, value) for field, value in mapping.items()]
+        )
+        if ttl:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hash_ttl (key, expires_at) VALUES (?, ?)",
+                (key, time.time() + ttl)
+            )
+
+    async def hset_many(self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None):
+        await self._run(self._transaction, self._write_hash, key, mapping, ttl)
+
+    async def hdel(self, key: str, *fields: str):
+        def hdel():
+            self._conn.executemany("DELETE FROM hash WHERE key = ? AND field = ?", [(key, f) for f in fields])
+
+        await self._run(self._transaction, hdel)
+
+    async def hvals(self, key: str) -> List[str]:
+        def hvals():
+            if self._hash_expired(key):
+                return []
+            return [row[0] for row in self._conn.execute("SELECT value FROM hash WHERE key = ?", (key,))]
+
+        return await self._run(hvals)
+
+    async def replace_hash(self, key: str, mapping: Dict[str, str], ttl: int):
+        def replace():
+            self._drop_hash(key)
+            if mapping:
+                self._write_hash(key, mapping, ttl)
+
+        await self._run(self._transaction, replace)
+
+    async def rename_hash(self, src: str, dst: str, ttl: int):
+        def rename():
+            if self._hash_expired(src):
+                self._drop_hash(src)
+            if self._conn.execute("SELECT 1 FROM hash WHERE key = ? LIMIT 1", (src,)).fetchone() is None:
+                return
+            self._drop_hash(dst)
+            self._conn.execute("UPDATE hash SET key = ? WHERE key = ?", (dst, src))
+            self._conn.execute("DELETE FROM hash_ttl WHERE key = ?", (src,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hash_ttl (key, expires_at) VALUES (?, ?)",
+                (dst, time.time() + ttl)
+            )
+
+        await self._run(self._transaction, rename)
+
+    async def close(self):
+        await self._run(self._conn.close)
+
+    def stats(self) -> dict:
+        return {"path": self.path, "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
@@ -0,0 +1,55 @@
+"""
+响应体压缩，按 Accept-Encoding 选择 br 或 gzip。
+压缩结果只依赖内容和编码方式，调用方可以把压缩后的字节和原始结果一起缓存。
+"""
+import gzip
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只支持 gzip
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def preferred_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    客户端接受的编码中优先级最高的一种，不考虑响应大小。
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def choose_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    """
+    返回 "br" / "gzip"，响应太小或客户端不支持时返回 None。
+    """
+    if not should_compress(size):
+        return None
+    return preferred_encoding(accept_encoding)
+
+
+def should_compress(size: int) -> bool:
+    return 0 < settings.RESPONSE_COMPRESSION_MIN_SIZE <= size
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
@@ -0,0 +1,199 @@
+import asyncio
+import random
+import re
+import time
+from typing import Dict, Optional
+
+from httpx import Response
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.http_client import HttpClient
+from app.utils.metrics import UPSTREAM_RETRIES
+
+# guild / channel / webhook id 是 Discord 的 major parameter，各自拥有独立的限速桶
+_MAJOR_PARAM_RE = re.compile(r"^/(guilds|channels|webhooks)/(\d+)")
+_ID_RE = re.compile(r"/\d{5,}")
+
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+class _Bucket:
+    __slots__ = ("remaining", "limit", "window", "reset_at", "lock")
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        # 见过的最大 Reset-After，作为窗口长度的估计
+        self.window = 0.0
+        self.reset_at = 0.0
+        self.lock = asyncio.Lock()
+
+
+class DiscordClient:
+    """
+    带限速感知的 Discord REST 客户端。
+    - 按 route 记录 X-RateLimit-Bucket，同桶请求共享剩余额度，额度用完时等到 reset 再发
+    - 全局令牌桶限制每秒请求数，收到 global 429 时所有请求一起暂停
+    - 429 按 retry_after 重试，5xx 指数退避加抖动
+    """
+    _route_buckets: Dict[str, str] = {}
+    _buckets: Dict[str, _Bucket] = {}
+    _global_reset_at = 0.0
+    _global_tokens: float = 0.0
+    _global_updated_at = 0.0
+    _global_lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def _route_key(cls, method: str, path: str) -> str:
+        match = _MAJOR_PARAM_RE.match(path)
+        if match:
+            major = match.group(0)
+            rest = _ID_RE.sub("/{id}", path[len(major):])
+            return f"{method} {major}{rest}"
+        return f"{method} {_ID_RE.sub('/{id}', path)}"
+
+    @classmethod
+    def _get_bucket(cls, route: str) -> _Bucket:
+        # 还不知道桶 hash 时先按 route 单独建桶，拿到响应头后再合并
+        bucket_id = cls._route_buckets.get(route, route)
+        bucket = cls._buckets.get(bucket_id)
+        if bucket is None:
+            bucket = cls._buckets[bucket_id] = _Bucket()
+        return bucket
+
+    @classmethod
+    async def _acquire_global(cls):
+        if cls._global_lock is None:
+            cls._global_lock = asyncio.Lock()
+        rate = settings.DISCORD_GLOBAL_RATE_LIMIT
+        async with cls._global_lock:
+            while True:
+                now = time.monotonic()
+                if now < cls._global_reset_at:
+                    await asyncio.sleep(cls._global_reset_at - now)
+                    continue
+                cls._global_tokens = min(rate, cls._global_tokens + (now - cls._global_updated_at) * rate)
+                cls._global_updated_at = now
+                if cls._global_tokens >= 1:
+                    cls._global_tokens -= 1
+                    return
+                await asyncio.sleep((1 - cls._global_tokens) / rate)
+
+    @classmethod
+    async def _reserve(cls, bucket: _Bucket):
+        async with bucket.lock:
+            now = time.monotonic()
+            # 等待期间其他请求的响应可能推迟 reset，醒来后重新检查
+            while bucket.remaining is not None and bucket.remaining <= 0 and now < bucket.reset_at:
+                delay = bucket.reset_at - now
+                logger.debug("Discord bucket exhausted, waiting %.2fs", delay)
+                await asyncio.sleep(delay)
+                now = time.monotonic()
+            if bucket.remaining is not None and now >= bucket.reset_at:
+                # 新窗口：额度按 X-RateLimit-Limit 恢复，不知道上限时不限制，等响应头校正
+                bucket.remaining = bucket.limit
+                bucket.reset_at = now + bucket.window
+            if bucket.remaining is not None:
+                bucket.remaining -= 1
+
+    @classmethod
+    def _update_bucket(cls, route: str, bucket: _Bucket, response: Response) -> _Bucket:
+        headers = response.headers
+        bucket_id = headers.get("X-RateLimit-Bucket")
+        if bucket_id and cls._route_buckets.get(route) != bucket_id:
+            cls._route_buckets[route] = bucket_id
+            bucket = cls._buckets.setdefault(bucket_id, bucket)
+
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_after = float(headers["X-RateLimit-Reset-After"])
+            limit = int(headers["X-RateLimit-Limit"]) if "X-RateLimit-Limit" in headers else None
+        except (KeyError, ValueError):
+            return bucket
+
+        now = time.monotonic()
+        if limit is not None:
+            bucket.limit = limit
+        bucket.window = max(bucket.window, reset_after)
+        if bucket.remaining is not None and now < bucket.reset_at:
+            # 同一窗口内响应可能乱序到达，先发出的请求带回的剩余额度更多，只取更小的值
+            bucket.remaining = min(bucket.remaining, remaining)
+            bucket.reset_at = max(bucket.reset_at, now + reset_after)
+        else:
+            bucket.remaining = remaining
+            bucket.reset_at = now + reset_after
+        return bucket
+
+    @classmethod
+    def _backoff(cls, attempt: int) -> float:
+        base = settings.DISCORD_RETRY_BASE_DELAY * (2 ** attempt)
+        return min(settings.DISCORD_RETRY_MAX_DELAY, base) * random.uniform(0.5, 1.0)
+
+    @classmethod
+    async def request(
+            cls,
+            method: str,
+            path: str,
+            max_retries: int = 5,
+            **kwargs
+    ) -> Response:
+        """
+        :param method: GET, POST, etc.
+        :param path: API path under DISCORD_API_BASE, e.g. /users/123
+        :param max_retries: Retries for 429 and 5xx responses
+        :param kwargs: Other parameters to be passed to HttpClient.request
+        :return: httpx.Response, the last response once retries are exhausted
+        """
+        method = method.upper()
+        route = cls._route_key(method, path)
+        url = f"{settings.DISCORD_API_BASE}{path}"
+        headers = {"Authorization": f"Bot {settings.DISCORD_BOT_TOKEN}", **kwargs.pop("headers", {})}
+
+        attempt = 0
+        while True:
+            bucket = cls._get_bucket(route)
+            await cls._acquire_global()
+            await cls._reserve(bucket)
+
+            response = await HttpClient.request(method, url, headers=headers, **kwargs)
+            bucket = cls._update_bucket(route, bucket, response)
+
+            if response.status_code == 429:
+                retry_after = cls._retry_after(response)
+                if response.headers.get("X-RateLimit-Global") or response.headers.get("X-RateLimit-Scope") == "global":
+                    cls._global_reset_at = time.monotonic() + retry_after
+                else:
+                    bucket.remaining = 0
+                    bucket.reset_at = time.monotonic() + retry_after
+                if attempt >= max_retries:
+                    return response
+                UPSTREAM_RETRIES.inc((response.request.url.host, "rate_limited"))
+                logger.warning("Discord rate limited on %s, retrying in %.2fs", route, retry_after)
+                attempt += 1
+                continue
+
+            if response.status_code in RETRYABLE_STATUS and attempt < max_retries:
+                delay = cls._backoff(attempt)
+                UPSTREAM_RETRIES.inc((response.request.url.host, "server_error"))
+                logger.warning("Discord %d on %s, retrying in %.2fs", response.status_code, route, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            return response
+
+    @classmethod
+    def _retry_after(cls, response: Response) -> float:
+        try:
+            return float(response.json().get("retry_after"))
+        except Exception:
+            pass
+        try:
+            return float(response.headers.get("Retry-After", 1))
+        except ValueError:
+            return 1.0
+
+    @classmethod
+    async def get(cls, path: str, **kwargs) -> Response:
+        return await cls.request("GET", path, **kwargs)
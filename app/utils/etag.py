@@ -0,0 +1,30 @@
+"""
+强 ETag 与 If-None-Match 的匹配。同一内容的不同压缩编码各有自己的 ETag。
+"""
+from typing import Optional
+
+from app.utils.compression import SUPPORTED_ENCODINGS
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    不同编码的响应体不同，强 ETag 也要不同：在引号内追加 -gzip / -br。
+    """
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def matched_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """
+    If-None-Match 中与 etag 匹配的一项，比较时忽略 W/ 和编码后缀；
+    返回客户端持有的那个 ETag，304 原样带回。没有匹配时返回 None。
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        tag = candidate[2:] if candidate.startswith("W/") else candidate
+        if tag == etag or any(tag == encoded_etag(etag, encoding) for encoding in SUPPORTED_ENCODINGS):
+            return candidate
+    return None
@@ -1,38 +1,118 @@
 import asyncio
+import logging
+import random
 import time
-from typing import Optional
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
 
 import httpx
 from httpx import Response
 
-from app.core.config import settings
+from app.core.config import HttpClientProfile, settings
 from app.core.logger import logger
+from app.utils.metrics import UPSTREAM_LATENCY, UPSTREAM_RETRIES
 
 
 class HttpClient:
-    _client: Optional[httpx.AsyncClient] = None
+    """
+    按上游划分的 httpx 客户端，每个 profile 有独立的连接池和超时配置，
+    慢上游占满自己的连接池也不会影响其他上游。
+    """
+    _clients: Dict[str, httpx.AsyncClient] = {}
+    _stats: Dict[str, dict] = {}
 
     @classmethod
-    def get_client(cls) -> httpx.AsyncClient:
-        if cls._client is None:
+    def _profile_for(cls, url: str) -> str:
+        host = httpx.URL(url).host
+        return settings.HTTP_CLIENT_HOST_PROFILES.get(host, "default")
+
+    @classmethod
+    def _get_profile(cls, name: str) -> HttpClientProfile:
+        profile = settings.HTTP_CLIENT_PROFILES.get(name)
+        if profile is None:
+            logger.warning("Unknown HTTP client profile %r, using default", name)
+            profile = settings.HTTP_CLIENT_PROFILES.get("default") or HttpClientProfile()
+        return profile
+
+    @classmethod
+    def get_client(cls, profile: str = "default") -> httpx.AsyncClient:
+        client = cls._clients.get(profile)
+        if client is None:
+            conf = cls._get_profile(profile)
+            http2 = conf.http2
+            if http2 and importlib.util.find_spec("h2") is None:
+                logger.warning("HTTP/2 requested for profile %r but 'h2' is not installed, using HTTP/1.1", profile)
+                http2 = False
+
             proxies = settings.HTTP_PROXY if settings.HTTP_PROXY else None
-            cls._client = httpx.AsyncClient(
+            client = httpx.AsyncClient(
                 proxy=proxies,
-                timeout=30.0,
+                http2=http2,
+                timeout=httpx.Timeout(
+                    connect=conf.connect_timeout,
+                    read=conf.read_timeout,
+                    write=conf.write_timeout,
+                    pool=conf.pool_timeout
+                ),
+                limits=httpx.Limits(
+                    max_connections=conf.max_connections,
+                    max_keepalive_connections=conf.max_keepalive_connections,
+                    keepalive_expiry=conf.keepalive_expiry
+                ),
                 headers={
                     "User-Agent": f"{settings.PROJECT_NAME}/1.0",
                     "Accept": "application/json"
                 }
             )
-            logger.info(f"Initialized HTTP Client with proxies: {proxies if proxies else 'None'}")
-        return cls._client
+            cls._clients[profile] = client
+            cls._stats[profile] = {"requests": 0, "in_flight": 0, "peak_in_flight": 0}
+            logger.info(
+                "Initialized HTTP Client [%s] with proxies: %s, max_connections: %d, http2: %s",
+                profile, proxies if proxies else "None", conf.max_connections, http2
+            )
+        return client
 
     @classmethod
     async def close(cls):
-        if cls._client:
-            await cls._client.aclose()
-            cls._client = None
-            logger.info("HTTP Client closed.")
+        for profile, client in cls._clients.items():
+            await client.aclose()
+            logger.info("HTTP Client [%s] closed.", profile)
+        cls._clients = {}
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        各 profile 的请求计数和进行中的请求数，用于按实际数据调整连接池大小。
+        计数由 request 和 stream 维护；httpcore 没有公开连接池状态，不返回连接数。
+        """
+        result = {}
+        for profile, counters in cls._stats.items():
+            conf = cls._get_profile(profile)
+            result[profile] = {
+                **counters,
+                "max_connections": conf.max_connections,
+                "utilization": round(counters["in_flight"] / conf.max_connections, 3) if conf.max_connections else None,
+            }
+        return result
+
+    @classmethod
+    @asynccontextmanager
+    async def stream(cls, method: str, url: str, profile: Optional[str] = None, **kwargs) -> AsyncIterator[Response]:
+        """
+        流式读取响应体，不重试；响应关闭前都计入 in_flight。
+        """
+        profile = profile or cls._profile_for(url)
+        client = cls.get_client(profile)
+        counters = cls._stats[profile]
+        counters["requests"] += 1
+        counters["in_flight"] += 1
+        counters["peak_in_flight"] = max(counters["peak_in_flight"], counters["in_flight"])
+        try:
+            async with client.stream(method, url, **kwargs) as response:
+                yield response
+        finally:
+            counters["in_flight"] -= 1
 
     @classmethod
     async def request(
@@ -41,51 +121,66 @@ class HttpClient:
             url: str,
             retries: int = 3,
             retry_delay: int = 1,
+            profile: Optional[str] = None,
             **kwargs
     ) -> Response | None:
         """
         :param method: GET, POST, etc.
         :param url: Request Address
         :param retries: Retry Count (default 3 times)
-        :param retry_delay: Retry Interval (seconds)
+        :param retry_delay: Base retry interval (seconds), doubled on each retry with jitter
+        :param profile: Client profile, picked from HTTP_CLIENT_HOST_PROFILES by host when omitted
         :param kwargs: Other parameters to be passed to httpx
         :return: httpx.Response
         """
-        client = cls.get_client()
+        profile = profile or cls._profile_for(url)
+        client = cls.get_client(profile)
+        counters = cls._stats[profile]
         current_retry = 0
 
-        log_prefix = f"[{method.upper()}] {url}"
-
         while current_retry <= retries:
             start_time = time.time()
             try:
-                logger.debug(f"Requesting: {log_prefix} | Try: {current_retry + 1}/{retries + 1}")
-
-                response = await client.request(method, url, **kwargs)
-                process_time = (time.time() - start_time) * 1000
+                # 本模块统一使用 %-style：热路径上的格式化推迟到真正输出时
+                logger.debug("Requesting: [%s] %s | Try: %d/%d", method, url, current_retry + 1, retries + 1)
+
+                counters["requests"] += 1
+                counters["in_flight"] += 1
+                counters["peak_in_flight"] = max(counters["peak_in_flight"], counters["in_flight"])
+                try:
+                    response = await client.request(method, url, **kwargs)
+                finally:
+                    counters["in_flight"] -= 1
+                elapsed = time.time() - start_time
+                process_time = elapsed * 1000
                 status_code = response.status_code
-                log_msg = f"Finished: {log_prefix} | Status: {status_code} | Time: {process_time:.2f}ms"
+                UPSTREAM_LATENCY.observe(elapsed, (response.request.url.host, status_code))
 
                 if 200 <= status_code < 300:
-                    logger.info(log_msg)
+                    level = logging.INFO
                 elif 300 <= status_code < 400:
-                    logger.warning(log_msg)
+                    level = logging.WARNING
                 else:
-                    logger.error(log_msg)
+                    level = logging.ERROR
+                logger.log(level, "Finished: [%s] %s | Status: %d | Time: %.2fms", method, url, status_code, process_time)
 
                 return response
 
             except httpx.RequestError as exc:
-                logger.warning(f"Request Error: {log_prefix} | Error: {exc} | Retrying in {retry_delay}s...")
                 current_retry += 1
+                host = httpx.URL(url).host
+                UPSTREAM_LATENCY.observe(time.time() - start_time, (host, "error"))
                 if current_retry > retries:
-                    logger.critical(f"Max retries reached for {log_prefix}")
+                    logger.critical("Max retries reached for [%s] %s", method, url)
                     raise exc
 
-                await asyncio.sleep(retry_delay)
+                UPSTREAM_RETRIES.inc((host, "request_error"))
+                delay = retry_delay * (2 ** (current_retry - 1)) * random.uniform(0.5, 1.5)
+                logger.warning("Request Error: [%s] %s | Error: %s | Retrying in %.2fs...", method, url, exc, delay)
+                await asyncio.sleep(delay)
 
             except Exception as e:
-                logger.error(f"Unexpected Error: {log_prefix} | {e}")
+                logger.error("Unexpected Error: [%s] %s | %s", method, url, e)
                 raise e
         return None
 
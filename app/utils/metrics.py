@@ -0,0 +1,177 @@
+"""
+进程内指标，按 Prometheus 文本格式导出。
+
+热路径上只做 dict 查找和加法：标签是调用方传入的值元组，
+转成字符串、拼接输出都推迟到 /metrics 被抓取时。
+多 worker 部署时每个 worker 各自导出自己的数据。
+"""
+import math
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _labels(self, values: Tuple, extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        pairs.extend(f'{name}="{value}"' for name, value in extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{self._labels(labels)} {_format_number(value)}"
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, labels: Tuple = ()):
+        self._values[labels] = value
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{self._labels(labels)} {_format_number(value)}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各桶计数 (不累加，最后一个是 +Inf)..., sum, count]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, labels: Tuple = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def _samples(self) -> Iterable[str]:
+        bounds = self.buckets + (math.inf,)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = (("le", _format_number(bound)),)
+                yield f"{self.name}_bucket{self._labels(labels, le)} {_format_number(cumulative)}"
+            yield f"{self.name}_sum{self._labels(labels)} {_format_number(series[-2])}"
+            yield f"{self.name}_count{self._labels(labels)} {_format_number(series[-1])}"
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def key_prefix(key: str) -> str:
+    """
+    缓存 key 的前两段，如 discord:avatar:123 -> discord:avatar，用作低基数的标签。
+    """
+    first = key.find(":")
+    if first < 0:
+        return key
+    second = key.find(":", first + 1)
+    return key if second < 0 else key[:second]
+
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by key prefix and outcome (hit_l1, hit_l2, miss).",
+    ("prefix", "result"),
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Upstream HTTP request latency by host and status code.",
+    ("host", "status"),
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total",
+    "Upstream HTTP retries by host and reason.",
+    ("host", "reason"),
+)
+MEMBER_SYNC_DURATION = Histogram(
+    "member_sync_duration_seconds",
+    "Duration of a full guild member pagination by guild.",
+    ("guild",),
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+MEMBER_SYNC_PAGES = Counter(
+    "member_sync_pages_total",
+    "Guild member pages fetched from Discord by guild.",
+    ("guild",),
+)
+MEMBER_SYNC_MEMBERS = Gauge(
+    "member_sync_members",
+    "Members returned by the last full sync by guild.",
+    ("guild",),
+)
+MEMBER_SYNC_IN_PROGRESS = Gauge(
+    "member_sync_in_progress",
+    "1 while this worker is running a full member sync of the guild.",
+    ("guild",),
+)
+MEMBER_SNAPSHOT_BYTES = Gauge(
+    "member_snapshot_bytes",
+    "Encoded size of the last written member snapshot by guild.",
+    ("guild",),
+)
+MC_PROBE_LATENCY = Histogram(
+    "mc_probe_duration_seconds",
+    "Minecraft server probe duration by protocol and result.",
+    ("protocol", "result"),
+)
@@ -0,0 +1,88 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List
+
+from app.core.logger import logger
+from app.utils.cache import CacheClient
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[None]]
+    interval: float
+    jitter: float = 0.1
+    leader_only: bool = True
+
+
+class Scheduler:
+    """
+    由 lifespan 启停的周期任务调度器。
+    每轮间隔加上随机抖动，避免多个 worker 同时触发；
+    leader_only 的任务每轮通过 Redis 锁只让一个 worker 执行。
+    """
+    LEADER_LOCK_PREFIX = "scheduler:leader:"
+
+    _jobs: List[Job] = []
+    _tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def add_job(
+            cls,
+            name: str,
+            func: Callable[[], Awaitable[None]],
+            interval: float,
+            jitter: float = 0.1,
+            leader_only: bool = True
+    ):
+        """
+        :param name: Job name, also used for the leader lock
+        :param func: Coroutine function run every interval
+        :param interval: Seconds between runs
+        :param jitter: Random extra delay as a fraction of interval
+        :param leader_only: Only one worker runs the job per interval
+        """
+        cls._jobs.append(Job(name, func, interval, jitter, leader_only))
+
+    @classmethod
+    def start(cls):
+        for job in cls._jobs:
+            cls._tasks.append(asyncio.create_task(cls._run_job(job)))
+        logger.info(f"Scheduler started with {len(cls._jobs)} jobs")
+
+    @classmethod
+    async def stop(cls):
+        for task in cls._tasks:
+            task.cancel()
+        await asyncio.gather(*cls._tasks, return_exceptions=True)
+        cls._tasks = []
+        cls._jobs = []
+        logger.info("Scheduler stopped")
+
+    @classmethod
+    async def _run_job(cls, job: Job):
+        # 首轮也加抖动，错开各 worker 的启动时刻
+        await asyncio.sleep(random.uniform(0, job.interval * job.jitter))
+        while True:
+            try:
+                if await cls._should_run(job):
+                    logger.debug(f"Running scheduled job: {job.name}")
+                    await job.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled job {job.name} failed: {e}")
+
+            await asyncio.sleep(job.interval + random.uniform(0, job.interval * job.jitter))
+
+    @classmethod
+    async def _should_run(cls, job: Job) -> bool:
+        if not job.leader_only:
+            return True
+        # 锁不主动释放，持有到本轮结束前，其余 worker 这一轮都会跳过
+        token = await CacheClient.acquire_lock(
+            f"{cls.LEADER_LOCK_PREFIX}{job.name}",
+            ttl=max(1.0, job.interval * 0.9)
+        )
+        return token is not None
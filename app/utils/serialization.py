@@ -0,0 +1,30 @@
+"""
+统一的 JSON 序列化，基于 orjson。
+输出为紧凑的 UTF-8 字节（等价于 json.dumps(ensure_ascii=False, separators=(",", ":"))），
+可以直接写入缓存或作为响应体，不需要再 encode。
+"""
+from typing import Any, Union
+
+import orjson
+from starlette.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    return orjson.dumps(value, option=_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _OPTIONS)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    return orjson.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    默认响应类。带 response_model 的接口由 Pydantic 转成 dict/list 后交给 orjson 编码，
+    比 Pydantic 直接输出 JSON 再包一层 Response 更快。
+    已经是 JSON 字节的数据（如缓存中的结果）应直接返回 Response，跳过这两步。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
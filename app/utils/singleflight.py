@@ -0,0 +1,100 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.logger import logger
+from app.utils.cache import CacheClient
+
+
+class SingleFlight:
+    """
+    合并同一个 key 的并发回源请求。
+    进程内同 key 只跑一个任务，其余调用方等待同一个结果；
+    跨 worker 通过 Redis 锁互斥，没拿到锁的一方轮询缓存直到对方写入。
+    """
+    LOCK_PREFIX = "lock:"
+    POLL_INTERVAL = 0.2
+
+    _inflight: Dict[str, asyncio.Task] = {}
+    _refreshing: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    async def do(
+            cls,
+            key: str,
+            loader: Callable[[], Awaitable[Any]],
+            recheck: Optional[Callable[[], Awaitable[Any]]] = None,
+            lock_ttl: int = 30,
+            wait_timeout: float = 30
+    ) -> Any:
+        """
+        :param key: Coalescing key, usually the cache key being filled
+        :param loader: Fetches from upstream and writes the cache, returns the result
+        :param recheck: Reads the cache, returns None on miss
+        :param lock_ttl: Redis lock expiry (seconds), should cover one loader call
+        :param wait_timeout: Max seconds to wait for another worker before loading anyway
+        """
+        task = cls._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(cls._run(key, loader, recheck, lock_ttl, wait_timeout))
+            cls._inflight[key] = task
+            task.add_done_callback(lambda _: cls._inflight.pop(key, None))
+        # 单个调用方被取消时不影响正在进行的回源
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _run(cls, key, loader, recheck, lock_ttl, wait_timeout) -> Any:
+        lock_name = f"{cls.LOCK_PREFIX}{key}"
+        deadline = time.monotonic() + wait_timeout
+
+        while True:
+            token = await CacheClient.acquire_lock(lock_name, lock_ttl)
+            if token:
+                try:
+                    # 拿锁前别的 worker 可能刚写完
+                    if recheck:
+                        value = await recheck()
+                        if value is not None:
+                            return value
+                    return await loader()
+                finally:
+                    await CacheClient.release_lock(lock_name, token)
+
+            if time.monotonic() >= deadline:
+                logger.warning(f"Single-flight wait timed out for {key}, loading without lock")
+                return await loader()
+
+            await asyncio.sleep(cls.POLL_INTERVAL)
+            if recheck:
+                value = await recheck()
+                if value is not None:
+                    return value
+
+    @classmethod
+    def refresh(cls, key: str, loader: Callable[[], Awaitable[Any]], lock_ttl: int = 30) -> bool:
+        """
+        后台刷新 (stale-while-revalidate)，调用方不等待结果。
+        同 key 已在回源、或其他 worker 持有锁时直接跳过。
+        返回是否启动了新的刷新任务。
+        """
+        if key in cls._inflight or key in cls._refreshing:
+            return False
+        task = asyncio.create_task(cls._refresh(key, loader, lock_ttl))
+        cls._refreshing[key] = task
+        task.add_done_callback(lambda _: cls._refreshing.pop(key, None))
+        return True
+
+    @classmethod
+    async def _refresh(cls, key, loader, lock_ttl) -> Any:
+        lock_name = f"{cls.LOCK_PREFIX}{key}"
+        token = await CacheClient.acquire_lock(lock_name, lock_ttl)
+        if not token:
+            return None
+        try:
+            logger.info(f"Background refresh started for {key}")
+            return await loader()
+        except Exception as e:
+            logger.error(f"Background refresh failed for {key}: {e}")
+            return None
+        finally:
+            await CacheClient.release_lock(lock_name, token)
@@ -0,0 +1,158 @@
+"""
+对比 _process_contributors 旧实现与预编译 role 索引实现。
+
+    python -m benchmarks.bench_contributors
+"""
+import random
+import time
+from typing import Dict, List
+
+from app.api.endpoints.gensokyo import (
+    Contact,
+    ContributorOverride,
+    TeamConfig,
+    _get_avatar_url,
+    _process_contributors,
+)
+
+MEMBER_COUNTS = (10_000, 50_000, 100_000)
+ROLE_POOL = 80
+TEAM_COUNT = 10
+ROUNDS = 3
+
+
+def _legacy_process_contributors(
+        members: List[dict],
+        configs: List[TeamConfig],
+        overrides: Dict[str, ContributorOverride]
+) -> List[dict]:
+    result = []
+    manual_map = {}
+
+    for idx, cfg in enumerate(configs):
+        result.append({
+            "name": cfg.name,
+            "image": cfg.image,
+            "color": cfg.color,
+            "list": []
+        })
+        for uid in cfg.include_user_ids:
+            manual_map[uid] = idx
+
+    for member in members:
+        user = member.get("user", {})
+        user_id = user.get("id")
+        roles = member.get("roles", [])
+
+        target_idx = -1
+
+        if user_id in manual_map:
+            target_idx = manual_map[user_id]
+
+        if target_idx == -1:
+            member_roles_set = set(roles)
+            for idx, cfg in enumerate(configs):
+                cfg_roles_set = set(cfg.role_ids)
+                if not cfg_roles_set.isdisjoint(member_roles_set):
+                    target_idx = idx
+                    break
+
+        if target_idx != -1:
+            base_name = member.get("nick") or user.get("global_name") or user.get("username")
+            base_avatar = _get_avatar_url(user)
+            base_position = result[target_idx]["name"]
+
+            override_data = overrides.get(user_id)
+
+            final_name = override_data.name if (override_data and override_data.name) else base_name
+            final_avatar = override_data.avatar if (override_data and override_data.avatar) else base_avatar
+            final_use_github = override_data.avatarUseGithub if (
+                    override_data and override_data.avatarUseGithub is not None) else False
+            final_position = override_data.position if (override_data and override_data.position) else base_position
+
+            final_contact = {
+                "discord": user.get("username"),
+                "twitter": None, "github": None, "youtube": None, "other": None
+            }
+
+            if override_data and override_data.contact:
+                if override_data.contact.discord: final_contact["discord"] = override_data.contact.discord
+                if override_data.contact.twitter: final_contact["twitter"] = override_data.contact.twitter
+                if override_data.contact.github: final_contact["github"] = override_data.contact.github
+                if override_data.contact.youtube: final_contact["youtube"] = override_data.contact.youtube
+                if override_data.contact.other: final_contact["other"] = override_data.contact.other
+
+            contributor = {
+                "id": user_id,
+                "name": final_name,
+                "avatar": final_avatar,
+                "avatarUseGithub": final_use_github,
+                "position": final_position,
+                "contact": final_contact
+            }
+            result[target_idx]["list"].append(contributor)
+
+    return result
+
+
+def _make_payload(member_count: int, rng: random.Random):
+    role_ids = [str(rng.getrandbits(60)) for _ in range(ROLE_POOL)]
+    members = []
+    for i in range(member_count):
+        user_id = str(100000000000000000 + i)
+        members.append({
+            "user": {
+                "id": user_id,
+                "username": f"user{i}",
+                "global_name": f"User {i}" if i % 3 else None,
+                "avatar": f"a_{i:032x}" if i % 7 == 0 else (f"{i:032x}" if i % 2 else None),
+                "discriminator": "0",
+            },
+            "nick": f"nick{i}" if i % 11 == 0 else None,
+            "roles": rng.sample(role_ids, rng.randint(0, 6)),
+        })
+
+    configs = []
+    for t in range(TEAM_COUNT):
+        configs.append(TeamConfig(
+            name=f"Team {t}",
+            color="#ffffff",
+            role_ids=rng.sample(role_ids, rng.randint(1, 3)),
+            include_user_ids=[members[rng.randrange(member_count)]["user"]["id"] for _ in range(3)],
+        ))
+
+    overrides = {}
+    for member in rng.sample(members, 500):
+        overrides[member["user"]["id"]] = ContributorOverride(
+            name="Override",
+            position="Lead" if rng.random() < 0.5 else None,
+            avatarUseGithub=rng.random() < 0.5,
+            contact=Contact(github="someone", twitter=None),
+        )
+    return members, configs, overrides
+
+
+def _best_of(func, *args) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(10843)
+    print(f"{'members':>10} {'legacy (ms)':>12} {'compiled (ms)':>14} {'speedup':>8}")
+    for count in MEMBER_COUNTS:
+        members, configs, overrides = _make_payload(count, rng)
+        assert _process_contributors(members, configs, overrides) == \
+               _legacy_process_contributors(members, configs, overrides)
+
+        legacy = _best_of(_legacy_process_contributors, members, configs, overrides)
+        compiled = _best_of(_process_contributors, members, configs, overrides)
+        print(f"{count:>10} {legacy * 1000:>12.1f} {compiled * 1000:>14.1f} {legacy / compiled:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
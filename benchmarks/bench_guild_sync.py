@@ -0,0 +1,98 @@
+"""
+多个公会同时全量同步时小公会的完成时间：按整个同步占用并发名额 vs 按页占用 (MemberSync)。
+一个大公会先开始同步，随后几个小公会加入；Discord 请求用固定延迟模拟，
+缓存使用 memory 后端，并发名额均为 1。
+
+    python -m benchmarks.bench_guild_sync
+"""
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+import orjson
+
+from app.core.config import settings
+from app.services.member_sync import PAGE_SIZE, MemberSync
+from app.utils.cache import CacheClient
+from app.utils.discord_client import DiscordClient
+from benchmarks.bench_member_snapshot import _make_raw_members
+
+REQUEST_LATENCY = 0.02
+BIG_GUILD = ("1", 30_000)
+SMALL_GUILDS = (("2", 800), ("3", 300), ("4", 50))
+SMALL_GUILD_DELAY = 0.05  # 大公会开始后多久小公会加入
+
+
+class _Response:
+    status_code = 200
+    text = ""
+
+    def __init__(self, members: List[dict]):
+        self.content = orjson.dumps(members)
+
+
+def _make_guilds() -> Dict[str, List[dict]]:
+    rng = random.Random(10843)
+    guilds = {}
+    for guild_id, count in (BIG_GUILD,) + SMALL_GUILDS:
+        members = _make_raw_members(count, rng)
+        for i, member in enumerate(members):
+            member["user"]["id"] = str(int(guild_id) * 10 ** 8 + i)
+        guilds[guild_id] = members
+    return guilds
+
+
+def _install_fake_discord(guilds: Dict[str, List[dict]]):
+    async def get(path: str, params: dict = None):
+        await asyncio.sleep(REQUEST_LATENCY)
+        members = guilds[path.split("/")[2]]
+        after = int(params["after"])
+        start = next((i for i, member in enumerate(members) if int(member["user"]["id"]) > after), len(members))
+        return _Response(members[start:start + params["limit"]])
+
+    DiscordClient.get = get
+
+
+async def _run_all(whole_sync_slots: bool) -> Dict[str, float]:
+    CacheClient._backend._data.clear()
+    CacheClient._local.clear()
+    # 按页限流时名额为 1；按整个同步限流时由外层信号量控制，分页不再限制
+    MemberSync._slots = asyncio.Semaphore(10 ** 6 if whole_sync_slots else 1)
+    sync_slots = asyncio.Semaphore(1)
+    start = time.perf_counter()
+    finished = {}
+
+    async def sync(guild_id: str):
+        if whole_sync_slots:
+            async with sync_slots:
+                await MemberSync.run(guild_id)
+        else:
+            await MemberSync.run(guild_id)
+        finished[guild_id] = time.perf_counter() - start
+
+    tasks = [asyncio.create_task(sync(BIG_GUILD[0]))]
+    await asyncio.sleep(SMALL_GUILD_DELAY)
+    tasks.extend(asyncio.create_task(sync(guild_id)) for guild_id, _ in SMALL_GUILDS)
+    await asyncio.gather(*tasks)
+    return finished
+
+
+def main():
+    settings.CACHE_BACKEND = "memory"
+    settings.CACHE_FALLBACK_ENABLED = False
+    settings.DISCORD_BOT_TOKEN = "bench"
+    CacheClient.init()
+    _install_fake_discord(_make_guilds())
+
+    pages = -(-BIG_GUILD[1] // PAGE_SIZE)
+    print(f"big guild: {BIG_GUILD[1]} members ({pages} pages), request latency {REQUEST_LATENCY * 1000:.0f} ms\n")
+    print(f"{'guild':>6} {'members':>8} {'whole sync (s)':>15} {'per page (s)':>13}")
+    whole = asyncio.run(_run_all(whole_sync_slots=True))
+    per_page = asyncio.run(_run_all(whole_sync_slots=False))
+    for guild_id, count in (BIG_GUILD,) + SMALL_GUILDS:
+        print(f"{guild_id:>6} {count:>8} {whole[guild_id]:>15.2f} {per_page[guild_id]:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
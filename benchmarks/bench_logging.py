@@ -0,0 +1,102 @@
+"""
+日志对请求延迟的影响：旧的同步 Rich + 文件输出 vs 队列 + 后台线程（可选采样 / JSON）。
+模拟大量并发请求，每个请求像 HttpClient.request 一样打一条 DEBUG 和一条 INFO，
+统计单个请求在事件循环上花在日志上的时间。控制台输出重定向到 /dev/null。
+
+    python -m benchmarks.bench_logging
+"""
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from rich.console import Console
+from rich.logging import RichHandler
+
+from app.core import logger as log_module
+from app.core.config import settings
+
+CONCURRENCY = 200
+REQUESTS_PER_TASK = 25
+URL = "https://discord.com/api/v10/guilds/123456789012345678/members"
+
+SETUPS = (
+    # (名称, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE, LOG_FORMAT, 是否用 %-style)
+    ("sync rich+file, f-string", 0, 0, "text", False),
+    ("queue, %-style", 100_000, 0, "text", True),
+    ("queue + sampling, %-style", 100_000, 20, "text", True),
+    ("queue json + sampling", 100_000, 20, "json", True),
+)
+
+
+def _silence_console(devnull):
+    handlers = list(logging.getLogger().handlers)
+    if log_module._listener is not None:
+        handlers.extend(log_module._listener.handlers)
+    for handler in handlers:
+        if isinstance(handler, RichHandler):
+            handler.console = Console(file=devnull, force_terminal=False)
+        elif type(handler) is logging.StreamHandler:
+            handler.setStream(devnull)
+
+
+async def _request(logger: logging.Logger, lazy: bool, latencies: list):
+    for attempt in range(REQUESTS_PER_TASK):
+        await asyncio.sleep(0)
+        elapsed_ms = 12.345 + attempt
+        start = time.perf_counter()
+        if lazy:
+            logger.debug("Requesting: [%s] %s | Try: %d/%d", "GET", URL, 1, 4)
+            logger.info("Finished: [%s] %s | Status: %d | Time: %.2fms", "GET", URL, 200, elapsed_ms)
+        else:
+            logger.debug(f"Requesting: [GET] {URL} | Try: {1}/{4}")
+            logger.info(f"Finished: [GET] {URL} | Status: {200} | Time: {elapsed_ms:.2f}ms")
+        latencies.append(time.perf_counter() - start)
+
+
+async def _load(logger: logging.Logger, lazy: bool) -> list:
+    latencies = []
+    await asyncio.gather(*(_request(logger, lazy, latencies) for _ in range(CONCURRENCY)))
+    return latencies
+
+
+def main():
+    total = CONCURRENCY * REQUESTS_PER_TASK
+    print(f"{CONCURRENCY} concurrent tasks x {REQUESTS_PER_TASK} requests = {total} requests\n")
+    print(f"{'setup':<28} {'wall s':>8} {'mean us':>9} {'p50 us':>8} {'p99 us':>8} {'drain s':>8}")
+
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        settings.LOG_DIR = log_dir
+        settings.LOG_LEVEL = "INFO"
+        for name, queue_size, sample_rate, log_format, lazy in SETUPS:
+            settings.LOG_QUEUE_SIZE = queue_size
+            settings.LOG_SAMPLE_RATE = sample_rate
+            settings.LOG_FORMAT = log_format
+            logger = log_module.setup_logger()
+            _silence_console(devnull)
+
+            start = time.perf_counter()
+            latencies = asyncio.run(_load(logger, lazy))
+            wall = time.perf_counter() - start
+
+            handlers = list(logging.getLogger().handlers)
+            if log_module._listener is not None:
+                handlers.extend(log_module._listener.handlers)
+            drain_start = time.perf_counter()
+            log_module.stop_logger()
+            drain = time.perf_counter() - drain_start
+
+            latencies.sort()
+            print(
+                f"{name:<28} {wall:>8.3f} {statistics.fmean(latencies) * 1e6:>9.1f} "
+                f"{latencies[len(latencies) // 2] * 1e6:>8.1f} {latencies[int(len(latencies) * 0.99)] * 1e6:>8.1f} "
+                f"{drain:>8.3f}"
+            )
+            for handler in handlers:
+                handler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+对比成员快照格式：原始 JSON 全量 vs 投影后的 msgpack 快照（不同压缩方式）。
+
+    python -m benchmarks.bench_member_snapshot
+"""
+import json
+import random
+import time
+
+from app.services.member_snapshot import (
+    CODEC_NONE,
+    CODEC_ZLIB,
+    CODEC_ZSTD,
+    decode_snapshot,
+    encode_snapshot,
+    project_member,
+    zstandard,
+)
+
+MEMBER_COUNTS = (10_000, 50_000)
+ROLE_POOL = 80
+ROUNDS = 3
+
+
+def _make_raw_members(member_count: int, rng: random.Random):
+    role_ids = [str(rng.getrandbits(60)) for _ in range(ROLE_POOL)]
+    members = []
+    for i in range(member_count):
+        members.append({
+            "avatar": None,
+            "banner": None,
+            "communication_disabled_until": None,
+            "flags": 0,
+            "joined_at": "2023-05-01T12:34:56.789000+00:00",
+            "nick": f"nick{i}" if i % 11 == 0 else None,
+            "pending": False,
+            "premium_since": None,
+            "roles": rng.sample(role_ids, rng.randint(0, 6)),
+            "unusual_dm_activity_until": None,
+            "user": {
+                "id": str(100000000000000000 + i),
+                "username": f"user{i}",
+                "avatar": f"{i:032x}" if i % 2 else None,
+                "discriminator": "0",
+                "public_flags": 0,
+                "flags": 0,
+                "banner": None,
+                "accent_color": None,
+                "global_name": f"User {i}" if i % 3 else None,
+                "avatar_decoration_data": None,
+                "banner_color": None,
+                "clan": None,
+                "primary_guild": None,
+            },
+            "mute": False,
+            "deaf": False,
+        })
+    return members
+
+
+def _best_of(func, *args) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(10843)
+    codecs = [("none", CODEC_NONE), ("zlib", CODEC_ZLIB)]
+    if zstandard is not None:
+        codecs.append(("zstd", CODEC_ZSTD))
+
+    print(f"{'members':>8} {'format':<16} {'size (KiB)':>11} {'load (ms)':>10}")
+    for count in MEMBER_COUNTS:
+        raw = _make_raw_members(count, rng)
+
+        blob = json.dumps(raw)
+        size = len(blob.encode("utf-8"))
+        print(f"{count:>8} {'raw json':<16} {size / 1024:>11.1f} {_best_of(json.loads, blob) * 1000:>10.1f}")
+
+        projected = [project_member(member) for member in raw]
+        for name, codec in codecs:
+            data = encode_snapshot(projected, codec)
+            assert decode_snapshot(data) == projected
+            load = _best_of(decode_snapshot, data)
+            print(f"{count:>8} {'snapshot ' + name:<16} {len(data) / 1024:>11.1f} {load * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+全量成员同步的内存峰值：整表收集后一次写入 vs 按页流式写入 (MemberIngest)。
+Discord 分页用生成器模拟，每页是新解析出的 1000 个原始成员对象；
+缓存后端替换为丢弃写入的空实现，只统计进程自身的分配 (tracemalloc)。
+流式写入的峰值不是一页：还包括整个公会的紧凑快照行和压缩结果，分别列出。
+
+    python -m benchmarks.bench_member_sync
+"""
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Tuple
+
+from app.core.config import settings
+from app.services.member_snapshot import encode_snapshot, project_member
+from app.services.member_store import MemberStore
+from app.utils.cache import CacheClient
+from app.utils.cache_backends import CacheBackend
+from benchmarks.bench_member_snapshot import _make_raw_members
+
+MEMBER_COUNTS = (10_000, 50_000)
+PAGE_SIZE = 1000
+GUILD_ID = "1"
+
+
+class _NullBackend(CacheBackend):
+    name = "null"
+
+    async def execute(self, ops: List[tuple], transaction: bool = False) -> list:
+        return [1] * len(ops)
+
+    async def hset_many(self, key: str, mapping: Dict[str, str], ttl=None):
+        pass
+
+    async def replace_hash(self, key: str, mapping: Dict[str, str], ttl: int):
+        pass
+
+    async def rename_hash(self, src: str, dst: str, ttl: int):
+        pass
+
+
+def _pages(member_count: int) -> Iterator[List[dict]]:
+    rng = random.Random(10843)
+    for offset in range(0, member_count, PAGE_SIZE):
+        page = _make_raw_members(min(PAGE_SIZE, member_count - offset), rng)
+        for i, member in enumerate(page):
+            member["user"]["id"] = str(100000000000000000 + offset + i)
+        yield page
+
+
+async def _legacy_json(member_count: int):
+    # 最初的实现：整表 extend 到一个列表，再一次 json.dumps
+    members = []
+    for page in _pages(member_count):
+        members.extend(page)
+    await CacheClient.set("members", json.dumps(members), ttl=60)
+
+
+async def _legacy_replace_all(member_count: int):
+    # 流式写入之前：整表收集，再投影、生成 hash 映射和快照
+    members = []
+    for page in _pages(member_count):
+        members.extend(page)
+    projected = [project_member(member) for member in members]
+    mapping = {member["user"]["id"]: json.dumps(member) for member in projected}
+    await CacheClient.replace_hash("hash", mapping, ttl=60)
+    await CacheClient.set("snapshot", encode_snapshot(projected), ttl=60)
+
+
+async def _one_page(member_count: int):
+    next(_pages(member_count))
+
+
+async def _streaming(member_count: int) -> Tuple[int, int]:
+    ingest = MemberStore.begin_ingest(GUILD_ID)
+    for page in _pages(member_count):
+        await ingest.add_page(page)
+    await ingest.commit()
+    return ingest._writer.buffered_bytes, len(ingest._writer.build())
+
+
+def _measure(func, member_count: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = asyncio.run(func(member_count))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, result
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f}"
+
+
+def main():
+    settings.CACHE_L1_ENABLED = False
+    CacheClient._backend = _NullBackend()
+
+    page_peak, _, _ = _measure(_one_page, PAGE_SIZE)
+    print(f"one raw page of {PAGE_SIZE} members: {_mib(page_peak)} MiB\n")
+
+    print(f"{'members':>8} {'approach':<24} {'peak (MiB)':>11} {'time (s)':>9}")
+    breakdown = []
+    for count in MEMBER_COUNTS:
+        for name, func in (
+                ("extend + json.dumps", _legacy_json),
+                ("extend + replace_all", _legacy_replace_all),
+                ("streaming ingest", _streaming),
+        ):
+            peak, elapsed, result = _measure(func, count)
+            print(f"{count:>8} {name:<24} {_mib(peak):>11} {elapsed:>9.2f}")
+            if result:
+                breakdown.append((count, peak, *result))
+
+    print(f"\nstreaming ingest peak vs. totals (MiB)")
+    print(f"{'members':>8} {'peak':>6} {'all raw pages':>14} {'compact rows':>13} {'snapshot':>9}")
+    for count, peak, rows, snapshot in breakdown:
+        raw_total = page_peak * -(-count // PAGE_SIZE)
+        print(f"{count:>8} {_mib(peak):>6} {_mib(raw_total):>14} {_mib(rows):>13} {_mib(snapshot):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+JSON 序列化：标准库 json vs orjson (app.utils.serialization)。
+1. 贡献者结果编码为响应体 / 写入缓存
+2. /roles 缓存命中：旧实现取出字符串后 json.loads、经 response_model 校验再编码，
+   新实现直接返回缓存中的字节；通过 ASGI 调用测量整个请求
+
+    python -m benchmarks.bench_serialization
+"""
+import asyncio
+import json
+import random
+import time
+from typing import List, Tuple
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.api.endpoints.gensokyo import DiscordRole, _int_to_hex_color
+from app.utils.serialization import ORJSONResponse, dumps, loads
+
+CONTRIBUTOR_COUNTS = (1_000, 10_000)
+ROLE_COUNT = 250
+ROUNDS = 20
+REQUESTS = 2000
+
+
+def _make_contributors(count: int, rng: random.Random) -> List[dict]:
+    teams = [{"name": f"Team {i}", "image": None, "color": "#66ccff", "list": []} for i in range(10)]
+    for i in range(count):
+        teams[rng.randrange(len(teams))]["list"].append({
+            "id": str(100000000000000000 + i),
+            "name": f"贡献者 {i}" if i % 3 == 0 else f"user{i}",
+            "avatar": f"https://cdn.discordapp.com/avatars/{i}/{rng.getrandbits(64):x}.png",
+            "avatarUseGithub": False,
+            "position": "Team",
+            "contact": {"discord": f"user{i}", "twitter": None, "github": None, "youtube": None, "other": None},
+        })
+    return teams
+
+
+def _make_roles(rng: random.Random) -> List[dict]:
+    roles = []
+    for i in range(ROLE_COUNT):
+        color = rng.getrandbits(24)
+        roles.append({
+            "id": str(100000000000000000 + i), "name": f"role {i}", "color": color,
+            "color_hex": _int_to_hex_color(color), "position": i,
+            "hoist": False, "managed": False, "mentionable": bool(i % 2),
+        })
+    return roles
+
+
+def _timeit(func) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def _roles_app(roles: List[dict]) -> Tuple[FastAPI, FastAPI]:
+    cached_str = json.dumps(roles)
+    cached_bytes = dumps(roles)
+
+    legacy = FastAPI()
+
+    @legacy.get("/roles", response_model=List[DiscordRole])
+    async def legacy_roles():
+        return json.loads(cached_str)
+
+    current = FastAPI(default_response_class=ORJSONResponse)
+
+    @current.get("/roles", response_model=List[DiscordRole])
+    async def current_roles():
+        return Response(content=cached_bytes, media_type="application/json")
+
+    return legacy, current
+
+
+async def _request_time(app: FastAPI) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/roles")
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.get("/roles")
+        return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main():
+    rng = random.Random(10843)
+
+    print(f"{'contributors':>12} {'approach':<28} {'time (ms)':>10} {'bytes':>10}")
+    for count in CONTRIBUTOR_COUNTS:
+        payload = _make_contributors(count, rng)
+        legacy_body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        assert loads(legacy_body) == loads(dumps(payload))
+        for name, func, size in (
+                ("json.dumps + encode", lambda: json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), len(legacy_body)),
+                ("orjson dumps", lambda: dumps(payload), len(dumps(payload))),
+                ("json.loads", lambda: json.loads(legacy_body), len(legacy_body)),
+                ("orjson loads", lambda: loads(legacy_body), len(legacy_body)),
+        ):
+            print(f"{count:>12} {name:<28} {_timeit(func):>10.2f} {size:>10}")
+
+    legacy, current = _roles_app(_make_roles(rng))
+    print(f"\n/roles cache hit, {ROLE_COUNT} roles, {REQUESTS} requests")
+    print(f"  json.loads + response_model : {asyncio.run(_request_time(legacy)):.0f} us/request")
+    print(f"  cached bytes as Response    : {asyncio.run(_request_time(current)):.0f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+extract_game_version 正确性语料 + 吞吐量对比（旧的多次 re.search/re.findall 实现 vs 预编译单次扫描 + LRU）。
+
+    python -m benchmarks.bench_version_parser
+"""
+import re
+import time
+
+from app.api.endpoints.minecraft import _parse_game_version, extract_game_version
+
+CORPUS = [
+    ("1.20.4", "1.20.4"),
+    ("1.8.9", "1.8.9"),
+    ("1.21", "1.21"),
+    ("git-Paper-378 (MC: 1.16.5)", "1.16.5"),
+    ("Paper 1.20.4", "1.20.4"),
+    ("git-Purpur-2062 (MC: 1.20.4)", "1.20.4"),
+    ("Purpur 1.21.1", "1.21.1"),
+    ("git-Folia-17 (MC: 1.20.2)", "1.20.2"),
+    ("Folia 1.20.1", "1.20.1"),
+    ("git-Spigot-79a30d7-f4830a1 (MC: 1.12.2)", "1.12.2"),
+    ("Spigot 1.8.8", "1.8.8"),
+    ("CraftBukkit 1.7.10", "1.7.10"),
+    ("Velocity 1.7.2-1.21.11", "1.21.11"),
+    ("Velocity 3.3.0-SNAPSHOT (git-d7cd5b4e-b438)", "(git-d7cd5b4e-b438)"),
+    ("BungeeCord 1.8.x-1.19.x", "1.19.x"),
+    ("BungeeCord 1.8.x-1.21.x", "1.21.x"),
+    ("Waterfall 1.8.x-1.20.x", "1.20.x"),
+    ("Waterfall 1.8.x, 1.9.x, 1.10.x, 1.11.x, 1.12.x, 1.13.x, 1.14.x, 1.15.x, 1.16.x", "1.16.x"),
+    ("Geyser 2.2.0-SNAPSHOT (git-master-52f0a6c) (Java: 1.20.4, Bedrock: 1.20.40 - 1.20.51)", "1.20.4"),
+    ("1.20.40 - 1.20.51", "1.20.51"),
+    ("Requires MC 1.8 / 1.21.4", "1.21.4"),
+    ("1.21.4-pre1", "1.21.4"),
+    ("Fabric 1.20.1", "1.20.1"),
+    ("Forge 1.12.2-14.23.5.2860", "1.12.2"),
+    ("TCPShield.com", "TCPShield.com"),
+    ("24w14a", "24w14a"),
+    ("§4Maintenance", "§4Maintenance"),
+    ("", "Unknown"),
+    (None, "Unknown"),
+]
+ROUNDS = 5
+CALLS = 200_000
+
+
+def _legacy_extract_game_version(raw_version: str) -> str:
+    if not raw_version:
+        return "Unknown"
+    mc_match = re.search(r"\(MC:\s*([\d\.]+)\)", raw_version)
+    if mc_match:
+        return mc_match.group(1)
+    versions = re.findall(r"\b1\.\d+(?:\.\d+|.x)?\b", raw_version)
+
+    if versions:
+        if len(versions) > 1:
+            if "-" in raw_version and len(versions) >= 2:
+                return versions[-1]
+            return versions[-1]
+        return versions[0]
+
+    return raw_version.split(" ")[-1]
+
+
+def _throughput(func, inputs) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for raw in inputs:
+            func(raw)
+        best = min(best, time.perf_counter() - start)
+    return len(inputs) / best
+
+
+def main():
+    failures = [(raw, expected, extract_game_version(raw))
+                for raw, expected in CORPUS if extract_game_version(raw) != expected]
+    for raw, expected, actual in failures:
+        print(f"FAIL {raw!r}: expected {expected!r}, got {actual!r}")
+    assert not failures, f"{len(failures)} corpus entries failed"
+    print(f"corpus: {len(CORPUS)} entries ok")
+
+    raws = [raw for raw, _ in CORPUS if raw]
+    inputs = (raws * (CALLS // len(raws) + 1))[:CALLS]
+
+    legacy = _throughput(_legacy_extract_game_version, inputs)
+    _parse_game_version.cache_clear()
+    memo = _throughput(extract_game_version, inputs)
+    uncached = _throughput(_parse_game_version.__wrapped__, inputs)
+
+    print(f"{'implementation':<26} {'calls/s':>12}")
+    print(f"{'legacy':<26} {legacy:>12,.0f}")
+    print(f"{'single-pass (no memo)':<26} {uncached:>12,.0f}")
+    print(f"{'single-pass + LRU':<26} {memo:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,27 @@
 import os
 from contextlib import asynccontextmanager
+from functools import partial
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
+from tortoise import Tortoise
 
+from app.api.endpoints import discord, gensokyo, metrics, minecraft
 from app.api.router import api_router
 from app.core.config import settings
 from app.core.logger import logger
+from app.db.conf import TORTOISE_ORM
+from app.db.migrate import upgrade_db
+from app.services.contributor_views import ContributorViews
+from app.services.discord_gateway import DiscordGateway
+from app.services.guilds import configured_guilds
+from app.services.mc_poller import MCPoller
+from app.services.member_store import MemberStore
 from app.utils.cache import CacheClient
 from app.utils.http_client import HttpClient
+from app.utils.serialization import ORJSONResponse
+from app.utils.scheduler import Scheduler
 
 
 @asynccontextmanager
@@ -19,21 +31,64 @@ async def lifespan(app: FastAPI):
     HttpClient.get_client()
     CacheClient.init()
 
+    # lifespan 与请求不在同一个任务中，需要全局 fallback 才能在请求里访问连接
+    await Tortoise.init(config=TORTOISE_ORM, _enable_global_fallback=True)
+    # 表结构由 migrations/ 中的 aerich 迁移维护，不用 generate_schemas
+    await upgrade_db()
+    logger.info("Tortoise-ORM initialized")
+
+    ContributorViews.set_renderer(gensokyo.render_contributor_view)
+    MemberStore.on_snapshot_written(ContributorViews.schedule_rebuild)
+
+    if settings.SCHEDULER_ENABLED:
+        # 每个公会单独的任务和 leader 锁，一个公会失败或耗时长不影响其他公会的刷新
+        for guild_id in configured_guilds():
+            if not settings.DISCORD_GATEWAY_ENABLED:
+                Scheduler.add_job(
+                    f"refresh_members:{guild_id}",
+                    partial(gensokyo.refresh_members_job, guild_id),
+                    settings.REFRESH_MEMBERS_INTERVAL
+                )
+            Scheduler.add_job(
+                f"refresh_roles:{guild_id}",
+                partial(gensokyo.refresh_roles_job, guild_id),
+                settings.REFRESH_ROLES_INTERVAL
+            )
+        # 热门头像按 worker 统计，各自刷新，单个头像的回源由锁去重
+        Scheduler.add_job(
+            "refresh_hot_avatars",
+            discord.refresh_hot_avatars_job,
+            settings.REFRESH_AVATARS_INTERVAL,
+            leader_only=False
+        )
+        if settings.MC_POLL_ENABLED:
+            # 结果和采样写入缓存，每轮只由一个 worker 探测
+            MCPoller.set_probe(minecraft.poll_server)
+            Scheduler.add_job("mc_poll", MCPoller.poll_once, settings.MC_POLL_INTERVAL)
+        Scheduler.start()
+
+    if settings.DISCORD_GATEWAY_ENABLED:
+        DiscordGateway.start(resync=gensokyo.resync_all_members)
+
     yield
 
     logger.info("Application shutdown...")
 
+    await DiscordGateway.stop()
+    await Scheduler.stop()
     await HttpClient.close()
     await CacheClient.close()
 
-    # await Tortoise.close_connections()
-    # logger.info("Tortoise-ORM connections closed")
+    await Tortoise.close_connections()
+    logger.info("Tortoise-ORM connections closed")
 
 
 def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.PROJECT_NAME,
         lifespan=lifespan,
+        # 各 router 上的路由默认响应类是占位值，这里必须传类本身才会生效
+        default_response_class=ORJSONResponse,
     )
 
     app.add_middleware(
@@ -44,6 +99,8 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     app.include_router(api_router, prefix=settings.API_PREFIX)
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics.router)
     if os.path.exists("spa_dist"):
         app.mount("/", StaticFiles(directory="spa_dist", html=True), name="static")
     return app
@@ -0,0 +1,44 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "contributor_config" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(64) NOT NULL UNIQUE,
+    "config" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL,
+    "updated_at" TIMESTAMP NOT NULL
+) /* 命名的贡献者配置，config 为 ContributorRequest 的 JSON。 */;
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSON NOT NULL
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        """
+
+
+MODELS_STATE = (
+    "eJztlltvmzAUx78K4qmTtooQctne0jRTO63JlKJt6jJZDjbEKhgKZm3U9bvPx0C4JVk7TW"
+    "039YWYc7EPv39sn1s9CAn1k8NxyEXMlqkIYzl0mae/0251jgMqB7uDXms6jqIyBAwCL32V"
+    "5ZThyCnjl4mIsSNkhIv9hEoToYkTs0iwkEPeIu1ZAwJPQz4H/aG1SIfE7Mhx16RybBi9Rf"
+    "q2Y4HX7UuL6xpOtoK2SC3axVql1Dm9SmkitGwq7cP5bLpIu4ZhQjUkdGQ5jHuPvXDKmfQi"
+    "EXpUrGgsl//2XZoZJ/SGJsVrdIlcRn1SU4MRmEDZkVhHynbKxXsVCN+0lLj9NOBlcLQWq5"
+    "BvohkXYPUopzEWFKYXcQpS8NT3c/0KdbJKy5CsxEoOoS5OfRAUsrMCSpuO0HRmo/OJjZDe"
+    "ErvIqMiQmyRW+KPIUhP19R6U8MbsWANr2O1bQxmiytxYBnfZ0iWYLFHhmdr6nfJjgbMIxb"
+    "iEqn5bWMcrHG/nWsQ3yMqSm2QLjs8XbYBvkE+5J1bytW/t4fh5NB+fjOYHfesVLBjKjZzt"
+    "9WnuMZULUJdoy71fhwsbYjvcMqOBlzBHaD81nyWtP/B9MBeGknN5BD0C6D1ggQXMHCTJlV"
+    "8FenA2+tpkPf44O1JwwkR4sZpFTXDUBB9TgIOwaMM/lh7BArpDgFpmU4Q89bAY/INS6PID"
+    "yYz763yv7ZHGPj2bnNujs081fY5H9gQ86jAP1g3rQb+h2WYS7cupfaLBq3Yxm06aMm7i7A"
+    "sdasLyIkE8vEaYVI6FwlpQq6meRuQPVa9nvqj+XFQvGFVkV9VDh+BeVq4zMCyxc3mNY4Ja"
+    "ntAMd8W2XYEZNC2YY09pBnChzLwtHNGYOattDWPu2dsl4jLmd53hbp1fuqnn1U39oHECJT"
+    "2goaqk/J2e6qnPmlpXZfZ692irZNTOvkr56vc7bKoHEM7D/0O6HcO4B10ZtZOu8rXaVkH5"
+    "lkt0b99apLw0rg9sXJ/0Mrv7BcNsbKk="
+)
@@ -0,0 +1,63 @@
+from tortoise import BaseDBAsyncClient
+
+from app.core.config import settings
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # SQLite 不能删除建表时声明的 UNIQUE 约束，按新结构重建表后拷回数据。
+    # 在此之前只服务一个公会，已有的配置都属于默认公会
+    guild_id = settings.DISCORD_GUILD_ID.replace("'", "''")
+    return f"""
+        CREATE TABLE "_contributor_config_new" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "guild_id" VARCHAR(32) NOT NULL,
+    "name" VARCHAR(64) NOT NULL,
+    "config" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL,
+    "updated_at" TIMESTAMP NOT NULL,
+    CONSTRAINT "uid_contributor_guild_i_bd63c1" UNIQUE ("guild_id", "name")
+);
+        INSERT INTO "_contributor_config_new" ("id", "guild_id", "name", "config", "created_at", "updated_at")
+            SELECT "id", '{guild_id}', "name", "config", "created_at", "updated_at" FROM "contributor_config";
+        DROP TABLE "contributor_config";
+        ALTER TABLE "_contributor_config_new" RENAME TO "contributor_config";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    # 各公会的同名配置只保留 id 最小的一条
+    return """
+        CREATE TABLE "_contributor_config_old" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(64) NOT NULL UNIQUE,
+    "config" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL,
+    "updated_at" TIMESTAMP NOT NULL
+);
+        INSERT INTO "_contributor_config_old" ("id", "name", "config", "created_at", "updated_at")
+            SELECT "id", "name", "config", "created_at", "updated_at" FROM "contributor_config"
+            WHERE "id" IN (SELECT MIN("id") FROM "contributor_config" GROUP BY "name");
+        DROP TABLE "contributor_config";
+        ALTER TABLE "_contributor_config_old" RENAME TO "contributor_config";"""
+
+
+MODELS_STATE = (
+    "eJztl21vmzAQx78K4lUnbRUQIOnepWmmdlqTqUXb1KZCDjbEKpgUTNuo63efz0B4yMOavW"
+    "jXqm+IufufffmdwceDGsWYhOn+IGY8odOMx4kY+jRQPysPKkMREYPNoo+KiubzSgIGjqah"
+    "jPIquetV+mnKE+RxofBRmBJhwiT1EjrnNGYQN8kss4vhqolr1+6Zk6yHDV2MOwYRY02zJt"
+    "mBboLXt4XF9zUvX0GZZCbpIKWW6hm5yUjKlXwq5ev5eDTJOppmQDY49kQ6lAXPufCEJXFI"
+    "FIqFy+oQJK5dozfJbMPUxNizxMyWbntiSl8Hr94T69pd7UBcdc2HpcyDfPUyW2tqdZfzTD"
+    "2pMdC6eSzLkF5NqzBkjIpcXR4HhM9IImBcXqpBRkPsUgwCuROursSIMkzuSQoSuJ1fuz4l"
+    "IW7slzxG2l2+mEvbCeNfpBCoT8WGCLOIVeL5gs9itlRTxsEaEEYSxAlMz5MMNgvLwrDYYe"
+    "X+ybOvJHmKtRhMfJSFsOUgOk+gsqmuOxo77vnQcV11ZTuWEbWNUphE4WEri1RT+e8DSOGT"
+    "oZtds9exzZ6QyDSXlu5jvnQFJg+UeEaO+ij9iKNcIRlXUOvlaKIdzFCynm09pkVYpN4mXP"
+    "Lchrg0VIyrp/g5IEfo3g0JC/hM3HaMLUR/9M8Gx/2zvY7xARaMxUsnfy+NCo8hXQC9gix/"
+    "dwBc6t8gXNt8Alzb3AgXXE241SHQxAtvxvV4q4gWYEw9rvxWQpquvCdeAegtYIEFzByl6U"
+    "1YB7p32v/VZj34Nj6UcOKUB4mcRU5w2AafEIDjIr4K/0h4OI3IhgI0IttFKEL3y8ErLIUq"
+    "/iAes3BRnBZbSuOcnA7Pnf7p90Z9jvrOEDzyHI0WLeue3arZchLl54lzrMCtcjEeDdtlXO"
+    "qcCxVyQqKjcFl85yJcO9hKa0mtUfVsjv+x6s3I96r/L1UvGdXKLrOHRsy/rnUNYJgi7/oO"
+    "Jdhd8cRGvEm76oqMqG1BDAWyZgAX0iy+D/okod5MXfPlUHi2fi6gSvO3T4TNdV7TyL43rS"
+    "/YtN6SJIWUdmipaiFvsKsyLOsJbZVQbeyrpK95vsNDtQPhQv4G6eqa9gS6QrWRrvSttK2c"
+    "sDWH6Na+tQx5b1x3bFxf9DB7/ANsbxEf"
+)
@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+# 必须在导入 app 之前设置：日志同步输出到临时目录
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="gensokyo-test-logs-"))
+os.environ.setdefault("LOG_QUEUE_SIZE", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+
+from app.core.config import settings
+from app.utils.cache import CacheClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def cache(monkeypatch):
+    """
+    每个测试一份空的 memory 后端，L1 也清空。
+    """
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(settings, "CACHE_FALLBACK_ENABLED", False)
+    await CacheClient.close()
+    CacheClient._local.clear()
+    CacheClient.init()
+    yield CacheClient
+    await CacheClient.close()
+    CacheClient._local.clear()
+
@@ -0,0 +1,22 @@
+"""
+测试共用的小工具。
+"""
+import asyncio
+import time
+
+
+async def eventually(predicate, timeout: float = 5.0, interval: float = 0.01):
+    """
+    轮询直到 predicate()（可以是协程函数）返回真值，超时则断言失败。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if asyncio.iscoroutine(result):
+            result = await result
+        if result:
+            return result
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met before timeout")
+        await asyncio.sleep(interval)
+
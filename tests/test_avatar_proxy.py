@@ -0,0 +1,83 @@
+"""
+头像代理：If-None-Match 按实体标签列表匹配，下载边收边写临时文件，超过大小上限时中止且不留下文件。
+CDN 由挂在 discord_cdn 客户端上的 ASGI 应用模拟。
+"""
+import os
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import avatar_proxy
+from app.services.avatar_proxy import AvatarDiskCache, avatar_variant
+from app.utils.etag import matched_etag
+from app.utils.http_client import HttpClient
+
+AVATAR_URL = "https://cdn.discordapp.com/avatars/10/abcdef.png"
+
+pytestmark = pytest.mark.anyio
+
+
+class MockCDN:
+    def __init__(self, size: int):
+        self.size = size
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"image/png")]})
+        chunk = b"x" * 16 * 1024
+        for start in range(0, self.size, len(chunk)):
+            await send({"type": "http.response.body", "body": chunk[:self.size - start], "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+async def cdn(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AVATAR_PROXY_DIR", str(tmp_path))
+    monkeypatch.setattr(avatar_proxy, "MAX_IMAGE_BYTES", 100 * 1024)
+    for name, value in (("_entries", type(AvatarDiskCache._entries)()), ("_total_bytes", 0), ("_loaded", False)):
+        monkeypatch.setattr(AvatarDiskCache, name, value)
+    mock = MockCDN(0)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=mock))
+    monkeypatch.setitem(HttpClient._clients, "discord_cdn", client)
+    monkeypatch.setitem(HttpClient._stats, "discord_cdn", {"requests": 0, "in_flight": 0, "peak_in_flight": 0})
+    yield mock
+    await client.aclose()
+
+
+def _files(root) -> list:
+    return sorted(name for _, _, names in os.walk(root) for name in names)
+
+
+def test_if_none_match_compares_entity_tags():
+    etag = avatar_variant(AVATAR_URL, 128).etag
+    assert etag == '"abcdef_128.png"'
+
+    assert matched_etag(etag, etag) == etag
+    assert matched_etag('"other", W/"abcdef_128.png"', etag) == 'W/"abcdef_128.png"'
+    assert matched_etag("*", etag) == etag
+    # 只是包含 ETag 的子串不算匹配
+    assert matched_etag('"xabcdef_128.png"', etag) is None
+    assert matched_etag('"abcdef_128"', etag) is None
+    assert matched_etag(None, etag) is None
+
+
+async def test_download_writes_the_file(cdn, tmp_path):
+    cdn.size = 70 * 1024
+    variant = avatar_variant(AVATAR_URL, 128)
+
+    path, stat = await AvatarDiskCache.get(variant)
+
+    assert stat.st_size == 70 * 1024
+    assert HttpClient.stats()["discord_cdn"]["requests"] == 1
+    assert HttpClient.stats()["discord_cdn"]["in_flight"] == 0
+    assert os.path.getsize(path) == 70 * 1024
+    assert _files(tmp_path) == ["abcdef_128.png"]
+
+
+async def test_oversized_download_is_aborted_without_leftovers(cdn, tmp_path):
+    cdn.size = 10 * 1024 * 1024
+
+    assert await AvatarDiskCache.get(avatar_variant(AVATAR_URL, 256)) is None
+
+    assert _files(tmp_path) == []
+    assert HttpClient.stats()["discord_cdn"]["in_flight"] == 0
@@ -0,0 +1,99 @@
+"""
+ContributorViews 的写入与配置修改交错：重建过程中配置被 PUT 覆盖或被删除时，
+旧配置算出的结果不能覆盖缓存。
+"""
+import asyncio
+from typing import Dict
+
+import orjson
+import pytest
+from tortoise import Tortoise
+
+from app.models import ContributorConfig
+from app.services.contributor_views import ContributorViews
+from app.utils.cache import CacheClient
+
+GUILD_ID = "1"
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowRenderer:
+    """
+    渲染结果就是配置本身；配置 label 在 blocked 中时等到对应的事件被设置。
+    """
+
+    def __init__(self):
+        self.blocked: Dict[str, asyncio.Event] = {}
+        self.rendering: Dict[str, asyncio.Event] = {}
+
+    def block(self, label: str) -> asyncio.Event:
+        self.rendering[label] = asyncio.Event()
+        self.blocked[label] = asyncio.Event()
+        return self.blocked[label]
+
+    async def __call__(self, guild_id: str, config: dict) -> bytes:
+        label = config["label"]
+        if label in self.blocked:
+            self.rendering[label].set()
+            await self.blocked[label].wait()
+        return orjson.dumps(config)
+
+
+@pytest.fixture
+async def views(cache, monkeypatch):
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas()
+    renderer = SlowRenderer()
+    monkeypatch.setattr(ContributorViews, "_render", renderer)
+    yield renderer
+    await Tortoise.close_connections()
+
+
+async def _put(name: str, label: str) -> ContributorConfig:
+    # 与 PUT /contributors/configs/{name} 相同：先写库再物化
+    record, _ = await ContributorConfig.update_or_create(guild_id=GUILD_ID, name=name, defaults={"config": {"label": label}})
+    await ContributorViews.build(record)
+    return record
+
+
+async def _cached_label(name: str):
+    view = await ContributorViews.get(GUILD_ID, name)
+    return orjson.loads(view[1])["label"] if view else None
+
+
+async def test_put_during_rebuild_is_not_overwritten_by_stale_render(views):
+    await _put("main", "old")
+    release = views.block("old")
+    rebuild = asyncio.create_task(ContributorViews.rebuild_all(GUILD_ID))
+    await views.rendering["old"].wait()
+
+    await _put("main", "new")
+    release.set()
+    await rebuild
+
+    assert await _cached_label("main") == "new"
+
+
+async def test_delete_during_rebuild_does_not_bring_the_view_back(views):
+    await _put("main", "old")
+    release = views.block("old")
+    rebuild = asyncio.create_task(ContributorViews.rebuild_all(GUILD_ID))
+    await views.rendering["old"].wait()
+
+    await ContributorConfig.filter(guild_id=GUILD_ID, name="main").delete()
+    await ContributorViews.drop(GUILD_ID, "main")
+    release.set()
+    await rebuild
+
+    assert await _cached_label("main") is None
+
+
+async def test_rebuild_stores_views_of_unchanged_configs(views):
+    await _put("main", "one")
+    # 成员快照变化后重建；配置没有变化，结果照常写入
+    await ContributorViews.drop(GUILD_ID, "main")
+
+    await ContributorViews.rebuild_all(GUILD_ID)
+
+    assert await CacheClient.get(ContributorViews._key(GUILD_ID, "main"), binary=True)
@@ -0,0 +1,98 @@
+"""
+启动时的 aerich 迁移：全新数据库、只有 name 唯一的旧表（补上默认公会的 guild_id），
+以及 generate_schemas 已经建好最新表结构的数据库（只记录迁移）。
+"""
+import sqlite3
+
+import pytest
+from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError
+
+from app.core.config import settings
+from app.db.conf import TORTOISE_ORM
+from app.db.migrate import upgrade_db
+from app.models import ContributorConfig
+
+INIT = "0_20261018162915_init.py"
+GUILD = "1_20261018162916_contributor_guild.py"
+
+AERICH_TABLE = """
+CREATE TABLE "aerich" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSON NOT NULL
+);
+"""
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def db_path(cache, tmp_path, monkeypatch):
+    path = tmp_path / "db.sqlite3"
+    monkeypatch.setitem(TORTOISE_ORM["connections"], "default", f"sqlite://{path}")
+    monkeypatch.setattr(settings, "DISCORD_GUILD_ID", "100")
+    yield path
+    await Tortoise.close_connections()
+
+
+def _execute(path, script: str):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(script)
+
+
+async def _applied() -> list:
+    conn = Tortoise.get_connection("default")
+    return [row["version"] for row in await conn.execute_query_dict('SELECT "version" FROM "aerich" ORDER BY "id"')]
+
+
+async def test_fresh_database_applies_all_migrations(db_path):
+    await Tortoise.init(config=TORTOISE_ORM)
+
+    assert await upgrade_db() == [INIT, GUILD]
+    assert await _applied() == [INIT, GUILD]
+
+    await ContributorConfig.create(guild_id="1", name="main", config={})
+    await ContributorConfig.create(guild_id="2", name="main", config={})
+    with pytest.raises(IntegrityError):
+        await ContributorConfig.create(guild_id="1", name="main", config={})
+    # 再次启动没有要执行的迁移
+    assert await upgrade_db() == []
+
+
+async def test_table_without_guild_id_is_migrated_to_default_guild(db_path):
+    # 加入 guild_id 之前 generate_schemas 建出的表
+    _execute(db_path, AERICH_TABLE + """
+CREATE TABLE "contributor_config" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(64) NOT NULL UNIQUE,
+    "config" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL,
+    "updated_at" TIMESTAMP NOT NULL
+);
+INSERT INTO "contributor_config" ("name", "config", "created_at", "updated_at")
+    VALUES ('main', '{"a": 1}', '2026-01-01 00:00:00', '2026-01-01 00:00:00');
+""")
+    await Tortoise.init(config=TORTOISE_ORM)
+
+    assert await upgrade_db() == [INIT, GUILD]
+
+    record = await ContributorConfig.get(name="main")
+    assert record.guild_id == "100" and record.config == {"a": 1}
+    # 名字只在公会内唯一
+    await ContributorConfig.create(guild_id="200", name="main", config={})
+    with pytest.raises(IntegrityError):
+        await ContributorConfig.create(guild_id="100", name="main", config={})
+
+
+async def test_schema_from_generate_schemas_is_recorded_without_running(db_path):
+    await Tortoise.init(config=TORTOISE_ORM)
+    await Tortoise.generate_schemas()
+    await ContributorConfig.create(guild_id="300", name="main", config={"b": 2})
+
+    assert await upgrade_db() == []
+
+    assert await _applied() == [INIT, GUILD]
+    record = await ContributorConfig.get(name="main")
+    assert record.guild_id == "300" and record.config == {"b": 2}
@@ -0,0 +1,54 @@
+"""
+头像接口的输入校验：批量接口的 id 数量上限和非数字 id，单个头像接口在计入热门统计之前校验 id。
+"""
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import discord
+from app.core.config import settings
+from app.services.avatars import CACHE_KEY_AVATAR
+from app.utils.cache import CacheClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(cache, monkeypatch):
+    monkeypatch.setattr(settings, "DISCORD_BOT_TOKEN", "")
+    monkeypatch.setattr(settings, "DISCORD_GUILD_ID", "")
+    monkeypatch.setattr(settings, "DISCORD_GUILD_IDS", [])
+    monkeypatch.setattr(discord, "_hot_avatars", discord.Counter())
+    app = FastAPI()
+    app.include_router(discord.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_batch_rejects_too_many_ids(client):
+    user_ids = [str(i) for i in range(settings.AVATAR_BATCH_MAX_IDS + 1)]
+
+    response = await client.post("/avatars", json={"user_ids": user_ids})
+
+    assert response.status_code == 422
+
+
+async def test_batch_result_only_contains_valid_ids(client):
+    await CacheClient.set(CACHE_KEY_AVATAR.format(user_id="10"), "https://cdn.discordapp.com/embed/avatars/0.png")
+
+    response = await client.post("/avatars", json={"user_ids": ["10", "11", "10", "abc", "../x"]})
+
+    assert response.status_code == 200
+    assert response.json() == {"10": "https://cdn.discordapp.com/embed/avatars/0.png", "11": None}
+
+
+async def test_invalid_user_id_is_rejected_before_tracking(client):
+    response = await client.get("/avatar/not-a-user", follow_redirects=False)
+
+    assert response.status_code == 400
+    assert not discord._hot_avatars
+
+    await CacheClient.set(CACHE_KEY_AVATAR.format(user_id="10"), "https://cdn.discordapp.com/embed/avatars/0.png")
+    response = await client.get("/avatar/10", follow_redirects=False)
+    assert response.status_code == 302
+    assert discord._hot_avatars == {"10": 1}
@@ -0,0 +1,208 @@
+"""
+DiscordClient 对本地模拟 Discord API 的限速行为：按桶限速、全局令牌桶、429 retry_after（含 global）
+和 5xx 退避。模拟服务端通过 httpx.ASGITransport 挂在 HttpClient 上，记录每个请求到达的时间。
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.utils.discord_client import DiscordClient
+from app.utils.http_client import HttpClient
+
+API_BASE = "http://discord.test/api/v10"
+
+pytestmark = pytest.mark.anyio
+
+Reply = Tuple[int, Dict[str, str], dict]
+
+
+class MockDiscord:
+    """
+    ASGI 应用。每个路径一个处理函数，返回 (状态码, 响应头, JSON)；未注册的路径返回 200。
+    响应前等待 latency 秒，让并发请求的响应交错到达。
+    """
+    latency = 0.02
+
+    def __init__(self):
+        self.routes: Dict[str, Callable[[], Reply]] = {}
+        self.arrivals: List[Tuple[float, str]] = []
+
+    def times(self, path: Optional[str] = None) -> List[float]:
+        return [at for at, p in self.arrivals if path is None or p == path]
+
+    async def __call__(self, scope, receive, send):
+        path = scope["path"][len("/api/v10"):]
+        self.arrivals.append((time.monotonic(), path))
+        status, headers, body = self.routes.get(path, lambda: (200, {}, {}))()
+        await asyncio.sleep(self.latency)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")]
+                       + [(k.lower().encode(), str(v).encode()) for k, v in headers.items()],
+        })
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+class BucketLimiter:
+    """
+    固定窗口的桶：每 window 秒 limit 个请求，超出时回 429 并记为违规。
+    """
+
+    def __init__(self, bucket: str, limit: int, window: float):
+        self.bucket, self.limit, self.window = bucket, limit, window
+        self.start = time.monotonic()
+        self.current = -1
+        self.used = 0
+        self.violations = 0
+
+    def __call__(self) -> Reply:
+        now = time.monotonic()
+        index = int((now - self.start) / self.window)
+        if index != self.current:
+            self.current, self.used = index, 0
+        reset_after = self.start + (index + 1) * self.window - now
+        if self.used >= self.limit:
+            self.violations += 1
+            return 429, {"X-RateLimit-Bucket": self.bucket}, {"retry_after": reset_after, "global": False}
+        self.used += 1
+        return 200, {
+            "X-RateLimit-Bucket": self.bucket,
+            "X-RateLimit-Limit": self.limit,
+            "X-RateLimit-Remaining": self.limit - self.used,
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }, {}
+
+
+def _sequence(*replies: Reply) -> Callable[[], Reply]:
+    """
+    依次返回给定的响应，用完后一直返回最后一个。
+    """
+    queue = list(replies)
+    return lambda: queue.pop(0) if len(queue) > 1 else queue[0]
+
+
+@pytest.fixture
+async def discord(monkeypatch):
+    mock = MockDiscord()
+    monkeypatch.setattr(settings, "DISCORD_API_BASE", API_BASE)
+    monkeypatch.setattr(settings, "DISCORD_BOT_TOKEN", "test-token")
+    monkeypatch.setattr(settings, "DISCORD_GLOBAL_RATE_LIMIT", 1000)
+    for name, value in (
+            ("_route_buckets", {}), ("_buckets", {}), ("_global_reset_at", 0.0),
+            ("_global_tokens", 0.0), ("_global_updated_at", 0.0), ("_global_lock", None),
+    ):
+        monkeypatch.setattr(DiscordClient, name, value)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=mock), base_url=API_BASE)
+    monkeypatch.setitem(HttpClient._clients, "default", client)
+    monkeypatch.setitem(HttpClient._stats, "default", {"requests": 0, "in_flight": 0, "peak_in_flight": 0})
+    yield mock
+    await client.aclose()
+
+
+async def test_requests_wait_while_bucket_is_exhausted(discord):
+    limiter = BucketLimiter("members", limit=2, window=0.3)
+    discord.routes["/guilds/1/members"] = limiter
+
+    # 第一个响应之前还不知道桶的额度
+    assert (await DiscordClient.get("/guilds/1/members")).status_code == 200
+    start = time.monotonic()
+    responses = await asyncio.gather(*(DiscordClient.get("/guilds/1/members") for _ in range(6)))
+
+    assert [r.status_code for r in responses] == [200] * 6
+    assert limiter.violations == 0
+    # 每个窗口 2 个：6 个请求至少要等过两个完整窗口
+    assert time.monotonic() - start >= 0.3 * 2
+
+
+async def test_routes_sharing_a_bucket_share_its_quota(discord):
+    limiter = BucketLimiter("shared", limit=1, window=0.2)
+    discord.routes["/guilds/1/roles"] = limiter
+    discord.routes["/guilds/1/channels"] = limiter
+
+    await DiscordClient.get("/guilds/1/roles")
+    await DiscordClient.get("/guilds/1/channels")
+    responses = await asyncio.gather(DiscordClient.get("/guilds/1/roles"), DiscordClient.get("/guilds/1/channels"))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    # 第二个 route 的首个请求还不知道它属于同一个桶，之后按同一个桶限速
+    assert limiter.violations <= 1
+    times = discord.times()
+    assert times[-1] - times[-2] >= 0.15
+
+
+async def test_429_waits_retry_after_and_holds_the_bucket(discord):
+    discord.routes["/channels/5/messages"] = _sequence(
+        (429, {"X-RateLimit-Bucket": "msg"}, {"retry_after": 0.25, "global": False}),
+        (200, {"X-RateLimit-Bucket": "msg", "X-RateLimit-Limit": 5, "X-RateLimit-Remaining": 4,
+               "X-RateLimit-Reset-After": 1}, {}),
+    )
+    first = asyncio.create_task(DiscordClient.get("/channels/5/messages"))
+    await asyncio.sleep(0.05)
+    # 同一个桶的其他请求也要等到 retry_after 结束
+    second = asyncio.create_task(DiscordClient.get("/channels/5/messages"))
+    assert (await first).status_code == 200
+    assert (await second).status_code == 200
+
+    times = discord.times("/channels/5/messages")
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.24 and times[2] - times[0] >= 0.24
+
+
+async def test_global_429_pauses_every_route(discord):
+    discord.routes["/users/1"] = _sequence(
+        (429, {"X-RateLimit-Global": "true", "X-RateLimit-Scope": "global"}, {"retry_after": 0.3, "global": True}),
+        (200, {}, {}),
+    )
+    first = asyncio.create_task(DiscordClient.get("/users/1"))
+    await asyncio.sleep(0.05)
+    other = await DiscordClient.get("/guilds/2/roles")
+
+    assert other.status_code == 200
+    assert (await first).status_code == 200
+    limited_at = discord.times("/users/1")[0]
+    assert discord.times("/guilds/2/roles")[0] - limited_at >= 0.29
+    assert discord.times("/users/1")[1] - limited_at >= 0.29
+
+
+async def test_global_token_bucket_limits_requests_per_second(discord, monkeypatch):
+    monkeypatch.setattr(settings, "DISCORD_GLOBAL_RATE_LIMIT", 20)
+    start = time.monotonic()
+    # 不同的 major parameter，不受同一个桶限制
+    await asyncio.gather(*(DiscordClient.get(f"/guilds/{i}/roles") for i in range(30)))
+
+    # 令牌桶满额 20 个，之后每秒 20 个：剩下的 10 个至少需要 0.5 秒
+    assert time.monotonic() - start >= 0.45
+    times = sorted(discord.times())
+    for i, at in enumerate(times):
+        in_window = sum(1 for other in times[i:] if other - at < 0.25)
+        assert in_window <= 20 + 0.25 * 20 + 1
+
+
+async def test_5xx_is_retried_with_jittered_backoff(discord, monkeypatch):
+    monkeypatch.setattr(settings, "DISCORD_RETRY_BASE_DELAY", 0.1)
+    discord.routes["/users/2"] = _sequence((503, {}, {}), (502, {}, {}), (200, {}, {}))
+
+    response = await DiscordClient.get("/users/2")
+
+    assert response.status_code == 200
+    times = discord.times("/users/2")
+    assert len(times) == 3
+    # base * 2^attempt * uniform(0.5, 1.0)
+    assert 0.05 <= times[1] - times[0] < 0.1 + 0.05
+    assert 0.1 <= times[2] - times[1] < 0.2 + 0.05
+
+
+async def test_5xx_returns_last_response_when_retries_run_out(discord, monkeypatch):
+    monkeypatch.setattr(settings, "DISCORD_RETRY_BASE_DELAY", 0.01)
+    discord.routes["/users/3"] = lambda: (500, {}, {})
+
+    response = await DiscordClient.get("/users/3", max_retries=2)
+
+    assert response.status_code == 500
+    assert len(discord.times("/users/3")) == 3
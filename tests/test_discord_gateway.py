@@ -0,0 +1,232 @@
+"""
+DiscordGateway 对本地假网关的完整流程：HELLO → IDENTIFY → READY → 成员事件 → 断线 → RESUME，
+以及 INVALID_SESSION 后重新 IDENTIFY 时只做一次全量同步。
+"""
+import asyncio
+import json
+import time
+
+import pytest
+from websockets.asyncio.server import serve
+
+from app.core.config import settings
+from app.services import discord_gateway, member_store
+from app.services.discord_gateway import (
+    LEADER_LOCK,
+    OP_DISPATCH,
+    OP_HEARTBEAT,
+    OP_HEARTBEAT_ACK,
+    OP_HELLO,
+    OP_IDENTIFY,
+    OP_INVALID_SESSION,
+    OP_RESUME,
+    DiscordGateway,
+)
+from app.services.member_store import CACHE_KEY_MEMBERS_HASH, CACHE_KEY_MEMBERS_SYNC, MemberStore
+from app.utils.cache import CacheClient
+from tests.helpers import eventually
+
+GUILD_ID = "1"
+OTHER_GUILD_ID = "2"
+
+pytestmark = pytest.mark.anyio
+
+
+def _member(user_id: str, name: str, roles=()) -> dict:
+    return {"user": {"id": user_id, "username": name}, "nick": None, "roles": list(roles)}
+
+
+def _event(user_id: str, name: str, roles=(), guild_id: str = GUILD_ID) -> dict:
+    return dict(_member(user_id, name, roles), guild_id=guild_id)
+
+
+class _Connection:
+    def __init__(self, ws):
+        self.ws = ws
+        self.received: asyncio.Queue = asyncio.Queue()
+        self.closed = asyncio.Event()
+        self.seq = 0
+
+    async def recv(self) -> dict:
+        return await asyncio.wait_for(self.received.get(), timeout=5)
+
+    async def send(self, op: int, d=None, t: str = None, s: int = None):
+        await self.ws.send(json.dumps({"op": op, "d": d, "t": t, "s": s}))
+
+    async def dispatch(self, event: str, data: dict, seq: int = None):
+        self.seq = seq if seq is not None else self.seq + 1
+        await self.send(OP_DISPATCH, data, event, self.seq)
+
+    async def close(self):
+        await self.ws.close()
+        await self.closed.wait()
+
+
+class FakeGateway:
+    """
+    每个连接先发 HELLO，之后收到的消息放进队列由测试逐条检查；心跳直接回 ACK。
+    """
+
+    def __init__(self):
+        self.connections: asyncio.Queue = asyncio.Queue()
+        self.url = None
+
+    async def _handler(self, ws):
+        conn = _Connection(ws)
+        await conn.send(OP_HELLO, {"heartbeat_interval": 45000})
+        await self.connections.put(conn)
+        try:
+            async for message in ws:
+                payload = json.loads(message)
+                if payload["op"] == OP_HEARTBEAT:
+                    await conn.send(OP_HEARTBEAT_ACK)
+                else:
+                    await conn.received.put(payload)
+        finally:
+            conn.closed.set()
+
+    async def next_connection(self) -> _Connection:
+        return await asyncio.wait_for(self.connections.get(), timeout=5)
+
+
+@pytest.fixture
+async def fake_gateway():
+    gateway = FakeGateway()
+    async with serve(gateway._handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        gateway.url = f"ws://127.0.0.1:{port}"
+        yield gateway
+
+
+@pytest.fixture
+async def gateway_env(cache, fake_gateway, monkeypatch):
+    monkeypatch.setattr(settings, "DISCORD_BOT_TOKEN", "test-token")
+    monkeypatch.setattr(settings, "DISCORD_GUILD_ID", GUILD_ID)
+    monkeypatch.setattr(settings, "DISCORD_GUILD_IDS", [])
+    monkeypatch.setattr(settings, "DISCORD_GATEWAY_URL", fake_gateway.url)
+    monkeypatch.setattr(member_store, "SNAPSHOT_FLUSH_DELAY", 0.01)
+    # INVALID_SESSION 后的随机等待取下限
+    monkeypatch.setattr(discord_gateway.random, "random", lambda: 0.0)
+    for name, value in (("_session_id", None), ("_resume_url", None), ("_seq", None), ("_needs_resync", True)):
+        monkeypatch.setattr(DiscordGateway, name, value)
+    monkeypatch.setattr(MemberStore, "_pending", {})
+    monkeypatch.setattr(MemberStore, "_dirty", {})
+    monkeypatch.setattr(MemberStore, "_flush_tasks", {})
+    yield fake_gateway
+    await DiscordGateway.stop()
+
+
+class FakeResync:
+    """
+    模拟 resync_all_members：标记同步进行中，写入 Discord 返回的成员，等测试放行后提交。
+    """
+
+    def __init__(self, members):
+        self.members = members
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        status_key = CACHE_KEY_MEMBERS_SYNC.format(guild_id=GUILD_ID)
+        await CacheClient.set_json(status_key, {"state": "running", "started_at": time.time()})
+        ingest = MemberStore.begin_ingest(GUILD_ID)
+        await ingest.add_page(self.members)
+        self.started.set()
+        await self.release.wait()
+        await ingest.commit()
+        await CacheClient.set_json(status_key, {"state": "done", "started_at": time.time(), "partial": False})
+
+
+async def _hash_members() -> dict:
+    values = await CacheClient.hvals(CACHE_KEY_MEMBERS_HASH.format(guild_id=GUILD_ID))
+    return {member["user"]["id"]: member for member in map(json.loads, values)}
+
+
+async def _snapshot_members() -> dict:
+    return {member["user"]["id"]: member for member in await MemberStore.load(GUILD_ID) or []}
+
+
+async def _wait_for_state(expected: dict):
+    """
+    hash 和快照都等于 expected（user id -> username）。
+    """
+    async def matches(load):
+        return {user_id: m["user"]["username"] for user_id, m in (await load()).items()} == expected
+
+    await eventually(lambda: matches(_hash_members))
+    await eventually(lambda: matches(_snapshot_members))
+
+
+async def test_identify_events_resume_and_invalid_session(gateway_env):
+    resync = FakeResync([_member("10", "alice"), _member("11", "bob")])
+    DiscordGateway.start(resync=resync)
+
+    # HELLO → IDENTIFY，新会话触发全量同步
+    conn = await gateway_env.next_connection()
+    identify = await conn.recv()
+    assert identify["op"] == OP_IDENTIFY
+    assert identify["d"]["token"] == "test-token"
+    assert identify["d"]["intents"] & discord_gateway.INTENT_GUILD_MEMBERS
+    await eventually(resync.started.is_set)
+    assert await CacheClient.lock_held(LEADER_LOCK)
+
+    await conn.dispatch("READY", {"session_id": "sess-1", "resume_gateway_url": gateway_env.url})
+
+    # 同步进行中收到的增量在提交后仍然保留
+    await conn.dispatch("GUILD_MEMBER_ADD", _event("12", "carol"))
+    await eventually(lambda: MemberStore._pending.get(GUILD_ID))
+    resync.release.set()
+    await _wait_for_state({"10": "alice", "11": "bob", "12": "carol"})
+    assert resync.calls == 1
+
+    await conn.dispatch("GUILD_MEMBER_UPDATE", _event("11", "bobby", roles=["r1"]))
+    await _wait_for_state({"10": "alice", "11": "bobby", "12": "carol"})
+    assert (await _snapshot_members())["11"]["roles"] == ["r1"]
+
+    await conn.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": GUILD_ID, "user": {"id": "10"}})
+    # 未配置的公会的事件被忽略
+    await conn.dispatch("GUILD_MEMBER_ADD", _event("99", "stranger", guild_id=OTHER_GUILD_ID))
+    await _wait_for_state({"11": "bobby", "12": "carol"})
+    last_seq = conn.seq
+
+    # 断线后用 READY 中的 session 和最后的 seq 恢复，不再全量同步
+    await conn.close()
+    conn = await gateway_env.next_connection()
+    resume = await conn.recv()
+    assert resume["op"] == OP_RESUME
+    assert resume["d"] == {"token": "test-token", "session_id": "sess-1", "seq": last_seq}
+    conn.seq = last_seq
+    await conn.dispatch("RESUMED", {})
+    await conn.dispatch("GUILD_MEMBER_ADD", _event("13", "dave"))
+    await _wait_for_state({"11": "bobby", "12": "carol", "13": "dave"})
+    assert resync.calls == 1
+
+    # 会话不可恢复：重新 IDENTIFY，并且只做一次全量同步
+    resync.members = [_member("11", "bobby"), _member("14", "erin")]
+    resync.release = asyncio.Event()
+    resync.started = asyncio.Event()
+    await conn.send(OP_INVALID_SESSION, False)
+    conn = await gateway_env.next_connection()
+    identify = await conn.recv()
+    assert identify["op"] == OP_IDENTIFY
+    await eventually(resync.started.is_set)
+    resync.release.set()
+    await conn.dispatch("READY", {"session_id": "sess-2", "resume_gateway_url": gateway_env.url})
+    await _wait_for_state({"11": "bobby", "14": "erin"})
+    await asyncio.sleep(0.1)
+    assert resync.calls == 2
+
+    await DiscordGateway.stop()
+    assert not await CacheClient.lock_held(LEADER_LOCK)
+
+
+async def test_only_lock_holder_connects(gateway_env):
+    token = await CacheClient.acquire_lock(LEADER_LOCK, 30)
+    resync = FakeResync([])
+    DiscordGateway.start(resync=resync)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(gateway_env.connections.get(), timeout=0.3)
+    assert resync.calls == 0
+    await CacheClient.release_lock(LEADER_LOCK, token)
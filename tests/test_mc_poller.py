@@ -0,0 +1,103 @@
+"""
+MCPoller 的关注列表和采样都在缓存中：并发添加不互相覆盖，任一 worker 轮询写入的采样
+和状态其他 worker 都能读到。
+"""
+import asyncio
+
+import pytest
+
+from app.api.endpoints import minecraft
+from app.api.endpoints.minecraft import MCStatusResponse, PlayerInfo
+from app.core.config import settings
+from app.services import mc_poller
+from app.services.mc_poller import MCPoller
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def poller(cache, monkeypatch):
+    monkeypatch.setattr(settings, "MC_WATCHED_SERVERS", [])
+    monkeypatch.setattr(settings, "MC_POLL_MAX_SERVERS", 50)
+    monkeypatch.setattr(settings, "MC_POLL_INTERVAL", 30)
+    monkeypatch.setattr(settings, "MC_POLL_HISTORY_SIZE", 4)
+    clock = Clock(1_000_000.0)
+    monkeypatch.setattr(mc_poller.time, "time", clock)
+    probes = []
+
+    async def probe(ip, port, protocol):
+        probes.append((ip, port, protocol))
+        if ip == "down.example":
+            raise OSError("refused")
+        return MCStatusResponse(online=True, ip=ip, port=port or 25565, protocol=protocol, latency=12.5,
+                                players=PlayerInfo(online=len(probes), max=20), game_version="1.20.4")
+
+    monkeypatch.setattr(MCPoller, "_probe", probe)
+    yield clock, probes
+
+
+async def test_concurrent_adds_are_all_kept(poller):
+    added = await asyncio.gather(*(MCPoller.add(f"mc{i}.example", 25565) for i in range(10)))
+
+    assert all(added)
+    assert len(await MCPoller.list_watched()) == 10
+    assert not await MCPoller.add("mc3.example", 25565)
+
+    await asyncio.gather(MCPoller.remove("mc1.example", 25565), MCPoller.remove("mc2.example", 25565))
+    assert len(await MCPoller.list_watched()) == 8
+    assert not await MCPoller.remove("mc1.example", 25565)
+
+
+async def test_samples_are_shared_and_wrap_around(poller):
+    clock, probes = poller
+    await MCPoller.add("up.example", None)
+    await MCPoller.add("down.example", 19132, "bedrock")
+    assert await MCPoller.get_history("other.example", None) is None
+
+    for _ in range(6):
+        await MCPoller.poll_once()
+        clock.now += settings.MC_POLL_INTERVAL * 1.05
+
+    up = await MCPoller.get_history("up.example", None)
+    down = await MCPoller.get_history("down.example", 19132, "bedrock")
+    # 环形缓冲区只保留最近 MC_POLL_HISTORY_SIZE 个槽
+    assert 1 <= len(up) <= settings.MC_POLL_HISTORY_SIZE
+    assert [s.ts for s in up] == sorted(s.ts for s in up)
+    assert all(s.online and s.latency == 12.5 for s in up)
+    assert down and not any(s.online for s in down)
+
+    # 轮询停了一圈以上，旧采样不再返回
+    clock.now += settings.MC_POLL_INTERVAL * settings.MC_POLL_HISTORY_SIZE
+    assert await MCPoller.get_history("up.example", None) == []
+
+    await MCPoller.remove("up.example", None)
+    assert await MCPoller.get_history("up.example", None) is None
+
+
+async def test_polled_status_is_served_without_probing(cache, monkeypatch):
+    monkeypatch.setattr(settings, "MC_STATUS_CACHE_TTL", 1)
+    monkeypatch.setattr(settings, "MC_POLL_INTERVAL", 30)
+    probes = []
+
+    async def probe_server(ip, port, protocol="java"):
+        probes.append(ip)
+        return MCStatusResponse(online=True, ip=ip, port=port, protocol=protocol)
+
+    monkeypatch.setattr(minecraft, "_probe_server", probe_server)
+    await minecraft.poll_server("watched.example", 25565, "java")
+    checked_at = minecraft.time.time()
+    # 比 MC_STATUS_CACHE_TTL 更久，但仍在下一轮轮询之前
+    monkeypatch.setattr(minecraft.time, "time", lambda: checked_at + 5)
+
+    result = await minecraft._get_status("watched.example", 25565, "java")
+
+    assert probes == ["watched.example"]
+    assert result.cached and result.online
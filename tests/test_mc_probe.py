@@ -0,0 +1,260 @@
+"""
+探测引擎对本地假服务端的解析结果：UDP GameSpy4 Query、RakNet unconnected pong、TCP Server List Ping，
+以及 auto 模式取最先成功的结果并取消其余探测。
+"""
+import asyncio
+import json
+import struct
+
+import pytest
+
+from app.core.config import settings
+from app.services import mc_probe
+from app.services.mc_probe import ProbeEngine, ProbeResult, probe_first_success
+
+HOST = "127.0.0.1"
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+
+pytestmark = pytest.mark.anyio
+
+
+class _Datagram(asyncio.DatagramProtocol):
+    def __init__(self, handler):
+        self.handler = handler
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        reply = self.handler(data)
+        if reply is not None:
+            self.transport.sendto(reply, addr)
+
+
+async def _udp_responder(handler):
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _Datagram(handler), local_addr=(HOST, 0)
+    )
+    return transport, transport.get_extra_info("sockname")[1]
+
+
+def _gamespy4(data: bytes):
+    """
+    握手（type 9）回 challenge token，full stat（type 0）回键值对和玩家列表。
+    """
+    assert data[:2] == b"\xfe\xfd"
+    packet_type, session = data[2], data[3:7]
+    if packet_type == 9:
+        return b"\x09" + session + b"9513307\x00"
+    assert struct.unpack(">i", data[7:11])[0] == 9513307
+    values = {
+        "hostname": "A Query Server", "gametype": "SMP", "game_id": "MINECRAFT", "version": "1.20.4",
+        "plugins": "", "map": "world", "numplayers": "2",
+        "maxplayers": "20", "hostport": "25565", "hostip": HOST,
+    }
+    body = b"".join(f"{key}\x00{value}\x00".encode() for key, value in values.items())
+    players = b"".join(f"{name}\x00".encode() for name in ("alice", "bob"))
+    return b"\x00" + session + b"splitnum\x00\x80\x00" + body + b"\x00\x01player_\x00\x00" + players + b"\x00"
+
+
+def _raknet_pong(data: bytes):
+    assert data[0] == 0x01 and RAKNET_MAGIC in data
+    server_id = ";".join(["MCPE", "A Bedrock Server", "622", "1.20.40", "3", "10", "1234", "Bedrock level", "Survival"])
+    name = server_id.encode()
+    return b"\x1c" + data[1:9] + b"\x00" * 8 + RAKNET_MAGIC + struct.pack(">H", len(name)) + name
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    value = shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+        shift += 7
+
+
+def _slp_handler(status: dict, delay: float = 0, closed: asyncio.Event = None):
+    """
+    读握手包和 status 请求，回复 status JSON；delay 用来模拟慢的服务端，
+    连接关闭时设置 closed。
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readexactly(await _read_varint(reader))  # handshake
+            await reader.readexactly(await _read_varint(reader))  # status request
+            if delay:
+                try:
+                    # 等待期间客户端断开（探测被取消）就不再回复
+                    await asyncio.wait_for(reader.read(), timeout=delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+            body = json.dumps(status).encode()
+            payload = _varint(0) + _varint(len(body)) + body
+            writer.write(_varint(len(payload)) + payload)
+            await writer.drain()
+            # 等客户端关闭连接
+            await reader.read()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if closed is not None:
+                closed.set()
+            writer.close()
+
+    return handle
+
+
+JAVA_STATUS = {
+    "version": {"name": "Paper 1.20.4", "protocol": 765},
+    "players": {"online": 3, "max": 50, "sample": [{"name": "alice", "id": "00000000-0000-0000-0000-000000000001"}]},
+    "description": "A Java Server",
+}
+
+
+@pytest.fixture
+async def tcp_server():
+    servers = []
+
+    async def start(handler):
+        server = await asyncio.start_server(handler, HOST, 0)
+        servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    yield start
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+
+async def test_query_probe_parses_gamespy4(cache):
+    transport, port = await _udp_responder(_gamespy4)
+    try:
+        result = await mc_probe.probe(HOST, port, "query")
+    finally:
+        transport.close()
+    assert result == ProbeResult(
+        protocol="query", host=HOST, port=port, motd="A Query Server", players_online=2, players_max=20,
+        version="vanilla 1.20.4", latency=result.latency, player_list=["alice", "bob"],
+    )
+    assert result.latency > 0
+
+
+async def test_bedrock_probe_parses_raknet_pong(cache):
+    transport, port = await _udp_responder(_raknet_pong)
+    try:
+        result = await mc_probe.probe(HOST, port, "bedrock")
+    finally:
+        transport.close()
+    assert result == ProbeResult(
+        protocol="bedrock", host=HOST, port=port, motd="A Bedrock Server", players_online=3, players_max=10,
+        version="1.20.40", latency=result.latency,
+    )
+
+
+async def test_java_probe_parses_slp(cache, tcp_server):
+    port = await tcp_server(_slp_handler(JAVA_STATUS))
+    result = await mc_probe.probe(HOST, port, "java")
+    assert result == ProbeResult(
+        protocol="java", host=HOST, port=port, motd="A Java Server", players_online=3, players_max=50,
+        version="Paper 1.20.4", latency=result.latency, player_list=["alice"],
+    )
+
+
+async def test_auto_returns_first_success_and_cancels_the_rest(cache, tcp_server, monkeypatch):
+    # 同一端口：TCP 上的 Java 服务端很慢，UDP 上的 Bedrock 立即回复
+    closed = asyncio.Event()
+    port = await tcp_server(_slp_handler(JAVA_STATUS, delay=10, closed=closed))
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _Datagram(_raknet_pong), local_addr=(HOST, port)
+    )
+    monkeypatch.setattr(settings, "MC_AUTO_PROTOCOLS", ["java", "bedrock"])
+    try:
+        result = await asyncio.wait_for(mc_probe.probe(HOST, port, "auto"), timeout=2)
+    finally:
+        transport.close()
+    assert result.protocol == "bedrock"
+    # Java 探测被取消，连接随之关闭
+    await asyncio.wait_for(closed.wait(), timeout=2)
+
+
+async def test_auto_falls_back_when_first_protocol_fails(cache, monkeypatch):
+    # 端口上没有 TCP 服务端，Java 连接被拒绝
+    transport, port = await _udp_responder(_raknet_pong)
+    monkeypatch.setattr(settings, "MC_AUTO_PROTOCOLS", ["java", "bedrock"])
+    try:
+        result = await mc_probe.probe(HOST, port, "auto")
+    finally:
+        transport.close()
+    assert result.protocol == "bedrock"
+
+
+class _FakeEngine(ProbeEngine):
+    def __init__(self, protocol: str, delay: float, error: Exception = None):
+        self.protocol = protocol
+        self.delay = delay
+        self.error = error
+        self.cancelled = False
+
+    async def probe(self, host, port, timeout, srv=False):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return ProbeResult(self.protocol, host, port, None, 0, 0, None, None)
+
+
+async def test_first_success_cancels_pending_engines():
+    slow, failing, fast = _FakeEngine("slow", 5), _FakeEngine("failing", 0, OSError("refused")), _FakeEngine("fast", 0.05)
+    result = await probe_first_success([slow, failing, fast], HOST, 25565, 1)
+    assert result.protocol == "fast"
+    await asyncio.sleep(0)
+    assert slow.cancelled and not fast.cancelled
+
+
+async def test_first_success_raises_error_of_first_engine_when_all_fail():
+    engines = [_FakeEngine("a", 0.05, OSError("a failed")), _FakeEngine("b", 0, TimeoutError("b failed"))]
+    with pytest.raises(OSError, match="a failed"):
+        await probe_first_success(engines, HOST, 25565, 1)
+
+
+async def test_first_success_without_engines_is_a_config_error():
+    with pytest.raises(ValueError, match="MC_AUTO_PROTOCOLS"):
+        await probe_first_success([], HOST, 25565, 1)
+
+
+async def test_srv_record_is_only_resolved_when_requested(cache, monkeypatch):
+    lookups = []
+
+    async def async_lookup(address, timeout=3):
+        lookups.append(address)
+        return mc_probe.JavaServer("srv-target.example", 25600, timeout=timeout)
+
+    monkeypatch.setattr(mc_probe.JavaServer, "async_lookup", async_lookup)
+
+    server = await mc_probe.resolve_java("mc.example", None, 1)
+    assert (server.address.host, server.address.port) == ("mc.example", 25565)
+    server = await mc_probe.resolve_java("mc.example", 25570, 1, srv=True)
+    assert server.address.port == 25570
+    assert lookups == []
+
+    for _ in range(2):
+        server = await mc_probe.resolve_java("mc.example", None, 1, srv=True)
+        assert (server.address.host, server.address.port) == ("srv-target.example", 25600)
+    # 解析结果缓存 MC_DNS_CACHE_TTL 秒
+    assert lookups == ["mc.example"]
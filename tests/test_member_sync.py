@@ -0,0 +1,106 @@
+"""
+MemberSync 分页同步：完整、中途失败、达到 MAX_PAGES 被截断时快照和 partial 标记的处理。
+Discord 请求由一个按 after 游标分页的假 DiscordClient.get 返回。
+"""
+from typing import List
+
+import orjson
+import pytest
+
+from app.core.config import settings
+from app.services import member_sync
+from app.services.member_store import MemberStore
+from app.services.member_sync import MemberSync
+from app.utils.discord_client import DiscordClient
+
+GUILD_ID = "1"
+
+pytestmark = pytest.mark.anyio
+
+
+class _Response:
+    def __init__(self, status_code: int, members: List[dict] = ()):
+        self.status_code = status_code
+        self.content = orjson.dumps(list(members))
+        self.text = "" if status_code == 200 else "error"
+
+
+def _members(count: int) -> List[dict]:
+    return [{"user": {"id": str(1000 + i), "username": f"user{i}"}, "roles": []} for i in range(count)]
+
+
+@pytest.fixture
+def discord_members(cache, monkeypatch):
+    """
+    返回一个可修改的状态：members 为公会成员，fail_at 为返回 500 的页序号（从 0 开始）。
+    """
+    state = {"members": [], "fail_at": None, "requests": 0}
+
+    async def get(path: str, params: dict = None):
+        page = state["requests"]
+        state["requests"] += 1
+        if state["fail_at"] is not None and page >= state["fail_at"]:
+            return _Response(500)
+        after = int(params["after"])
+        rest = [m for m in state["members"] if int(m["user"]["id"]) > after]
+        return _Response(200, rest[:params["limit"]])
+
+    monkeypatch.setattr(DiscordClient, "get", get)
+    monkeypatch.setattr(settings, "DISCORD_BOT_TOKEN", "test-token")
+    monkeypatch.setattr(member_sync, "PAGE_SIZE", 10)
+    monkeypatch.setattr(MemberSync, "_slots", None)
+    return state
+
+
+async def _snapshot_ids() -> List[str]:
+    return [m["user"]["id"] for m in await MemberStore.load(GUILD_ID) or []]
+
+
+async def test_complete_sync_replaces_the_snapshot(discord_members):
+    discord_members["members"] = _members(25)
+
+    assert await MemberSync.run(GUILD_ID) == 25
+
+    assert len(await _snapshot_ids()) == 25
+    status = await MemberSync.status(GUILD_ID)
+    assert status["state"] == "done" and status["partial"] is False and status["pages"] == 3
+
+
+async def test_truncated_sync_keeps_the_warm_snapshot(discord_members, monkeypatch):
+    discord_members["members"] = _members(25)
+    await MemberSync.run(GUILD_ID)
+    version = await MemberStore.get_version(GUILD_ID)
+
+    discord_members["members"] = _members(40)
+    discord_members["requests"] = 0
+    monkeypatch.setattr(member_sync, "MAX_PAGES", 2)
+    assert await MemberSync.run(GUILD_ID) == 0
+
+    # 只拉到 20 个，不能覆盖已有的 25 个成员的完整快照
+    assert len(await _snapshot_ids()) == 25
+    assert await MemberStore.get_version(GUILD_ID) == version
+    status = await MemberSync.status(GUILD_ID)
+    assert status["state"] == "failed" and status["partial"] is False
+
+
+async def test_truncated_sync_on_cold_cache_is_published_as_partial(discord_members, monkeypatch):
+    discord_members["members"] = _members(40)
+    monkeypatch.setattr(member_sync, "MAX_PAGES", 2)
+
+    assert await MemberSync.run(GUILD_ID) == 20
+
+    assert len(await _snapshot_ids()) == 20
+    assert await MemberSync.is_partial(GUILD_ID)
+
+
+async def test_failed_sync_keeps_the_warm_snapshot(discord_members):
+    discord_members["members"] = _members(25)
+    await MemberSync.run(GUILD_ID)
+
+    discord_members["members"] = _members(30)
+    discord_members["requests"] = 0
+    discord_members["fail_at"] = 1
+    assert await MemberSync.run(GUILD_ID) == 0
+
+    assert len(await _snapshot_ids()) == 25
+    assert not await MemberSync.is_partial(GUILD_ID)
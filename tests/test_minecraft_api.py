@@ -0,0 +1,74 @@
+"""
+Minecraft 接口的参数校验和批量查询的超时结果。
+"""
+import asyncio
+
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import minecraft
+from app.core.config import settings
+from app.services import mc_probe
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(cache, monkeypatch):
+    app = FastAPI()
+    app.include_router(minecraft.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("port", [0, -1, 65536])
+async def test_port_out_of_range_is_rejected(client, port):
+    assert (await client.get("/status", params={"ip": "mc.example", "port": port})).status_code == 422
+    assert (await client.get("/history", params={"ip": "mc.example", "port": port})).status_code == 422
+    response = await client.post("/status/batch", json={"targets": [{"ip": "mc.example", "port": port}]})
+    assert response.status_code == 422
+
+
+async def test_batch_timeout_keeps_the_requested_protocol(client, monkeypatch):
+    monkeypatch.setattr(settings, "MC_BATCH_CONCURRENCY", 4)
+
+    async def slow_status(ip, port, protocol="java", srv=False):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(minecraft, "_get_status", slow_status)
+    targets = [
+        {"ip": "java.example", "protocol": "java"},
+        {"ip": "be.example", "port": 19133, "protocol": "bedrock"},
+        {"ip": "any.example", "protocol": "auto"},
+    ]
+
+    response = await client.post("/status/batch", json={"targets": targets, "timeout": 0.05})
+
+    results = {item["ip"]: item for item in map(orjson.loads, response.text.splitlines())}
+    assert {ip: (r["protocol"], r["port"], r["error"]) for ip, r in results.items()} == {
+        "java.example": ("java", 25565, "Connection Timed Out"),
+        "be.example": ("bedrock", 19133, "Connection Timed Out"),
+        "any.example": (None, 25565, "Connection Timed Out"),
+    }
+
+
+async def test_srv_lookup_is_opt_in(client, monkeypatch):
+    calls = []
+
+    async def probe(host, port, protocol="java", srv=False):
+        calls.append((port, srv))
+        port = 25600 if srv and port is None else port or 25565
+        return mc_probe.ProbeResult(protocol, host, port, None, 0, 10, "1.20.4", 1.0)
+
+    monkeypatch.setattr(mc_probe, "probe", probe)
+
+    default = (await client.get("/status", params={"ip": "mc.example"})).json()
+    resolved = (await client.get("/status", params={"ip": "mc.example", "srv": "true"})).json()
+    explicit = (await client.get("/status", params={"ip": "mc.example", "port": 25565, "srv": "true"})).json()
+
+    assert calls == [(None, False), (None, True), (25565, True)]
+    # 三种请求各自缓存，SRV 解析出的端口不会混进默认端口的结果
+    assert (default["port"], resolved["port"], explicit["port"]) == (25565, 25600, 25565)
+    assert not any(r["cached"] for r in (default, resolved, explicit))